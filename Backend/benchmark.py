@@ -0,0 +1,114 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from clients import HttpBackend, join_transcripts
+from fake_backend import SEGMENT_BYTES, make_server
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def print_table(rows, headers):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in (headers, *rows):
+        print("  ".join(str(value).ljust(width) for value, width in zip(row, widths)))
+
+
+# Function to start a fake backend in a background thread
+def start_fake_backend(args):
+    server = make_server(latency=args.latency, connect_latency=args.connect_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# --- Clients: a new client per request vs clients shared by the process ---
+
+@benchmark("clients")
+def bench_clients(args):
+    server, url = start_fake_backend(args)
+    audio_file = os.path.join(HERE, "test_audio.mp3")
+    shared = HttpBackend(url)
+
+    # The previous handler: a new speech client and a new model on every request
+    def per_request(_):
+        speech, llm = HttpBackend(url), HttpBackend(url)
+        try:
+            return llm.summarize(speech.transcribe(audio_file))
+        finally:
+            speech.close()
+            llm.close()
+
+    def pooled(_):
+        return shared.summarize(shared.transcribe(audio_file))
+
+    rows = []
+    for name, handler in (("new clients per request", per_request), ("shared clients", pooled)):
+        for workers in (1, args.concurrency):
+            server.connections = 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(handler, range(args.requests)))
+            elapsed = time.perf_counter() - start
+            rows.append((name, workers, round(elapsed * 1000 / args.requests, 1), server.connections))
+    shared.close()
+    server.shutdown()
+
+    print(f"{args.requests} requests, {args.latency * 1000:.0f} ms per call, "
+          f"{args.connect_latency * 1000:.0f} ms per new connection")
+    print_table(rows, ("clients", "concurrency", "ms per request", "connections"))
+
+
+# --- Long audio: first result only vs every result segment ---
+
+@benchmark("long-audio")
+def bench_long_audio(args):
+    server, url = start_fake_backend(args)
+    backend = HttpBackend(url)
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for minutes in args.minutes:
+            audio_file = os.path.join(workdir, f"{minutes}.mp3")
+            audio = bytes(int(minutes * 60 * 128_000 / 8))  # 128 kbps
+            with open(audio_file, "wb") as f:
+                f.write(audio)
+            response = backend.session.post(f"{url}/recognize", data=audio)
+            results = response.json()["results"]
+            first_only = results[0]["transcript"]
+            everything = join_transcripts(result["transcript"] for result in results)
+            assert everything == backend.transcribe(audio_file)
+            rows.append((minutes, len(results), len(first_only.split()), len(everything.split())))
+    backend.close()
+    server.shutdown()
+
+    print(f"Fake recognizer returns one segment per {SEGMENT_BYTES // 1024} KB of audio")
+    print_table(rows, ("minutes", "segments", "words (results[0])", "words (all results)"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend client benchmarks against a local fake backend")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake backend seconds per call")
+    parser.add_argument("--connect-latency", type=float, default=0.05, help="fake backend seconds per new connection")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[0.5, 2, 10])
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == "__main__":
+    main()
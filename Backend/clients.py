@@ -0,0 +1,145 @@
+import os
+import requests
+from requests.adapters import HTTPAdapter
+
+# "google" (Cloud Speech-to-Text) or "http" (a service speaking fake_backend.py's protocol)
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+# "gemini" or "http"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8090")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+LANGUAGE_CODE = "en-US"
+SAMPLE_RATE_HERTZ = 16000
+# Synchronous recognition only takes about a minute of audio; bigger uploads go
+# straight to long-running recognition (1 MB is about a minute of 128 kbps MP3)
+SYNC_RECOGNIZE_MAX_BYTES = int(os.getenv("SYNC_RECOGNIZE_MAX_BYTES", str(1024 * 1024)))
+LONG_RUNNING_TIMEOUT = int(os.getenv("LONG_RUNNING_TIMEOUT", "600"))  # Seconds
+HTTP_TIMEOUT = (3.05, 120)  # (connect, read) seconds
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+SUMMARY_PROMPT = "Summarize this text in a few sentences:\n{text}"
+
+
+def join_transcripts(transcripts):
+    """Join the transcripts of consecutive recognition results into one text"""
+    return " ".join(transcript.strip() for transcript in transcripts if transcript and transcript.strip())
+
+
+class GoogleSpeechBackend:
+    """Speech-to-Text through one SpeechClient (one gRPC channel) shared by every request.
+
+    Short audio uses synchronous recognition; longer audio, or audio the API
+    rejects as too long, uses long-running recognition. Every result segment
+    is kept, not only the first. Inline audio is limited to 10 MB either way.
+    """
+
+    def __init__(self, client=None, sync_max_bytes=SYNC_RECOGNIZE_MAX_BYTES, timeout=LONG_RUNNING_TIMEOUT):
+        from google.cloud import speech
+        self.speech = speech
+        self.client = client or speech.SpeechClient()
+        self.sync_max_bytes = sync_max_bytes
+        self.timeout = timeout
+
+    def config(self, file_path):
+        encoding = self.speech.RecognitionConfig.AudioEncoding
+        if file_path.lower().endswith(".wav"):
+            # The sample rate comes from the WAV header
+            return self.speech.RecognitionConfig(encoding=encoding.LINEAR16, language_code=LANGUAGE_CODE)
+        return self.speech.RecognitionConfig(
+            encoding=encoding.MP3,
+            sample_rate_hertz=SAMPLE_RATE_HERTZ,
+            language_code=LANGUAGE_CODE,
+        )
+
+    def transcribe(self, file_path):
+        from google.api_core.exceptions import InvalidArgument
+
+        with open(file_path, "rb") as audio_file:
+            content = audio_file.read()
+        audio = self.speech.RecognitionAudio(content=content)
+        config = self.config(file_path)
+
+        if len(content) <= self.sync_max_bytes:
+            try:
+                response = self.client.recognize(config=config, audio=audio)
+                return self.join(response.results)
+            except InvalidArgument:
+                pass  # Too long for synchronous recognition
+        operation = self.client.long_running_recognize(config=config, audio=audio)
+        return self.join(operation.result(timeout=self.timeout).results)
+
+    @staticmethod
+    def join(results):
+        return join_transcripts(result.alternatives[0].transcript for result in results if result.alternatives)
+
+    def close(self):
+        self.client.transport.close()
+
+
+class GeminiBackend:
+    """Summaries from one GenerativeModel created at startup"""
+
+    def __init__(self, api_key, model_name=GEMINI_MODEL):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def summarize(self, text):
+        response = self.model.generate_content(SUMMARY_PROMPT.format(text=text))
+        return response.text.strip()
+
+    def close(self):
+        pass
+
+
+class HttpBackend:
+    """Speech-to-Text and summaries from an HTTP service (see fake_backend.py).
+
+    POST /recognize takes the raw audio and returns {"results": [{"transcript": ...}]};
+    POST /summarize takes {"text": ...} and returns {"summary": ...}. One pooled
+    session keeps the connections alive between requests.
+    """
+
+    def __init__(self, base_url=BACKEND_URL, pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def transcribe(self, file_path):
+        with open(file_path, "rb") as audio_file:
+            response = self.session.post(f"{self.base_url}/recognize", data=audio_file, timeout=self.timeout,
+                                         headers={"Content-Type": "application/octet-stream"})
+        response.raise_for_status()
+        return join_transcripts(result.get("transcript", "") for result in response.json().get("results", []))
+
+    def summarize(self, text):
+        response = self.session.post(f"{self.base_url}/summarize", json={"text": text}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["summary"].strip()
+
+    def close(self):
+        self.session.close()
+
+
+class Clients:
+    """The process-wide speech and LLM clients"""
+
+    def __init__(self, speech, llm):
+        self.speech = speech
+        self.llm = llm
+
+    def close(self):
+        self.speech.close()
+        if self.llm is not self.speech:
+            self.llm.close()
+
+
+def create_clients(stt_backend=STT_BACKEND, llm_backend=LLM_BACKEND, api_key=None, base_url=BACKEND_URL):
+    """Create the speech and LLM clients once, for the whole process"""
+    http = HttpBackend(base_url) if "http" in (stt_backend, llm_backend) else None
+    speech = http if stt_backend == "http" else GoogleSpeechBackend()
+    llm = http if llm_backend == "http" else GeminiBackend(api_key or os.getenv("GEMINI_API_KEY"))
+    return Clients(speech, llm)
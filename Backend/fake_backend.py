@@ -0,0 +1,69 @@
+import argparse
+import json
+import math
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Audio bytes per recognition result segment (about 15 s of 128 kbps MP3)
+SEGMENT_BYTES = 240 * 1024
+
+
+class FakeBackendHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the speech and LLM APIs, speaking clients.HttpBackend's protocol.
+
+    `connect_latency` is paid once per new connection (like a TLS handshake or
+    a new gRPC channel), `latency` on every request. /recognize returns one
+    result segment per SEGMENT_BYTES of audio.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    connect_latency = 0.0
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        time.sleep(self.connect_latency)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        if self.path == "/recognize":
+            segments = max(1, math.ceil(len(body) / SEGMENT_BYTES))
+            payload = {"results": [{"transcript": f"segment {i + 1} of the recording"} for i in range(segments)]}
+        elif self.path == "/summarize":
+            text = json.loads(body)["text"]
+            payload = {"summary": " ".join(text.split()[:12])}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port=0, latency=0.0, connect_latency=0.0):
+    """Create (but do not start) a fake backend server; port 0 picks a free port"""
+    handler = type("Handler", (FakeBackendHandler,), {"latency": latency, "connect_latency": connect_latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.connections = 0
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake speech/LLM backend (STT_BACKEND=http LLM_BACKEND=http)")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--connect-latency", type=float, default=0.1, help="seconds per new connection")
+    args = parser.parse_args()
+    server = make_server(args.port, args.latency, args.connect_latency)
+    print(f"Fake backend on http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
@@ -1,21 +1,34 @@
 from flask import Flask, jsonify, send_file, render_template, Response, request
-import sounddevice as sd
-import numpy as np
-import wave
 import os
 import sys
 import requests
 import speech_recognition as sr
-from pydub import AudioSegment
-import math
 from dotenv import load_dotenv
 import random
-from difflib import SequenceMatcher
 import pymongo
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
+from audio_chunks import decode_wav, split_pcm
+from ingest import ingest_audio, decode_audio, FILE_EXTENSIONS
+from transcription import transcribe_chunks_checked, recognizer_settings
+from transcript_cache import TranscriptCache, transcript_key
+from similarity import text_similarity
+from vad import trim_silence
+from recording_store import RecordingStore
+from jobs import JobQueue, PermanentJobError, sse_event
+from recorder import StreamingRecorder, open_audio_source, AUDIO_SOURCE
+from metrics import REGISTRY, stage, collect_timings
+from reprocess import Reprocessor, REPROCESS_WORKERS
+from user_stats import UserStats
+import click
+import time
+import json
 import base64
-import io
+import threading
+import hashlib
+from functools import lru_cache
+from werkzeug.datastructures import ContentRange
 
 # Load environment variables
 load_dotenv('api.env')
@@ -28,10 +41,18 @@ MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
 mongo_client = pymongo.MongoClient(MONGO_URI)
 db = mongo_client['ice_breaker_app']
 recordings_collection = db['recordings']
+recording_store = RecordingStore(db)
+job_queue = JobQueue(db['jobs'])
+transcript_cache = TranscriptCache(db['transcript_cache'])
+user_stats = UserStats(db['user_stats'], recordings_collection)
+
+# Bump when scoring weights or STT settings change; records scored by an older
+# pipeline are picked up by `flask --app app reprocess-recordings`
+PIPELINE_VERSION = 2
 
 # Audio settings
 SAMPLE_RATE = 44100  # 44.1kHz standard sampling rate
-DURATION = 120  # 60 seconds of recording
+DURATION = 120  # Longest recording, in seconds
 CHANNELS = 1  # Mono audio
 
 # Ice Breaker questions list
@@ -63,124 +84,98 @@ def get_random_ice_breaker():
     return random.choice(ICE_BREAKER_QUESTIONS)
 
 # Function to record audio
+@stage('record_audio')
 def record_audio():
     print("Recording started...")
 
-    # Record audio for the specified duration
-    audio_data = sd.rec(int(SAMPLE_RATE * DURATION), samplerate=SAMPLE_RATE, channels=CHANNELS, dtype=np.int16)
-    sd.wait()  # Wait for recording to complete
-    print("Recording finished.")
-
-    # Save as WAV file
+    # Stream blocks straight into the WAV file; stops after DURATION at most,
+    # or earlier once the speaker has gone quiet
     audio_file = os.path.join(app.config['UPLOAD_FOLDER'], 'recorded_audio.wav')
-    with wave.open(audio_file, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(2)
-        wf.setframerate(SAMPLE_RATE)
-        wf.writeframes(audio_data.tobytes())
+    recorder = StreamingRecorder(open_audio_source(AUDIO_SOURCE, SAMPLE_RATE, CHANNELS), max_seconds=DURATION)
+    recording = recorder.record(audio_file)
+    print(f"Recording finished after {recording.duration:.1f} s ({recording.stop_reason}).")
+    if recording.dropped_blocks:
+        print(f"Warning: {recording.dropped_blocks} audio block(s) dropped")
 
     print(f"Audio saved to {audio_file}")
     return audio_file
 
 # Function to save audio to MongoDB
+@stage('save_audio_to_db')
 def save_audio_to_db(audio_file, user_id="anonymous", prompt=""):
-    # Read the audio file
-    with open(audio_file, 'rb') as f:
-        audio_data = f.read()
-    
-    # Convert to base64 for storage
-    audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-    
-    # Save to MongoDB
-    record = {
-        'user_id': user_id,
-        'prompt': prompt,
-        'audio_data': audio_base64,
-        'timestamp': datetime.now()
-    }
-    
-    # Insert and return the record ID
-    result = recordings_collection.insert_one(record)
-    return str(result.inserted_id)
+    # Store a compressed archival copy for playback and a 16 kHz derivative for
+    # transcription; both go into GridFS and the record keeps only metadata
+    ingested = ingest_audio(audio_file)
+    return recording_store.save(
+        ingested.archive, user_id, prompt, ingested.archive_type,
+        stt_audio=ingested.stt_audio, stt_content_type=ingested.stt_type
+    )
 
-# Function to get audio from MongoDB
+# Function to get audio from MongoDB (the transcription derivative)
+@stage('load_audio')
 def get_audio_from_db(record_id):
-    record = recordings_collection.find_one({'_id': ObjectId(record_id)})
-    if record and 'audio_data' in record:
-        # Decode base64 audio data
-        audio_data = base64.b64decode(record['audio_data'])
-        return audio_data, record.get('prompt', '')
-    return None, None
-
-# Function to split long audio into smaller chunks (max 120 sec each)
-def split_audio(audio_file, chunk_length=120):  # 120 seconds per chunk
-    audio = AudioSegment.from_wav(audio_file)
-    total_length = len(audio) / 1000  # Convert ms to seconds
-    num_chunks = math.ceil(total_length / chunk_length)
-    
-    chunk_files = []
-    for i in range(num_chunks):
-        start_time = i * chunk_length * 1000  # Convert to ms
-        end_time = min((i + 1) * chunk_length * 1000, len(audio))
-        chunk = audio[start_time:end_time]
-        
-        chunk_filename = f"chunk_{i}.wav"
-        chunk.export(chunk_filename, format="wav")
-        chunk_files.append(chunk_filename)
-    
-    return chunk_files
+    return recording_store.read(record_id, variant='stt')
 
-# Function to split audio data directly
-def split_audio_data(audio_data, chunk_length=120):
-    # Convert bytes to AudioSegment
-    audio_file = io.BytesIO(audio_data)
-    audio = AudioSegment.from_wav(audio_file)
-    
-    total_length = len(audio) / 1000  # Convert ms to seconds
-    num_chunks = math.ceil(total_length / chunk_length)
-    
-    chunk_files = []
-    for i in range(num_chunks):
-        start_time = i * chunk_length * 1000  # Convert to ms
-        end_time = min((i + 1) * chunk_length * 1000, len(audio))
-        chunk = audio[start_time:end_time]
-        
-        chunk_filename = f"chunk_{i}.wav"
-        chunk.export(chunk_filename, format="wav")
-        chunk_files.append(chunk_filename)
-    
-    return chunk_files
+# Function to build a streaming response for stored audio, honoring Range headers
+def stream_audio_response(audio, filename):
+    headers = {
+        'Content-Disposition': f'inline; filename={filename}',
+        'Accept-Ranges': 'bytes'
+    }
+    start, stop, status = 0, audio.length, 200
 
-# Function to convert audio to text
-def audio_to_text(audio_file):
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_file) as source:
-        audio_data = recognizer.record(source)
-    try:
-        return recognizer.recognize_google(audio_data)  # Using Google STT API
-    except sr.UnknownValueError:
-        print(f"Could not understand audio in {audio_file}")
-        return ""
-    except sr.RequestError as e:
-        print(f"Google STT API request failed: {e}")
-        return ""
+    # Multi-range requests are answered with the whole file
+    if request.range and len(request.range.ranges) == 1:
+        bounds = request.range.range_for_length(audio.length)
+        if bounds is None:
+            audio.close()
+            headers['Content-Range'] = ContentRange('bytes', None, None, audio.length).to_header()
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        status = 206
+        headers['Content-Range'] = ContentRange('bytes', start, stop, audio.length).to_header()
+
+    headers['Content-Length'] = str(stop - start)
+    return Response(
+        audio.iter_range(start, stop),
+        status=status,
+        mimetype=audio.content_type,
+        headers=headers,
+        direct_passthrough=True
+    )
+
+# Function to transcribe decoded audio, reusing the cached transcript of identical PCM
+def transcribe_pcm(pcm, recognizer=None, max_in_flight=None, chunk_length=120):
+    settings = recognizer_settings(recognizer)
+    settings['chunk_length'] = chunk_length
+    key = transcript_key(pcm, settings)
+
+    texts = transcript_cache.get(key)
+    if texts is None:
+        # Transcribe the chunks concurrently and reassemble them in order
+        with stage('split_audio'):
+            chunks = split_pcm(pcm, chunk_length)
+        with stage('audio_to_text'):
+            texts, failed = transcribe_chunks_checked(chunks, recognizer, max_in_flight)
+        # Never cache a transcript with gaps left by STT service errors
+        if not failed:
+            transcript_cache.put(key, texts)
+    return texts
 
 # Function to calculate similarity between two texts
-def calculate_similarity(text1, text2):
-    # Convert both texts to lowercase for better comparison
-    text1 = text1.lower()
-    text2 = text2.lower()
-    
-    # Use SequenceMatcher to get a similarity ratio
-    return SequenceMatcher(None, text1, text2).ratio()
+def calculate_similarity(text1, text2, mode=None):
+    # Token/n-gram vector similarity; mode='sequence' gives the legacy
+    # character-level SequenceMatcher ratio
+    return text_similarity(text1, text2, mode)
 
 # Function to calculate score based on word count and prompt similarity
-def calculate_score(word_count, prompt_text, speech_text, max_word_count=170):
+@stage('calculate_score')
+def calculate_score(word_count, prompt_text, speech_text, max_word_count=170, similarity_mode=None):
     # Base score based on word count (60% of total score)
     word_count_score = min((word_count / max_word_count) * 60, 60)
     
     # Similarity score (40% of total score)
-    similarity_ratio = calculate_similarity(prompt_text, speech_text)
+    similarity_ratio = calculate_similarity(prompt_text, speech_text, similarity_mode)
     similarity_score = similarity_ratio * 40
     
     # Total score
@@ -188,33 +183,45 @@ def calculate_score(word_count, prompt_text, speech_text, max_word_count=170):
     
     return round(total_score, 2), round(similarity_ratio * 100, 2)
 
+# Function to build the update that stores a recording's results
+def score_update(transcribed_text, word_count, similarity_percentage, score, speech=None):
+    results = {
+        'transcribed_text': transcribed_text,
+        'word_count': word_count,
+        'similarity_percentage': similarity_percentage,
+        'score': score,
+        'processed_at': datetime.now(),
+        'pipeline_version': PIPELINE_VERSION
+    }
+    # Speech/silence breakdown from voice activity trimming
+    if speech:
+        results.update(speech)
+    return {'$set': results}
+
 # Function to save score to MongoDB
-def save_score_to_db(record_id, transcribed_text, word_count, similarity_percentage, score):
-    # Update the existing record with the results
-    recordings_collection.update_one(
+@stage('save_score_to_db')
+def save_score_to_db(record_id, transcribed_text, word_count, similarity_percentage, score, speech=None):
+    # Update the existing record with the results; the previous values turn a
+    # rescore into a delta on the user's aggregates
+    previous = recordings_collection.find_one_and_update(
         {'_id': ObjectId(record_id)},
-        {'$set': {
-            'transcribed_text': transcribed_text,
-            'word_count': word_count,
-            'similarity_percentage': similarity_percentage,
-            'score': score,
-            'processed_at': datetime.now()
-        }}
+        score_update(transcribed_text, word_count, similarity_percentage, score, speech),
+        projection={'user_id': 1, 'score': 1, 'word_count': 1}
     )
+    if previous:
+        user_stats.record_score(previous.get('user_id', 'anonymous'), previous['_id'], score, word_count,
+                                previous.get('score'), previous.get('word_count'))
     return record_id
 
 # Process the audio file
-def process_audio_file(audio_file='recorded_audio.wav', prompt_text=""):
-    # Split audio into smaller chunks
-    chunk_files = split_audio(audio_file)
-
-    full_text = ""
-
-    # Process each chunk
-    for chunk_file in chunk_files:
-        text = audio_to_text(chunk_file)
-        full_text += text + " "
-        os.remove(chunk_file)  # Remove temporary chunk file
+def process_audio_file(audio_file='recorded_audio.wav', prompt_text="", recognizer=None, max_in_flight=None):
+    # Decode once and drop the silence; cached transcripts of the same audio skip STT entirely
+    with stage('decode'):
+        pcm = decode_wav(audio_file)
+    with stage('vad'):
+        speech = trim_silence(pcm)
+    texts = transcribe_pcm(speech.pcm, recognizer, max_in_flight)
+    full_text = "".join(text + " " for text in texts)
 
     # Count words in the full transcribed text
     full_word_count = len(full_text.split())
@@ -226,21 +233,19 @@ def process_audio_file(audio_file='recorded_audio.wav', prompt_text=""):
         'transcribed_text': full_text.strip(),
         'full_word_count': full_word_count,
         'score': score,
-        'similarity_percentage': similarity_percentage
+        'similarity_percentage': similarity_percentage,
+        'speech': speech.report()
     }
 
 # Process audio data directly
-def process_audio_data(audio_data, prompt_text=""):
-    # Split audio into smaller chunks
-    chunk_files = split_audio_data(audio_data)
-
-    full_text = ""
-
-    # Process each chunk
-    for chunk_file in chunk_files:
-        text = audio_to_text(chunk_file)
-        full_text += text + " "
-        os.remove(chunk_file)  # Remove temporary chunk file
+def process_audio_data(audio_data, prompt_text="", recognizer=None, max_in_flight=None):
+    # Decode once and drop the silence; cached transcripts of the same audio skip STT entirely
+    with stage('decode'):
+        pcm = decode_audio(audio_data)
+    with stage('vad'):
+        speech = trim_silence(pcm)
+    texts = transcribe_pcm(speech.pcm, recognizer, max_in_flight)
+    full_text = "".join(text + " " for text in texts)
 
     # Count words in the full transcribed text
     full_word_count = len(full_text.split())
@@ -252,9 +257,129 @@ def process_audio_data(audio_data, prompt_text=""):
         'transcribed_text': full_text.strip(),
         'full_word_count': full_word_count,
         'score': score,
-        'similarity_percentage': similarity_percentage
+        'similarity_percentage': similarity_percentage,
+        'speech': speech.report()
     }
 
+# Job: record from the microphone, store, then transcribe and score
+def run_recording_job(job):
+    payload = job.payload
+    # A retried job keeps the audio captured by the earlier attempt
+    if not payload.get('record_id'):
+        job.checkpoint('recording')
+        audio_file = record_audio()
+        record_id = save_audio_to_db(audio_file, payload.get('user_id', 'anonymous'), payload.get('prompt', ''))
+        job.checkpoint('recorded', record_id=record_id)
+
+    result = score_recording(job, payload['record_id'])
+    result['message'] = 'Recording and processing completed'
+    return result
+
+# Job: transcribe and score an existing recording (or the local recorded file)
+def run_processing_job(job):
+    payload = job.payload
+    if payload.get('record_id'):
+        return score_recording(job, payload['record_id'])
+
+    job.checkpoint('transcribing')
+    audio_file = os.path.join(app.config['UPLOAD_FOLDER'], 'recorded_audio.wav')
+    if not os.path.exists(audio_file):
+        raise PermanentJobError('No recorded file found')
+    results = process_audio_file(audio_file, payload.get('prompt', ''))
+    return {
+        'transcribed_text': results['transcribed_text'],
+        'word_count': results['full_word_count'],
+        'score': results['score'],
+        'similarity_percentage': results['similarity_percentage'],
+        'speech': results['speech']
+    }
+
+# Function to transcribe and score a stored recording and save the results
+def score_recording(job, record_id):
+    job.checkpoint('transcribing')
+    results = analyze_recording(record_id)
+    if results is None:
+        raise PermanentJobError('Recording not found')
+
+    job.checkpoint('saving')
+    save_score_to_db(
+        record_id, 
+        results['transcribed_text'], 
+        results['full_word_count'], 
+        results['similarity_percentage'], 
+        results['score'],
+        results['speech']
+    )
+    return {
+        'transcribed_text': results['transcribed_text'],
+        'word_count': results['full_word_count'],
+        'score': results['score'],
+        'similarity_percentage': results['similarity_percentage'],
+        'speech': results['speech'],
+        'record_id': record_id
+    }
+
+# Function to transcribe and score a stored recording without saving anything
+def analyze_recording(record_id):
+    audio_data, prompt = get_audio_from_db(record_id)
+    if not audio_data:
+        return None
+    return process_audio_data(audio_data, prompt)
+
+# Function to turn process_audio_data results into the stored update
+def results_update(results):
+    return score_update(results['transcribed_text'], results['full_word_count'],
+                        results['similarity_percentage'], results['score'], results['speech'])
+
+# Function to time a whole job, adding its per-stage breakdown (in ms) to the
+# result when the request asked for it with "timings": true
+def timed_job(kind, handler):
+    def run(job):
+        if not job.payload.get('timings'):
+            with stage(f'{kind}_job'):
+                return handler(job)
+        with collect_timings() as timings, stage(f'{kind}_job'):
+            result = handler(job)
+        result['timings'] = timings
+        return result
+    return run
+
+# Only one recording can use the microphone at a time
+job_queue.register('record', timed_job('record', run_recording_job), concurrency=1)
+job_queue.register('process', timed_job('process', run_processing_job))
+
+# Function to create the indexes the API queries rely on (idempotent)
+def ensure_indexes():
+    recordings_collection.create_index(
+        [('user_id', pymongo.ASCENDING), ('timestamp', pymongo.DESCENDING), ('_id', pymongo.DESCENDING)],
+        name='user_history'
+    )
+
+# Start-up work done with the first request: create indexes and start the job
+# workers, which pick up queued and interrupted jobs left by a previous process
+startup_lock = threading.Lock()
+started = False
+
+@app.before_request
+def start_background_services():
+    global started
+    if started:
+        return
+    with startup_lock:
+        if not started:
+            ensure_indexes()
+            job_queue.start()
+            started = True
+
+# Function to build the 202 response for a queued job
+def job_accepted(job_id):
+    return jsonify({
+        'message': 'Job queued',
+        'job_id': job_id,
+        'status_url': f'/jobs/{job_id}',
+        'events_url': f'/jobs/{job_id}/events'
+    }), 202
+
 # Create a HTML template for the home page
 @app.route('/')
 def home():
@@ -397,6 +522,7 @@ def home():
             
             <h3>Stats:</h3>
             <div id="word-count"></div>
+            <div id="speaking-time"></div>
             <div id="similarity"></div>
             <div id="score"></div>
             <div id="record-id" style="font-size: 12px; color: #888;"></div>
@@ -419,6 +545,7 @@ def home():
                     <!-- History data will be loaded here -->
                 </tbody>
             </table>
+            <button id="load-more-history" style="display: none; background-color: #3498db;">Load More</button>
         </div>
         
         <script>
@@ -475,6 +602,29 @@ def home():
                 document.getElementById('countdown-bar').style.backgroundColor = '#4CAF50'; // Reset color
             }}
             
+            // Follow a queued job over server-sent events until it finishes
+            function waitForJob(eventsUrl, onUpdate) {{
+                return new Promise((resolve, reject) => {{
+                    const source = new EventSource(eventsUrl);
+                    const handleEvent = event => {{
+                        const job = JSON.parse(event.data);
+                        if (onUpdate) onUpdate(job);
+                        if (job.status === 'done') {{
+                            source.close();
+                            resolve(job.result);
+                        }} else if (job.status === 'failed') {{
+                            source.close();
+                            reject(new Error(job.error));
+                        }}
+                    }};
+                    ['queued', 'running', 'done', 'failed'].forEach(name => source.addEventListener(name, handleEvent));
+                    source.onerror = () => {{
+                        source.close();
+                        reject(new Error('Lost connection to the job stream'));
+                    }};
+                }});
+            }}
+            
             document.getElementById('start-recording').addEventListener('click', function() {{
                 this.disabled = true;
                 document.getElementById('loading').style.display = 'none';
@@ -495,6 +645,13 @@ def home():
                     }})
                 }})
                 .then(response => response.json())
+                .then(data => waitForJob(data.events_url, job => {{
+                    // Recording is over once the job moves past the recording stage
+                    if (job.stage !== 'queued' && job.stage !== 'recording') {{
+                        stopCountdown();
+                        document.getElementById('loading').style.display = 'block';
+                    }}
+                }}))
                 .then(data => {{
                     // Stop countdown
                     stopCountdown();
@@ -503,6 +660,7 @@ def home():
                     document.getElementById('results').style.display = 'block';
                     document.getElementById('transcription').textContent = data.transcribed_text;
                     document.getElementById('word-count').textContent = 'Word Count: ' + data.word_count;
+                    document.getElementById('speaking-time').textContent = 'Speaking Time: ' + data.speech.speech_seconds.toFixed(1) + 's (' + (data.speech.speech_ratio * 100).toFixed(0) + '% of the recording)';
                     document.getElementById('similarity').textContent = 'Relevance to Topic: ' + data.similarity_percentage.toFixed(2) + '%';
                     document.getElementById('score').textContent = 'Overall Score: ' + data.score.toFixed(2) + '%';
                     document.getElementById('record-id').textContent = 'Record ID: ' + data.record_id;
@@ -520,6 +678,77 @@ def home():
                 }});
             }});
             
+            // Fetch one page of history (only the fields the table shows) and append it
+            function loadHistoryPage(cursor) {{
+                const userName = document.getElementById('user-name').value || 'anonymous';
+                const params = new URLSearchParams({{
+                    user_id: userName,
+                    limit: 20,
+                    fields: 'timestamp,prompt,score'
+                }});
+                if (cursor) params.set('cursor', cursor);
+                
+                return fetch('/get_history?' + params.toString())
+                .then(response => response.json())
+                .then(data => {{
+                    const historyBody = document.getElementById('history-body');
+                    const loadMore = document.getElementById('load-more-history');
+                    
+                    if (data.recordings.length === 0 && !cursor) {{
+                        historyBody.innerHTML = '<tr><td colspan="4">No recordings found</td></tr>';
+                    }} else {{
+                        data.recordings.forEach(recording => {{
+                            const row = document.createElement('tr');
+                            
+                            // Date column
+                            const dateCell = document.createElement('td');
+                            const recordDate = new Date(recording.timestamp);
+                            dateCell.textContent = recordDate.toLocaleString();
+                            row.appendChild(dateCell);
+                            
+                            // Prompt column
+                            const promptCell = document.createElement('td');
+                            promptCell.textContent = recording.prompt;
+                            row.appendChild(promptCell);
+                            
+                            // Score column
+                            const scoreCell = document.createElement('td');
+                            scoreCell.textContent = recording.score ? recording.score.toFixed(2) + '%' : 'N/A';
+                            row.appendChild(scoreCell);
+                            
+                            // Actions column
+                            const actionsCell = document.createElement('td');
+                            
+                            const playButton = document.createElement('button');
+                            playButton.textContent = 'Play';
+                            playButton.style.padding = '5px 10px';
+                            playButton.style.marginRight = '5px';
+                            playButton.addEventListener('click', function() {{
+                                window.location.href = '/play_audio/' + recording._id;
+                            }});
+                            actionsCell.appendChild(playButton);
+                            
+                            const viewButton = document.createElement('button');
+                            viewButton.textContent = 'Details';
+                            viewButton.style.padding = '5px 10px';
+                            viewButton.addEventListener('click', function() {{
+                                window.location.href = '/recording_details/' + recording._id;
+                            }});
+                            actionsCell.appendChild(viewButton);
+                            
+                            row.appendChild(actionsCell);
+                            historyBody.appendChild(row);
+                        }});
+                    }}
+                    
+                    loadMore.style.display = data.next_cursor ? 'inline-block' : 'none';
+                    loadMore.onclick = () => loadHistoryPage(data.next_cursor).catch(error => {{
+                        console.error('Error:', error);
+                        alert('Failed to load history.');
+                    }});
+                }});
+            }}
+            
             document.getElementById('view-history').addEventListener('click', function() {{
                 const historySection = document.getElementById('history-section');
                 
@@ -527,69 +756,11 @@ def home():
                     historySection.style.display = 'none';
                     this.textContent = 'View History';
                 }} else {{
-                    const userName = document.getElementById('user-name').value || 'anonymous';
+                    const historyBody = document.getElementById('history-body');
+                    historyBody.innerHTML = '';
                     
-                    fetch('/get_history', {{
-                        method: 'POST',
-                        headers: {{
-                            'Content-Type': 'application/json'
-                        }},
-                        body: JSON.stringify({{
-                            user_id: userName
-                        }})
-                    }})
-                    .then(response => response.json())
-                    .then(data => {{
-                        const historyBody = document.getElementById('history-body');
-                        historyBody.innerHTML = '';
-                        
-                        if (data.recordings.length === 0) {{
-                            historyBody.innerHTML = '<tr><td colspan="4">No recordings found</td></tr>';
-                        }} else {{
-                            data.recordings.forEach(recording => {{
-                                const row = document.createElement('tr');
-                                
-                                // Date column
-                                const dateCell = document.createElement('td');
-                                const recordDate = new Date(recording.timestamp);
-                                dateCell.textContent = recordDate.toLocaleString();
-                                row.appendChild(dateCell);
-                                
-                                // Prompt column
-                                const promptCell = document.createElement('td');
-                                promptCell.textContent = recording.prompt;
-                                row.appendChild(promptCell);
-                                
-                                // Score column
-                                const scoreCell = document.createElement('td');
-                                scoreCell.textContent = recording.score ? recording.score.toFixed(2) + '%' : 'N/A';
-                                row.appendChild(scoreCell);
-                                
-                                // Actions column
-                                const actionsCell = document.createElement('td');
-                                
-                                const playButton = document.createElement('button');
-                                playButton.textContent = 'Play';
-                                playButton.style.padding = '5px 10px';
-                                playButton.style.marginRight = '5px';
-                                playButton.addEventListener('click', function() {{
-                                    window.location.href = '/play_audio/' + recording._id;
-                                }});
-                                actionsCell.appendChild(playButton);
-                                
-                                const viewButton = document.createElement('button');
-                                viewButton.textContent = 'Details';
-                                viewButton.style.padding = '5px 10px';
-                                viewButton.addEventListener('click', function() {{
-                                    window.location.href = '/recording_details/' + recording._id;
-                                }});
-                                actionsCell.appendChild(viewButton);
-                                
-                                row.appendChild(actionsCell);
-                                historyBody.appendChild(row);
-                            }});
-                        }}
-                        
+                    loadHistoryPage(null)
+                    .then(() => {{
                         historySection.style.display = 'block';
                         this.textContent = 'Hide History';
                     }})
@@ -609,7 +780,7 @@ def home():
 def get_ice_breaker():
     return jsonify({'question': get_random_ice_breaker()})
 
-# API to start recording and process immediately
+# API to queue a recording; the record/transcribe/score pipeline runs in a worker
 @app.route('/start_recording', methods=['POST'])
 def start_recording():
     # Get the prompt and user ID from the request
@@ -617,57 +788,133 @@ def start_recording():
     prompt = data.get('prompt', '')
     user_id = data.get('user_id', 'anonymous')
     
-    audio_file = record_audio()
-    
-    # Save audio to MongoDB
-    record_id = save_audio_to_db(audio_file, user_id, prompt)
-    
-    # Process the recorded audio
-    results = process_audio_file(audio_file, prompt)
-    
-    # Save the results to MongoDB
-    save_score_to_db(
-        record_id, 
-        results['transcribed_text'], 
-        results['full_word_count'], 
-        results['similarity_percentage'], 
-        results['score']
+    payload = {'prompt': prompt, 'user_id': user_id}
+    if data.get('timings'):
+        payload['timings'] = True
+    job_id = job_queue.enqueue('record', payload)
+    return job_accepted(job_id)
+
+# API to poll a job's status (and its results once it is done)
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify(job)
+
+# API to follow a job as a server-sent-events stream
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    if not job_queue.get(job_id):
+        return jsonify({'message': 'Job not found'}), 404
+    return Response(
+        (sse_event(job) for job in job_queue.watch(job_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
     )
-    
-    return jsonify({
-        'message': 'Recording and processing completed',
-        'transcribed_text': results['transcribed_text'],
-        'word_count': results['full_word_count'],
-        'score': results['score'],
-        'similarity_percentage': results['similarity_percentage'],
-        'record_id': record_id
-    })
 
-# API to get user recording history
-@app.route('/get_history', methods=['POST'])
+# Prometheus scrape endpoint: per-stage and per-chunk latency histograms
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# API to summarize a user's progress from their aggregates (one document read)
+@app.route('/user_stats', methods=['GET'])
+def get_user_stats():
+    user_id = request.args.get('user_id', 'anonymous')
+    summary = user_stats.summary(user_id)
+    if summary is None:
+        return jsonify({'message': 'No scored recordings for this user'}), 404
+    return jsonify(summary)
+
+# API to report transcript cache hit/miss counters
+@app.route('/transcript_cache/stats', methods=['GET'])
+def transcript_cache_stats():
+    return jsonify(transcript_cache.stats())
+
+# History paging settings and the fields clients may select
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+HISTORY_FIELDS = ('prompt', 'timestamp', 'processed_at', 'score', 'word_count',
+                  'similarity_percentage', 'transcribed_text')
+
+# Function to encode the last row of a page as an opaque keyset cursor
+def encode_history_cursor(recording):
+    position = {'t': recording['timestamp'].isoformat(), 'i': str(recording['_id'])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+# Function to decode a history cursor; raises ValueError if it is malformed
+def decode_history_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(position['t']), ObjectId(position['i'])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+# API to get user recording history, newest first, one page at a time
+@app.route('/get_history', methods=['GET', 'POST'])
 def get_history():
-    data = request.get_json()
+    data = request.get_json(silent=True) or request.args
     user_id = data.get('user_id', 'anonymous')
     
-    # Query MongoDB for user recordings
-    recordings = list(recordings_collection.find(
-        {'user_id': user_id},
-        {'audio_data': 0}  # Exclude audio data for performance
-    ).sort('timestamp', -1))  # Sort by newest first
+    try:
+        limit = min(max(int(data.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({'message': 'limit must be an integer'}), 400
+    
+    # Field selection: a list or comma-separated string; defaults to every field
+    fields = data.get('fields') or HISTORY_FIELDS
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    elif not isinstance(fields, (list, tuple)) or not all(isinstance(field, str) for field in fields):
+        return jsonify({'message': 'fields must be a list of field names or a comma-separated string'}), 400
+    unknown = [field for field in fields if field not in HISTORY_FIELDS]
+    if unknown:
+        return jsonify({'message': f"Unknown fields: {', '.join(unknown)}"}), 400
+    projection = dict.fromkeys(fields, 1)
+    projection['timestamp'] = 1  # Needed for the cursor
+    
+    # Keyset pagination on the (user_id, timestamp, _id) index
+    query = {'user_id': user_id}
+    if data.get('cursor'):
+        try:
+            last_timestamp, last_id = decode_history_cursor(data['cursor'])
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        query['$or'] = [
+            {'timestamp': {'$lt': last_timestamp}},
+            {'timestamp': last_timestamp, '_id': {'$lt': last_id}}
+        ]
     
-    # Convert ObjectId to string for JSON serialization
+    recordings = list(recordings_collection.find(query, projection)
+                      .sort([('timestamp', -1), ('_id', -1)])
+                      .limit(limit + 1))
+    next_cursor = encode_history_cursor(recordings[limit - 1]) if len(recordings) > limit else None
+    recordings = recordings[:limit]
+    
+    # Convert ObjectId and datetimes for JSON serialization
     for recording in recordings:
         recording['_id'] = str(recording['_id'])
-        
-        # Convert datetime objects to ISO format strings
-        if 'timestamp' in recording:
-            recording['timestamp'] = recording['timestamp'].isoformat()
-        if 'processed_at' in recording:
-            recording['processed_at'] = recording['processed_at'].isoformat()
+        if 'timestamp' not in fields:
+            del recording['timestamp']
+        for field in ('timestamp', 'processed_at'):
+            if isinstance(recording.get(field), datetime):
+                recording[field] = recording[field].isoformat()
     
-    return jsonify({
-        'recordings': recordings
+    response = jsonify({
+        'recordings': recordings,
+        'next_cursor': next_cursor
     })
+    
+    # Let clients revalidate an unchanged page with If-None-Match
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    etag, _ = response.get_etag()
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': response.headers['ETag'],
+                                             'Cache-Control': response.headers['Cache-Control']})
+    return response
 
 # API to get the recorded audio file
 @app.route('/get_audio', methods=['GET'])
@@ -680,69 +927,46 @@ def get_audio():
 # API to play a specific recording
 @app.route('/play_audio/<record_id>', methods=['GET'])
 def play_audio(record_id):
-    audio_data, prompt = get_audio_from_db(record_id)
-    if audio_data:
-        # Create a response with the audio data
-        return Response(
-            audio_data,
-            mimetype='audio/wav',
-            headers={
-                'Content-Disposition': f'inline; filename=recording_{record_id}.wav'
-            }
-        )
+    audio = recording_store.open(record_id)
+    if audio:
+        extension = FILE_EXTENSIONS.get(audio.content_type, 'wav')
+        return stream_audio_response(audio, f'recording_{record_id}.{extension}')
     return jsonify({'message': 'Recording not found'}), 404
 
-# Page to view recording details
-@app.route('/recording_details/<record_id>', methods=['GET'])
-def recording_details(record_id):
-    # Get the recording from MongoDB
-    recording = recordings_collection.find_one({'_id': ObjectId(record_id)})
-    
-    if not recording:
-        return "Recording not found", 404
-    
-    # Format the data for display
-    timestamp = recording.get('timestamp', datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
-    prompt = recording.get('prompt', 'No prompt')
-    transcribed_text = recording.get('transcribed_text', 'Not transcribed')
-    word_count = recording.get('word_count', 'N/A')
-    similarity = recording.get('similarity_percentage', 'N/A')
-    score = recording.get('score', 'N/A')
-    
-    # Create the HTML page
-    return f"""
+# Recording details page, compiled once at import; values are autoescaped
+RECORDING_DETAILS_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
         <title>Recording Details</title>
         <style>
-            body {{
+            body {
                 font-family: Arial, sans-serif;
                 max-width: 800px;
                 margin: 0 auto;
                 padding: 20px;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #333;
-            }}
-            .details-container {{
+            }
+            .details-container {
                 background-color: #f9f9f9;
                 padding: 20px;
                 border-radius: 5px;
                 margin-top: 20px;
-            }}
-            .detail-row {{
+            }
+            .detail-row {
                 margin-bottom: 15px;
-            }}
-            .detail-label {{
+            }
+            .detail-label {
                 font-weight: bold;
                 display: inline-block;
                 width: 150px;
-            }}
-            .audio-container {{
+            }
+            .audio-container {
                 margin: 20px 0;
-            }}
-            button {{
+            }
+            button {
                 background-color: #4CAF50;
                 color: white;
                 padding: 10px 20px;
@@ -750,10 +974,10 @@ def recording_details(record_id):
                 border-radius: 5px;
                 cursor: pointer;
                 margin-top: 20px;
-            }}
-            button:hover {{
+            }
+            button:hover {
                 background-color: #45a049;
-            }}
+            }
         </style>
     </head>
     <body>
@@ -762,39 +986,46 @@ def recording_details(record_id):
         <div class="details-container">
             <div class="detail-row">
                 <span class="detail-label">Date:</span>
-                <span>{timestamp}</span>
+                <span>{{ timestamp }}</span>
             </div>
             
             <div class="detail-row">
                 <span class="detail-label">Prompt:</span>
-                <span>{prompt}</span>
+                <span>{{ prompt }}</span>
             </div>
             
             <div class="detail-row">
                 <span class="detail-label">Word Count:</span>
-                <span>{word_count}</span>
+                <span>{{ word_count }}</span>
+            </div>
+            
+            {% if speech_seconds is not none %}
+            <div class="detail-row">
+                <span class="detail-label">Speaking Time:</span>
+                <span>{{ speech_seconds }}s ({{ (speech_ratio * 100) | round | int }}% of the recording)</span>
             </div>
             
+            {% endif %}
             <div class="detail-row">
                 <span class="detail-label">Relevance:</span>
-                <span>{similarity}%</span>
+                <span>{{ similarity }}%</span>
             </div>
             
             <div class="detail-row">
                 <span class="detail-label">Score:</span>
-                <span>{score}%</span>
+                <span>{{ score }}%</span>
             </div>
         </div>
         
         <h2>Transcription</h2>
         <div class="details-container">
-            <p>{transcribed_text}</p>
+            <p>{{ transcribed_text }}</p>
         </div>
         
         <div class="audio-container">
             <h2>Audio Recording</h2>
             <audio controls>
-                <source src="/play_audio/{record_id}" type="audio/wav">
+                <source src="/play_audio/{{ record_id }}">
                 Your browser does not support the audio element.
             </audio>
         </div>
@@ -802,9 +1033,56 @@ def recording_details(record_id):
         <button onclick="window.location.href='/'">Back to Home</button>
     </body>
     </html>
-    """
+"""
+RECORDING_DETAILS_TEMPLATE = app.jinja_env.from_string(RECORDING_DETAILS_HTML)
+RECORDING_DETAILS_VERSION = hashlib.sha1(RECORDING_DETAILS_HTML.encode()).hexdigest()[:12]
+DETAILS_FIELDS = ('timestamp', 'prompt', 'transcribed_text', 'word_count', 'similarity_percentage',
+                  'score', 'speech_seconds', 'speech_ratio')
+
+# Function to render the details page of one version of a recording. A recording
+# only changes when it is (re)scored, so (record_id, processed_at) identifies the page.
+@lru_cache(maxsize=256)
+def render_recording_details(record_id, processed_at):
+    # Metadata only; the audio is streamed separately by /play_audio
+    recording = recordings_collection.find_one({'_id': ObjectId(record_id)}, dict.fromkeys(DETAILS_FIELDS, 1))
+    if not recording:
+        return None
+    return RECORDING_DETAILS_TEMPLATE.render(
+        record_id=record_id,
+        timestamp=recording.get('timestamp', datetime.now()).strftime('%Y-%m-%d %H:%M:%S'),
+        prompt=recording.get('prompt', 'No prompt'),
+        transcribed_text=recording.get('transcribed_text', 'Not transcribed'),
+        word_count=recording.get('word_count', 'N/A'),
+        similarity=recording.get('similarity_percentage', 'N/A'),
+        score=recording.get('score', 'N/A'),
+        speech_seconds=recording.get('speech_seconds'),
+        speech_ratio=recording.get('speech_ratio', 0)
+    )
+
+# Page to view recording details
+@app.route('/recording_details/<record_id>', methods=['GET'])
+def recording_details(record_id):
+    try:
+        recording = recordings_collection.find_one({'_id': ObjectId(record_id)}, {'processed_at': 1})
+    except InvalidId:
+        recording = None
+    if not recording:
+        return "Recording not found", 404
+
+    # Unchanged pages are revalidated without rendering or reading the metadata
+    processed_at = recording.get('processed_at')
+    version = processed_at.isoformat() if processed_at else 'unprocessed'
+    etag = hashlib.sha1(f"{RECORDING_DETAILS_VERSION}:{record_id}:{version}".encode()).hexdigest()
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
 
-# API to process existing audio file
+    html = render_recording_details(record_id, processed_at)
+    if html is None:
+        return "Recording not found", 404
+    return Response(html, mimetype='text/html', headers=headers)
+
+# API to queue processing of an existing audio file
 @app.route('/process_audio', methods=['GET', 'POST'])
 def process_existing_audio():
     data = request.get_json()
@@ -812,36 +1090,75 @@ def process_existing_audio():
     
     if record_id:
         # Process from MongoDB
-        audio_data, prompt = get_audio_from_db(record_id)
-        if not audio_data:
+        try:
+            recording = recordings_collection.find_one({'_id': ObjectId(record_id)}, {'_id': 1})
+        except (InvalidId, TypeError):
+            recording = None
+        if not recording:
             return jsonify({'message': 'Recording not found'}), 404
-        
-        results = process_audio_data(audio_data, prompt)
-        
-        # Save results to MongoDB
-        save_score_to_db(
-            record_id, 
-            results['transcribed_text'], 
-            results['full_word_count'], 
-            results['similarity_percentage'], 
-            results['score']
-        )
+        payload = {'record_id': record_id}
     else:
         # Process local file
         audio_file = os.path.join(app.config['UPLOAD_FOLDER'], 'recorded_audio.wav')
         if not os.path.exists(audio_file):
             return jsonify({'message': 'No recorded file found'}), 404
         
-        prompt = data.get('prompt', '')
-        
-        results = process_audio_file(audio_file, prompt)
+        payload = {'prompt': data.get('prompt', '')}
     
-    return jsonify({
-        'transcribed_text': results['transcribed_text'],
-        'word_count': results['full_word_count'],
-        'score': results['score'],
-        'similarity_percentage': results['similarity_percentage']
-    })
+    if data.get('timings'):
+        payload['timings'] = True
+    job_id = job_queue.enqueue('process', payload)
+    return job_accepted(job_id)
+
+# CLI: flask --app app migrate-recordings [--dry-run]
+@app.cli.command('migrate-recordings')
+@click.option('--dry-run', is_flag=True, help='List the records that would be migrated.')
+def migrate_recordings(dry_run):
+    """Move base64 audio stored inline in `recordings` into GridFS."""
+    migrated = recording_store.migrate_inline_audio(dry_run=dry_run, log=click.echo)
+    click.echo(f"{'Would migrate' if dry_run else 'Migrated'} {migrated} recording(s)")
+
+# CLI: flask --app app reprocess-recordings [--all] [--user NAME] [--restart]
+@app.cli.command('reprocess-recordings')
+@click.option('--all', 'include_current', is_flag=True, help='Also rescore records already on this pipeline version.')
+@click.option('--user', 'user_id', default=None, help='Only reprocess this user\'s recordings.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+@click.option('--batch-size', type=int, default=50, help='Results per bulk write and checkpoint.')
+@click.option('--limit', type=int, default=None, help='Stop after this many records.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an interrupted run.')
+def reprocess_recordings(include_current, user_id, workers, batch_size, limit, restart):
+    """Re-transcribe and rescore recordings scored by an older pipeline version."""
+    reprocessor = Reprocessor(
+        recordings_collection, db['reprocess_runs'], analyze_recording, results_update, PIPELINE_VERSION,
+        workers=workers or REPROCESS_WORKERS, batch_size=batch_size, log=click.echo
+    )
+    try:
+        reprocessor.run(user_id=user_id, include_current=include_current, restart=restart, limit=limit)
+    except KeyboardInterrupt:
+        click.echo("Interrupted; run the command again to resume from the last checkpoint")
+        return
+    # Bulk writes bypass save_score_to_db, so refresh the aggregates they changed
+    user_stats.rebuild(user_id, log=click.echo)
+
+# CLI: flask --app app rebuild-user-stats [--user NAME]
+@app.cli.command('rebuild-user-stats')
+@click.option('--user', 'user_id', default=None, help='Only rebuild this user\'s aggregates.')
+def rebuild_user_stats(user_id):
+    """Recompute per-user score aggregates from the recordings history."""
+    rebuilt = user_stats.rebuild(user_id, log=click.echo)
+    click.echo(f"Rebuilt aggregates for {rebuilt} user(s)")
+
+# CLI: flask --app app run-workers (a dedicated worker process, no HTTP server)
+@app.cli.command('run-workers')
+def run_workers():
+    """Run the job worker pool until interrupted."""
+    job_queue.start()
+    click.echo(f"Running {job_queue.workers} job worker(s); press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        job_queue.stop(timeout=5)
 
 if __name__ == '__main__':
     app.run(debug=True)
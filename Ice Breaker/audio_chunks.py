@@ -0,0 +1,96 @@
+import io
+import wave
+import numpy as np
+import speech_recognition as sr
+
+# NumPy dtypes for the PCM sample widths we can view without conversion
+SAMPLE_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+# Decoded PCM audio held in one buffer; every chunk is a view into it
+class PCMBuffer:
+    def __init__(self, frames, sample_rate, sample_width):
+        self.frames = memoryview(frames).cast('B')
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+
+    @property
+    def frame_count(self):
+        return len(self.frames) // self.sample_width
+
+    @property
+    def duration(self):
+        return self.frame_count / self.sample_rate
+
+    # Sample array sharing memory with the decoded buffer (no copy)
+    @property
+    def samples(self):
+        dtype = SAMPLE_DTYPES.get(self.sample_width)
+        if dtype is None:
+            return None
+        return np.frombuffer(self.frames, dtype=dtype)
+
+    # Slice the buffer into fixed-length windows without copying any frames
+    def chunks(self, chunk_length=120):
+        frames_per_chunk = int(chunk_length * self.sample_rate)
+        bytes_per_chunk = frames_per_chunk * self.sample_width
+        for start in range(0, len(self.frames), bytes_per_chunk):
+            yield self.frames[start:start + bytes_per_chunk]
+
+    # Wrap a frame slice as in-memory AudioData for the recognizer
+    def audio_data(self, frames=None):
+        if frames is None:
+            frames = self.frames
+        return sr.AudioData(frames, self.sample_rate, self.sample_width)
+
+
+# Function to decode WAV audio (a path, raw bytes or a file object) into a PCMBuffer
+def decode_wav(source):
+    if isinstance(source, (str, bytes, bytearray, memoryview)) or hasattr(source, '__fspath__'):
+        if isinstance(source, (bytearray, memoryview)):
+            source = bytes(source)
+        elif not isinstance(source, bytes):
+            with open(source, 'rb') as f:
+                source = f.read()
+        # BytesIO shares the memory of a bytes object instead of copying it
+        data = memoryview(source)
+        stream = io.BytesIO(source)
+    else:
+        data = None
+        stream = source
+
+    with wave.open(stream, 'rb') as wf:
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        sample_rate = wf.getframerate()
+        n_frames = wf.getnframes()
+        frame_bytes = n_frames * channels * sample_width
+
+        # After the header is parsed the stream sits at the start of the
+        # data chunk, so the frames can be referenced in place
+        if data is not None:
+            offset = stream.tell()
+            frames = data[offset:offset + frame_bytes]
+            if len(frames) != frame_bytes:
+                frames = wf.readframes(n_frames)
+        else:
+            frames = wf.readframes(n_frames)
+
+    if channels > 1:
+        frames = downmix(frames, channels, sample_width)
+
+    return PCMBuffer(frames, sample_rate, sample_width)
+
+
+# Function to average interleaved channels down to mono (the only copy we make)
+def downmix(frames, channels, sample_width):
+    dtype = SAMPLE_DTYPES.get(sample_width)
+    if dtype is None:
+        raise ValueError(f"Unsupported sample width for multi-channel audio: {sample_width}")
+    samples = np.frombuffer(frames, dtype=dtype).reshape(-1, channels)
+    return samples.mean(axis=1).astype(dtype).tobytes()
+
+
+# Function to split decoded audio into in-memory AudioData chunks
+def split_pcm(pcm, chunk_length=120):
+    return [pcm.audio_data(frames) for frames in pcm.chunks(chunk_length)]
@@ -0,0 +1,371 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import wave
+import numpy as np
+
+# Benchmarks are registered by name and run with: python benchmark.py <name> [...]
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+# Function to write a synthetic speech-like WAV (tone bursts over noise)
+def make_test_wav(path, seconds=120, sample_rate=44100, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = (np.sin(2 * np.pi * 0.5 * t) > 0).astype(np.float32)
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * envelope + 0.01 * rng.standard_normal(t.size)
+    samples = (signal * 32767).astype(np.int16)
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples.tobytes())
+    return path
+
+
+# Reset the kernel's peak-RSS watermark and return the current RSS in KB
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+    return _proc_status_kb('VmRSS')
+
+
+# Peak resident set size of this process in KB
+def peak_rss_kb():
+    peak = _proc_status_kb('VmHWM')
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak
+
+
+def _proc_status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# Run func(*args) in a fresh process so peak RSS is not shared between runs
+def run_isolated(func, *args):
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(c)), *(len(str(r[i])) for r in rows)) for i, c in enumerate(columns)]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+# --- Chunking: pydub export/re-read round trip vs in-memory PCM views ---
+
+def _chunk_with_pydub(audio_file, chunk_length=120):
+    import math
+    import speech_recognition as sr
+    from pydub import AudioSegment
+
+    baseline = reset_peak_rss() or peak_rss_kb()
+    start = time.perf_counter()
+    audio = AudioSegment.from_wav(audio_file)
+    num_chunks = math.ceil(len(audio) / 1000 / chunk_length)
+    chunks = []
+    workdir = tempfile.mkdtemp()
+    for i in range(num_chunks):
+        chunk = audio[i * chunk_length * 1000:min((i + 1) * chunk_length * 1000, len(audio))]
+        chunk_filename = os.path.join(workdir, f"chunk_{i}.wav")
+        chunk.export(chunk_filename, format="wav")
+        with sr.AudioFile(chunk_filename) as source:
+            chunks.append(sr.Recognizer().record(source))
+        os.remove(chunk_filename)
+    os.rmdir(workdir)
+    elapsed = time.perf_counter() - start
+    return elapsed, peak_rss_kb() - baseline, len(chunks)
+
+
+def _chunk_in_memory(audio_file, chunk_length=120):
+    from audio_chunks import decode_wav, split_pcm
+
+    baseline = reset_peak_rss() or peak_rss_kb()
+    start = time.perf_counter()
+    chunks = split_pcm(decode_wav(audio_file), chunk_length)
+    elapsed = time.perf_counter() - start
+    return elapsed, peak_rss_kb() - baseline, len(chunks)
+
+
+@benchmark('chunking')
+def bench_chunking(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_file = make_test_wav(os.path.join(tmp, 'bench.wav'), args.seconds, args.sample_rate)
+        print(f"{args.seconds} s @ {args.sample_rate} Hz, {os.path.getsize(audio_file) / 1e6:.1f} MB WAV, "
+              f"{args.chunk_length} s chunks, best of {args.repeat}")
+        rows = []
+        for label, func in (('pydub + chunk files', _chunk_with_pydub),
+                            ('in-memory views', _chunk_in_memory)):
+            runs = [run_isolated(func, audio_file, args.chunk_length) for _ in range(args.repeat)]
+            elapsed, rss, count = min(runs)
+            rows.append((label, count, f"{elapsed * 1000:.1f}", f"{rss / 1024:.1f}"))
+        print_table(rows, ('path', 'chunks', 'wall ms', 'peak RSS +MB'))
+
+
+# --- Transcription: sequential vs bounded concurrent STT against a fake ---
+
+@benchmark('transcription')
+def bench_transcription(args):
+    from audio_chunks import decode_wav, split_pcm
+    from transcription import FakeRecognizer, transcribe_chunks
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_file = make_test_wav(os.path.join(tmp, 'bench.wav'), args.seconds, args.sample_rate)
+        chunks = split_pcm(decode_wav(audio_file), args.chunk_length)
+
+    print(f"{len(chunks)} chunks of {args.chunk_length} s, fake STT latency {args.latency * 1000:.0f} ms")
+    rows = []
+    expected = baseline = None
+    for max_in_flight in sorted({1, 2, 4, args.max_in_flight}):
+        recognizer = FakeRecognizer(latency=args.latency)
+        start = time.perf_counter()
+        texts = transcribe_chunks(chunks, recognizer, max_in_flight)
+        elapsed = time.perf_counter() - start
+        expected = expected or texts
+        baseline = baseline or elapsed
+        rows.append((max_in_flight, recognizer.max_in_flight, f"{elapsed * 1000:.0f}",
+                     f"{baseline / elapsed:.2f}x",
+                     'yes' if texts == expected else 'NO'))
+    print_table(rows, ('max in flight', 'observed', 'wall ms', 'speedup', 'same order'))
+
+
+# --- Similarity: character SequenceMatcher vs token/n-gram vectors ---
+
+BENCH_WORDS = ("travel hobby music family friends learn skill book movie challenge goal advice weekend "
+               "tradition culture history future lesson mistake passion cooking painting hiking football "
+               "camera garden village city ocean mountain school teacher project team practice").split()
+
+
+# Function to generate a deterministic rambling transcript of `words` words
+def make_transcript(words, seed):
+    rng = np.random.default_rng(seed)
+    filler = ['i', 'really', 'think', 'that', 'the', 'and', 'my', 'was', 'it', 'a', 'to', 'of']
+    vocab = np.array(BENCH_WORDS + filler)
+    return ' '.join(rng.choice(vocab, size=words))
+
+
+@benchmark('similarity')
+def bench_similarity(args):
+    from similarity import batch_similarity, stem, text_similarity
+
+    # Inflections of one word must share a stem, or token mode under-scores them
+    for forms in (('place', 'places', 'placed', 'placing'), ('change', 'changes', 'changing'),
+                  ('box', 'boxes'), ('story', 'stories'), ('travel', 'travels', 'traveling', 'travelled')):
+        assert len({stem(word) for word in forms}) == 1, forms
+    assert text_similarity("I love places", "I love place", mode='token') > 0.99
+
+    prompt = "Tell us about a hobby you're passionate about."
+    transcripts = [make_transcript(args.words, seed) for seed in range(args.batch)]
+    print(f"{args.batch} transcripts of {args.words} words against one prompt")
+
+    rows = []
+    for label, func in (('sequence (legacy)', lambda t: text_similarity(prompt, t, mode='sequence')),
+                        ('token cosine', lambda t: text_similarity(prompt, t, mode='token', method='cosine')),
+                        ('token jaccard', lambda t: text_similarity(prompt, t, mode='token', method='jaccard'))):
+        start = time.perf_counter()
+        for text in transcripts:
+            func(text)
+        elapsed = time.perf_counter() - start
+        rows.append((label, 'per call', f"{elapsed / len(transcripts) * 1e6:.0f}"))
+
+    start = time.perf_counter()
+    batch_similarity(prompt, transcripts)
+    elapsed = time.perf_counter() - start
+    rows.append(('token cosine', f'batch of {len(transcripts)}', f"{elapsed / len(transcripts) * 1e6:.0f}"))
+    print_table(rows, ('engine', 'mode', 'us per transcript'))
+
+
+# --- Storage: raw/base64 WAV vs archival copy + 16 kHz derivative ---
+
+@benchmark('storage')
+def bench_storage(args):
+    import base64
+    from audio_chunks import decode_wav
+    from ingest import decode_audio, encode_archive, encode_flac, to_stt_pcm
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_file = make_test_wav(os.path.join(tmp, 'bench.wav'), args.seconds, args.sample_rate)
+        with open(audio_file, 'rb') as f:
+            wav = f.read()
+
+    def timed(func, *func_args):
+        start = time.perf_counter()
+        value = func(*func_args)
+        return value, (time.perf_counter() - start) * 1000
+
+    pcm, decode_ms = timed(decode_wav, wav)
+    stt_pcm, resample_ms = timed(to_stt_pcm, pcm)
+    stt_flac, stt_encode_ms = timed(encode_flac, stt_pcm)
+    _, stt_decode_ms = timed(decode_audio, stt_flac)
+    archives = {}
+    for archive_format in ('flac', 'opus'):
+        (data, content_type), encode_ms = timed(encode_archive, pcm, archive_format)
+        if archive_format == 'flac' or content_type == 'audio/ogg':
+            archives[archive_format] = (data, encode_ms)
+
+    print(f"{args.seconds} s @ {args.sample_rate} Hz mono 16-bit")
+    rows = [('stored: WAV as base64 in BSON (old)', len(base64.b64encode(wav)), '-', '-')]
+    for archive_format, (data, encode_ms) in archives.items():
+        rows.append((f'stored: {archive_format} archive + 16 kHz FLAC', len(data) + len(stt_flac),
+                     f"{encode_ms + resample_ms + stt_encode_ms:.0f}", '-'))
+    if 'opus' not in archives:
+        rows.append(('stored: opus archive', 'n/a (ffmpeg missing)', '-', '-'))
+    old_upload, old_upload_ms = timed(encode_flac, pcm)
+    rows.append((f'STT upload: FLAC @ {args.sample_rate} Hz (old)', len(old_upload), f"{old_upload_ms:.0f}", f"{decode_ms:.0f}"))
+    rows.append(('STT upload: FLAC @ 16 kHz derivative', len(stt_flac), '-', f"{stt_decode_ms:.0f}"))
+    print_table(rows, ('what', 'bytes', 'encode ms', 'decode ms'))
+
+
+# --- Recording: fixed-length capture vs streaming with a trailing-silence stop ---
+
+@benchmark('recording')
+def bench_recording(args):
+    from recorder import FileSource, StreamingRecorder
+
+    max_seconds = 120
+    with tempfile.TemporaryDirectory() as tmp:
+        # The fake device plays args.seconds of speech, then silence
+        speech = make_test_wav(os.path.join(tmp, 'speech.wav'), args.seconds, args.sample_rate)
+        source = FileSource(speech, speed=args.speed)
+        recorder = StreamingRecorder(source, max_seconds=max_seconds)
+        start = time.perf_counter()
+        recording = recorder.record(os.path.join(tmp, 'recorded.wav'))
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(recording.path)
+
+    fixed_size = 44 + int(max_seconds * args.sample_rate) * 2
+    print(f"{args.seconds} s of speech @ {args.sample_rate} Hz, device replayed at {args.speed}x real time")
+    rows = [
+        ('fixed sd.rec (old)', max_seconds, f"{max_seconds / args.speed:.2f}", fixed_size, 'max_duration', 0),
+        ('streaming recorder', f"{recording.duration:.1f}", f"{elapsed:.2f}", size,
+         recording.stop_reason, recording.dropped_blocks),
+    ]
+    print_table(rows, ('recorder', 'audio s', 'blocked s', 'file bytes', 'stop', 'dropped'))
+
+
+# --- VAD: bytes sent to STT with and without voice activity trimming ---
+
+# Function to build practice-like audio: a slow start, answers separated by long
+# pauses, then silence until the recorder stops
+def make_practice_pcm(seconds, sample_rate, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    cycle = t % 12
+    talking = (t > 3) & (t < seconds * 0.8) & (cycle < 8)
+    syllables = np.sin(2 * np.pi * 4 * t) > -0.3
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * talking * syllables + 0.003 * rng.standard_normal(t.size)
+    return (signal * 32767).astype(np.int16)
+
+
+@benchmark('vad')
+def bench_vad(args):
+    from audio_chunks import PCMBuffer
+    from ingest import encode_flac
+    from vad import trim_silence
+
+    pcm = PCMBuffer(make_practice_pcm(args.seconds, args.sample_rate), args.sample_rate, 2)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        speech = trim_silence(pcm, enabled=True)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    report = speech.report()
+    print(f"{args.seconds} s @ {args.sample_rate} Hz; VAD took {min(timings):.1f} ms (best of {args.repeat}); "
+          f"speech {report['speech_seconds']} s, silence {report['silence_seconds']} s, "
+          f"ratio {report['speech_ratio']:.2f}")
+    rows = []
+    for label, audio in (('untrimmed (old)', pcm), ('VAD-trimmed', speech.pcm)):
+        chunks = len(list(audio.chunks(args.chunk_length)))
+        rows.append((label, f"{audio.duration:.1f}", len(audio.frames), len(encode_flac(audio)), chunks))
+    print_table(rows, ('audio sent to STT', 'seconds', 'PCM bytes', 'FLAC bytes', 'chunks'))
+
+
+# --- Metrics: cost of timing a stage ---
+
+@benchmark('metrics')
+def bench_metrics(args):
+    from metrics import Registry, stage, collect_timings
+
+    registry = Registry()
+    histogram = registry.histogram('bench_seconds', 'Benchmark histogram.', ['stage'])
+    n = args.batch * 1000
+    rows = []
+
+    start = time.perf_counter()
+    for _ in range(n):
+        pass
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        histogram.observe(i * 1e-6, stage='bench')
+    rows.append(('Histogram.observe', f"{(time.perf_counter() - start - baseline) / n * 1e9:.0f}"))
+
+    start = time.perf_counter()
+    for _ in range(n):
+        with stage('bench'):
+            pass
+    rows.append(('with stage(...)', f"{(time.perf_counter() - start - baseline) / n * 1e9:.0f}"))
+
+    with collect_timings():
+        start = time.perf_counter()
+        for _ in range(n):
+            with stage('bench'):
+                pass
+        rows.append(('with stage(...) + per-request timings', f"{(time.perf_counter() - start - baseline) / n * 1e9:.0f}"))
+
+    start = time.perf_counter()
+    text = registry.render()
+    rows.append(('render /metrics (1 series)', f"{(time.perf_counter() - start) * 1e9:.0f}"))
+    print(f"{n} iterations; a recording goes through ~10 timed stages")
+    print_table(rows, ('operation', 'ns each'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ice Breaker pipeline benchmarks")
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--seconds', type=float, default=120)
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--chunk-length', type=float, default=None,
+                        help="chunk size in seconds (default: 120, or 15 for 'transcription')")
+    parser.add_argument('--latency', type=float, default=0.5, help='fake STT latency in seconds')
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--words', type=int, default=200, help='words per synthetic transcript')
+    parser.add_argument('--batch', type=int, default=500, help='number of transcripts to score')
+    parser.add_argument('--speed', type=float, default=20, help='fake device replay speed for recording')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    if args.chunk_length is None:
+        args.chunk_length = 15 if args.name == 'transcription' else 120
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
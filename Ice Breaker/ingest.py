@@ -0,0 +1,130 @@
+import io
+import math
+import os
+import subprocess
+import numpy as np
+import speech_recognition as sr
+from audio_chunks import PCMBuffer, decode_wav
+
+# Transcription always runs on one 16 kHz mono derivative made at ingest time
+STT_SAMPLE_RATE = 16000
+
+# Archival copy: 'opus' (lossy, needs ffmpeg) or 'flac' (lossless)
+ARCHIVE_FORMAT = os.getenv('ARCHIVE_FORMAT', 'opus')
+ARCHIVE_BITRATE = os.getenv('ARCHIVE_BITRATE', '32k')
+
+CONTENT_TYPES = {'wav': 'audio/wav', 'flac': 'audio/flac', 'opus': 'audio/ogg'}
+FILE_EXTENSIONS = {'audio/wav': 'wav', 'audio/flac': 'flac', 'audio/ogg': 'ogg'}
+
+
+# The stored forms of one recording
+class IngestedAudio:
+    def __init__(self, archive, archive_type, stt_audio, stt_type, duration):
+        self.archive = archive
+        self.archive_type = archive_type
+        self.stt_audio = stt_audio
+        self.stt_type = stt_type
+        self.duration = duration
+
+
+# Function to turn a recorded WAV into an archival copy plus the 16 kHz STT derivative
+def ingest_audio(source, archive_format=None):
+    pcm = decode_wav(source)
+    archive, archive_type = encode_archive(pcm, archive_format or ARCHIVE_FORMAT)
+    stt_pcm = to_stt_pcm(pcm)
+    stt_audio = encode_flac(stt_pcm)
+    return IngestedAudio(archive, archive_type, stt_audio, CONTENT_TYPES['flac'], pcm.duration)
+
+
+# Function to encode the archival copy; falls back to FLAC if Opus cannot be encoded
+def encode_archive(pcm, archive_format):
+    if archive_format == 'opus':
+        try:
+            return encode_opus(pcm), CONTENT_TYPES['opus']
+        except Exception as e:
+            print(f"Opus encoding failed, archiving as FLAC instead: {e}")
+    return encode_flac(pcm), CONTENT_TYPES['flac']
+
+
+# Function to encode PCM as FLAC with the converter bundled with SpeechRecognition
+def encode_flac(pcm):
+    return pcm.audio_data().get_flac_data()
+
+
+# Function to encode PCM as Ogg/Opus through pydub (requires ffmpeg)
+def encode_opus(pcm):
+    from pydub import AudioSegment
+
+    segment = AudioSegment(data=bytes(pcm.frames), sample_width=pcm.sample_width,
+                           frame_rate=pcm.sample_rate, channels=1)
+    output = io.BytesIO()
+    segment.export(output, format='opus', codec='libopus', bitrate=ARCHIVE_BITRATE)
+    return output.getvalue()
+
+
+# Function to decode stored audio (WAV or FLAC, detected from its header) into PCM
+def decode_audio(source):
+    if isinstance(source, (bytes, bytearray, memoryview)) and bytes(source[:4]) == b'fLaC':
+        return decode_flac(source)
+    return decode_wav(source)
+
+
+# Function to decode FLAC bytes into PCM with the bundled FLAC converter
+def decode_flac(data):
+    process = subprocess.run(
+        [sr.audio.get_flac_converter(), '--decode', '--stdout', '--totally-silent', '-'],
+        input=bytes(data),
+        stdout=subprocess.PIPE,
+        check=True
+    )
+    return decode_wav(process.stdout)
+
+
+# Function to convert decoded audio to 16-bit mono PCM at the STT sample rate
+def to_stt_pcm(pcm, sample_rate=STT_SAMPLE_RATE):
+    samples = pcm.samples
+    if pcm.sample_width != 2:
+        samples = np.frombuffer(pcm.audio_data().get_raw_data(convert_width=2), dtype=np.int16)
+    resampled = resample(samples, pcm.sample_rate, sample_rate)
+    return PCMBuffer(resampled.tobytes(), sample_rate, 2)
+
+
+# Function to resample int16 audio by FFT, one ~10 s block at a time. Each block
+# is resampled with a margin on both sides that is then discarded, so block
+# edges leave no artifacts and memory stays bounded for long recordings.
+def resample(samples, src_rate, dst_rate, block_seconds=10, margin_seconds=0.1):
+    if src_rate == dst_rate:
+        return samples
+    g = math.gcd(src_rate, dst_rate)
+    up, down = dst_rate // g, src_rate // g
+
+    n_out = len(samples) * up // down
+    out = np.empty(n_out, dtype=np.int16)
+    block_in = down * max(1, round(block_seconds * src_rate / down))
+    pad_in = down * max(1, math.ceil(margin_seconds * src_rate / down))
+    block_out = block_in * up // down
+    pad_out = pad_in * up // down
+    segment_in = block_in + 2 * pad_in
+    segment_out = segment_in * up // down
+
+    for block_start in range(0, len(samples), block_in):
+        # Block plus margins, zero-padded where it runs past either end
+        segment = np.zeros(segment_in, dtype=np.float64)
+        lo = block_start - pad_in
+        src_lo, src_hi = max(lo, 0), min(lo + segment_in, len(samples))
+        segment[src_lo - lo:src_hi - lo] = samples[src_lo:src_hi]
+
+        # Keep only the spectrum below the target Nyquist frequency
+        spectrum = np.fft.rfft(segment)
+        bins = segment_out // 2 + 1
+        if bins <= len(spectrum):
+            spectrum = spectrum[:bins]
+        else:
+            spectrum = np.concatenate([spectrum, np.zeros(bins - len(spectrum), dtype=spectrum.dtype)])
+        resampled = np.fft.irfft(spectrum, segment_out) * (segment_out / segment_in)
+
+        out_start = block_start * up // down
+        count = min(block_out, n_out - out_start)
+        block = resampled[pad_out:pad_out + count]
+        out[out_start:out_start + count] = np.clip(np.round(block), -32768, 32767)
+    return out
@@ -0,0 +1,243 @@
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+import pymongo
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+
+TERMINAL_STATUSES = ('done', 'failed')
+
+
+# Handle given to a job handler: its payload plus a way to persist progress
+class JobContext:
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.id = job['_id']
+        self.payload = job.get('payload', {})
+        self.attempts = job.get('attempts', 1)
+
+    # Record the current stage and merge fields into the stored payload, so a
+    # retried job can pick up where the previous attempt stopped
+    def checkpoint(self, stage, **fields):
+        self.payload.update(fields)
+        update = {'stage': stage, 'updated_at': datetime.now()}
+        update.update({f'payload.{key}': value for key, value in fields.items()})
+        self.queue.jobs.update_one({'_id': self.id}, {'$set': update})
+
+
+# Mongo-backed job queue; jobs outlive the process that enqueued or ran them.
+# A running job holds a lease that its worker renews; if the process dies the
+# lease expires and another worker (or the restarted process) claims the job.
+class JobQueue:
+    def __init__(self, collection, workers=JOB_WORKERS, lease_seconds=JOB_LEASE_SECONDS,
+                 max_attempts=JOB_MAX_ATTEMPTS, poll_interval=0.5):
+        self.jobs = collection
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handlers = {}
+        self._slots = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+        self._threads = []
+
+    # Register handler(context) -> result dict for a job kind; `concurrency`
+    # caps how many jobs of that kind this process runs at once
+    def register(self, kind, handler, concurrency=None):
+        self.handlers[kind] = handler
+        self._slots[kind] = threading.Semaphore(concurrency or self.workers)
+
+    def enqueue(self, kind, payload):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.now()
+        result = self.jobs.insert_one({
+            'kind': kind,
+            'payload': payload,
+            'status': 'queued',
+            'stage': 'queued',
+            'attempts': 0,
+            'created_at': now,
+            'updated_at': now
+        })
+        return str(result.inserted_id)
+
+    # Function to get a job snapshot; None if there is no such job (or the id is malformed)
+    def get(self, job_id):
+        try:
+            job = self.jobs.find_one({'_id': ObjectId(job_id)})
+        except InvalidId:
+            return None
+        return serialize_job(job) if job else None
+
+    # Start the worker and lease-renewal threads (safe to call repeatedly)
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.jobs.create_index([('status', pymongo.ASCENDING), ('created_at', pymongo.ASCENDING)])
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._renew_leases, name='job-leases', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    # Yield job snapshots whenever the status or stage changes, until it finishes
+    def watch(self, job_id, interval=0.5, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            marker = (job['status'], job['stage'])
+            if marker != last:
+                last = marker
+                yield job
+            if job['status'] in TERMINAL_STATUSES:
+                return
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            time.sleep(interval)
+
+    def _claim(self, kinds):
+        now = datetime.now()
+        return self.jobs.find_one_and_update(
+            {
+                'kind': {'$in': kinds},
+                '$or': [
+                    {'status': 'queued'},
+                    {'status': 'running', 'lease_expires': {'$lt': now}}
+                ]
+            },
+            {
+                '$set': {
+                    'status': 'running',
+                    'worker': self.worker_id,
+                    'lease_expires': now + timedelta(seconds=self.lease_seconds),
+                    'started_at': now,
+                    'updated_at': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('created_at', pymongo.ASCENDING)],
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+
+    def _work(self):
+        while not self._stop.is_set():
+            # Only claim kinds that still have a free slot in this process
+            acquired = [kind for kind, slot in self._slots.items() if slot.acquire(blocking=False)]
+            job = None
+            try:
+                if acquired:
+                    job = self._claim(acquired)
+            except pymongo.errors.PyMongoError as e:
+                print(f"Job queue unavailable: {e}")
+            finally:
+                for kind in acquired:
+                    if job is None or job['kind'] != kind:
+                        self._slots[kind].release()
+
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            try:
+                self._run(job)
+            finally:
+                self._slots[job['kind']].release()
+
+    def _run(self, job):
+        with self._lock:
+            self._running.add(job['_id'])
+        try:
+            if job['attempts'] > self.max_attempts:
+                raise RuntimeError(f"Gave up after {job['attempts'] - 1} attempts")
+            result = self.handlers[job['kind']](JobContext(self, job))
+            self._finish(job, 'done', result=result)
+        except Exception as e:
+            traceback.print_exc()
+            if job['attempts'] < self.max_attempts and not isinstance(e, PermanentJobError):
+                self._finish(job, 'queued', error=str(e))
+            else:
+                self._finish(job, 'failed', error=str(e))
+        finally:
+            with self._lock:
+                self._running.discard(job['_id'])
+
+    def _finish(self, job, status, result=None, error=None):
+        update = {'status': status, 'updated_at': datetime.now()}
+        if status in TERMINAL_STATUSES:
+            update['stage'] = status
+            update['finished_at'] = update['updated_at']
+        if result is not None:
+            update['result'] = result
+        if error is not None:
+            update['error'] = error
+        self.jobs.update_one(
+            {'_id': job['_id'], 'worker': self.worker_id},
+            {'$set': update, '$unset': {'lease_expires': '', 'worker': ''}}
+        )
+
+    def _renew_leases(self):
+        interval = max(self.lease_seconds / 3, 1)
+        while not self._stop.wait(interval):
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                self.jobs.update_many(
+                    {'_id': {'$in': running}, 'worker': self.worker_id},
+                    {'$set': {'lease_expires': datetime.now() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except pymongo.errors.PyMongoError as e:
+                print(f"Could not renew job leases: {e}")
+
+
+# Raised by a handler when retrying the job cannot help
+class PermanentJobError(Exception):
+    pass
+
+
+# Function to convert a job document into JSON-friendly form
+def serialize_job(job):
+    data = {
+        'job_id': str(job['_id']),
+        'kind': job['kind'],
+        'status': job['status'],
+        'stage': job.get('stage', job['status']),
+        'attempts': job.get('attempts', 0),
+        'result': job.get('result'),
+        'error': job.get('error')
+    }
+    for field in ('created_at', 'started_at', 'finished_at'):
+        if job.get(field):
+            data[field] = job[field].isoformat()
+    return data
+
+
+# Function to format a job snapshot as a server-sent event
+def sse_event(job):
+    return f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
@@ -0,0 +1,156 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import ContextDecorator, contextmanager
+
+# Histogram buckets in seconds, from sub-millisecond stages up to a full recording
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CHUNK_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# Monotonic counter with an optional set of labels
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(map(labels.get, self.labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, _format_labels(self.labels, key), value
+
+
+# Histogram with fixed buckets. observe() bumps a single bucket; the cumulative
+# counts Prometheus expects are only computed when the metrics are scraped.
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(map(labels.get, self.labels))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                yield f'{self.name}_bucket', _format_labels(self.labels, key, [('le', le)]), cumulative
+            yield f'{self.name}_sum', _format_labels(self.labels, key), values[-1]
+            yield f'{self.name}_count', _format_labels(self.labels, key), cumulative
+
+
+# Set of metrics exposed together in the Prometheus text format
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=STAGE_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('icebreaker_stage_seconds', 'Time spent in each pipeline stage.', ['stage'])
+STAGE_ERRORS = REGISTRY.counter('icebreaker_stage_errors_total', 'Pipeline stages that raised an exception.', ['stage'])
+CHUNK_SECONDS = REGISTRY.histogram('icebreaker_stt_chunk_seconds', 'STT latency of each audio chunk.',
+                                   ['outcome'], CHUNK_BUCKETS)
+CHUNK_AUDIO_SECONDS = REGISTRY.counter('icebreaker_stt_audio_seconds_total', 'Seconds of audio sent to STT.')
+
+# Stage timings of the request (job) running in the current context, if collected
+_timings = contextvars.ContextVar('timings', default=None)
+
+
+# Time a pipeline stage; works as a `with` block or as a function decorator
+class stage(ContextDecorator):
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.name)
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        timings = _timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+        return False
+
+    # Each decorated call gets its own timer, so concurrent calls do not share one
+    def _recreate_cm(self):
+        return stage(self.name)
+
+
+# Collect the stages timed inside the block into a dict of milliseconds
+@contextmanager
+def collect_timings():
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+        for name in timings:
+            timings[name] = round(timings[name] * 1000, 2)
@@ -0,0 +1,177 @@
+import os
+import queue
+import threading
+import time
+import wave
+import numpy as np
+from audio_chunks import decode_wav
+
+# Stop once the speaker has been quiet this long (after saying something)
+SILENCE_STOP_SECONDS = float(os.getenv('SILENCE_STOP_SECONDS', '5'))
+# Blocks quieter than this (RMS, dB relative to full scale) count as silence
+SILENCE_THRESHOLD_DBFS = float(os.getenv('SILENCE_THRESHOLD_DBFS', '-45'))
+# 'microphone' or the path of a WAV file to replay as a fake input device
+AUDIO_SOURCE = os.getenv('AUDIO_SOURCE', 'microphone')
+
+BLOCK_SECONDS = 0.1
+RING_BUFFER_SECONDS = 10
+
+
+# Input device backed by sounddevice; calls callback(bytes) for every block
+class MicrophoneSource:
+    def __init__(self, sample_rate, channels=1, block_seconds=BLOCK_SECONDS):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = int(sample_rate * block_seconds)
+        self._stream = None
+
+    def start(self, callback):
+        import sounddevice as sd
+
+        def on_block(indata, frames, time_info, status):
+            # indata is reused by PortAudio, so hand over a copy
+            callback(indata.tobytes())
+
+        self._stream = sd.InputStream(samplerate=self.sample_rate, channels=self.channels, dtype='int16',
+                                      blocksize=self.block_frames, callback=on_block)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+# Fake input device that replays a WAV file block by block from its own thread,
+# like a real device callback. Once the file runs out it keeps delivering
+# silence, as a microphone in a quiet room would. speed scales the replay rate
+# (2.0 = twice real time); speed=None delivers blocks without any pacing.
+class FileSource:
+    def __init__(self, path, speed=1.0, block_seconds=BLOCK_SECONDS):
+        self.pcm = decode_wav(path)
+        self.sample_rate = self.pcm.sample_rate
+        self.channels = 1
+        self.speed = speed
+        self.block_frames = int(self.sample_rate * block_seconds)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), name='file-audio-source', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, callback):
+        block_bytes = self.block_frames * self.pcm.sample_width
+        frames = self.pcm.frames
+        silence = bytes(block_bytes)
+        interval = None if not self.speed else self.block_frames / self.sample_rate / self.speed
+        next_time = time.monotonic()
+        offset = 0
+        while not self._stop.is_set():
+            if offset < len(frames):
+                block = bytes(frames[offset:offset + block_bytes])
+                offset += block_bytes
+            else:
+                block = silence
+            callback(block)
+            if interval is not None:
+                next_time += interval
+                self._stop.wait(max(0.0, next_time - time.monotonic()))
+
+
+# Function to pick the configured audio source
+def open_audio_source(source=AUDIO_SOURCE, sample_rate=44100, channels=1):
+    if source == 'microphone':
+        return MicrophoneSource(sample_rate, channels)
+    return FileSource(source)
+
+
+# Result of one streamed recording
+class RecordedAudio:
+    def __init__(self, path, duration, stop_reason, dropped_blocks):
+        self.path = path
+        self.duration = duration
+        self.stop_reason = stop_reason
+        self.dropped_blocks = dropped_blocks
+
+
+# Records from a source into a WAV file while it is being captured. The device
+# callback only pushes blocks into a bounded ring buffer (it never blocks; a
+# full buffer drops the block and counts it); the recording thread drains it,
+# appends each block to the file and stops after trailing silence, a stop()
+# call or max_seconds, whichever comes first.
+class StreamingRecorder:
+    def __init__(self, source, max_seconds=120, silence_seconds=SILENCE_STOP_SECONDS,
+                 threshold_dbfs=SILENCE_THRESHOLD_DBFS, buffer_seconds=RING_BUFFER_SECONDS):
+        self.source = source
+        self.max_seconds = max_seconds
+        self.silence_seconds = silence_seconds
+        # Compare mean squares instead of dB so no log is taken per block
+        self.threshold_power = (32768.0 * 10 ** (threshold_dbfs / 20)) ** 2
+        block_seconds = source.block_frames / source.sample_rate
+        self._blocks = queue.Queue(maxsize=max(1, int(buffer_seconds / block_seconds)))
+        self._stop = threading.Event()
+        self.dropped_blocks = 0
+
+    def stop(self):
+        self._stop.set()
+
+    def record(self, path):
+        sample_rate, channels = self.source.sample_rate, self.source.channels
+        max_frames = int(self.max_seconds * sample_rate)
+        silence_frames = int(self.silence_seconds * sample_rate)
+        frames_written = 0
+        quiet_frames = 0
+        heard_speech = False
+        stop_reason = 'stopped'
+
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(channels)
+            wf.setsampwidth(2)
+            wf.setframerate(sample_rate)
+            self.source.start(self._on_block)
+            try:
+                while not self._stop.is_set():
+                    try:
+                        block = self._blocks.get(timeout=0.5)
+                    except queue.Empty:
+                        continue
+                    samples = np.frombuffer(block, dtype=np.int16)
+                    samples = samples[:(max_frames - frames_written) * channels]
+                    # writeframes patches the header, so the file is valid at every point
+                    wf.writeframes(samples.tobytes())
+                    frames = len(samples) // channels
+                    frames_written += frames
+
+                    power = np.dot(samples, samples.astype(np.float64)) / len(samples) if len(samples) else 0.0
+                    if power >= self.threshold_power:
+                        heard_speech = True
+                        quiet_frames = 0
+                    else:
+                        quiet_frames += frames
+
+                    if frames_written >= max_frames:
+                        stop_reason = 'max_duration'
+                        break
+                    if heard_speech and quiet_frames >= silence_frames:
+                        stop_reason = 'silence'
+                        break
+            finally:
+                self.source.stop()
+
+        return RecordedAudio(path, frames_written / sample_rate, stop_reason, self.dropped_blocks)
+
+    # Runs on the audio thread: must not block
+    def _on_block(self, block):
+        try:
+            self._blocks.put_nowait(block)
+        except queue.Full:
+            self.dropped_blocks += 1
@@ -0,0 +1,170 @@
+import base64
+import io
+from datetime import datetime
+import gridfs
+from bson.objectid import ObjectId
+
+# GridFS chunk size; also the block size used when streaming playback
+AUDIO_CHUNK_SIZE = 255 * 1024
+
+
+# Open handle on a stored recording: a seekable file object plus its metadata
+class StoredAudio:
+    def __init__(self, fileobj, length, content_type, prompt=''):
+        self.fileobj = fileobj
+        self.length = length
+        self.content_type = content_type
+        self.prompt = prompt
+
+    # Yield the bytes in [start, stop) one block at a time
+    def iter_range(self, start=0, stop=None, block_size=AUDIO_CHUNK_SIZE):
+        stop = self.length if stop is None else min(stop, self.length)
+        try:
+            self.fileobj.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                block = self.fileobj.read(min(block_size, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+        finally:
+            self.close()
+
+    def read(self):
+        try:
+            self.fileobj.seek(0)
+            return self.fileobj.read()
+        finally:
+            self.close()
+
+    def close(self):
+        self.fileobj.close()
+
+
+# Recording metadata lives in `recordings`; the audio bytes live in a GridFS bucket
+class RecordingStore:
+    def __init__(self, db, collection_name='recordings', bucket_name='recording_audio'):
+        self.recordings = db[collection_name]
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name, chunk_size_bytes=AUDIO_CHUNK_SIZE)
+
+    # Store audio (a path, bytes or file object) and return the new record ID.
+    # `stt_audio` is an optional transcription-ready derivative stored alongside.
+    def save(self, audio, user_id="anonymous", prompt="", content_type='audio/wav',
+             stt_audio=None, stt_content_type='audio/flac'):
+        record_id = ObjectId()
+        file_id, length = self._upload(record_id, audio, content_type)
+        record = {
+            '_id': record_id,
+            'user_id': user_id,
+            'prompt': prompt,
+            'audio_file_id': file_id,
+            'audio_length': length,
+            'content_type': content_type,
+            'stored_bytes': length,
+            'timestamp': datetime.now()
+        }
+        if stt_audio is not None:
+            stt_file_id, stt_length = self._upload(record_id, stt_audio, stt_content_type, variant='stt')
+            record.update({
+                'stt_file_id': stt_file_id,
+                'stt_length': stt_length,
+                'stt_content_type': stt_content_type,
+                'stored_bytes': length + stt_length
+            })
+        self.recordings.insert_one(record)
+        return str(record_id)
+
+    # Open a recording for reading; returns None if it has no audio.
+    # variant='stt' opens the transcription derivative, falling back to the
+    # archival copy for recordings stored before derivatives existed.
+    def open(self, record_id, variant='archive'):
+        record = self.recordings.find_one(
+            {'_id': ObjectId(record_id)},
+            {'audio_file_id': 1, 'audio_data': 1, 'content_type': 1, 'prompt': 1,
+             'stt_file_id': 1, 'stt_content_type': 1}
+        )
+        if not record:
+            return None
+
+        prompt = record.get('prompt', '')
+        file_id = record.get('audio_file_id')
+        content_type = record.get('content_type', 'audio/wav')
+        if variant == 'stt' and 'stt_file_id' in record:
+            file_id = record['stt_file_id']
+            content_type = record.get('stt_content_type', 'audio/flac')
+
+        if file_id is not None:
+            try:
+                grid_out = self.bucket.open_download_stream(file_id)
+            except gridfs.errors.NoFile:
+                return None
+            return StoredAudio(grid_out, grid_out.length, content_type, prompt)
+
+        # Records that predate GridFS still carry base64 audio inline
+        if 'audio_data' in record:
+            audio_data = base64.b64decode(record['audio_data'])
+            return StoredAudio(io.BytesIO(audio_data), len(audio_data), content_type, prompt)
+        return None
+
+    # Read a whole recording into memory; returns (audio bytes, prompt)
+    def read(self, record_id, variant='archive'):
+        audio = self.open(record_id, variant)
+        if audio is None:
+            return None, None
+        return audio.read(), audio.prompt
+
+    # Move inline base64 audio into GridFS; returns the number of records migrated
+    def migrate_inline_audio(self, dry_run=False, log=print):
+        migrated = 0
+        # Collect the IDs first so a long migration cannot outlive the cursor
+        pending = [record['_id'] for record in self.recordings.find({'audio_data': {'$exists': True}}, {'_id': 1})]
+        for record_id in pending:
+            doc = self.recordings.find_one({'_id': record_id, 'audio_data': {'$exists': True}},
+                                           {'audio_data': 1, 'content_type': 1})
+            if not doc:
+                continue  # Migrated concurrently
+
+            audio_data = base64.b64decode(doc['audio_data'])
+            if dry_run:
+                log(f"Would migrate {record_id} ({len(audio_data)} bytes)")
+                migrated += 1
+                continue
+
+            # Drop any upload left behind by an interrupted earlier run
+            for orphan in self.bucket.find({'metadata.record_id': record_id}):
+                self.bucket.delete(orphan._id)
+
+            content_type = doc.get('content_type', 'audio/wav')
+            file_id, length = self._upload(record_id, audio_data, content_type)
+            result = self.recordings.update_one(
+                {'_id': record_id, 'audio_data': {'$exists': True}},
+                {'$set': {'audio_file_id': file_id, 'audio_length': length, 'content_type': content_type,
+                          'stored_bytes': length},
+                 '$unset': {'audio_data': ''}}
+            )
+            if result.modified_count:
+                migrated += 1
+                log(f"Migrated {record_id} ({length} bytes)")
+            else:
+                self.bucket.delete(file_id)
+        return migrated
+
+    def _upload(self, record_id, audio, content_type, variant='archive'):
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(audio)
+        elif hasattr(audio, 'read'):
+            source = audio
+        else:
+            source = open(audio, 'rb')
+        try:
+            file_id = self.bucket.upload_from_stream(
+                f"recording_{record_id}" if variant == 'archive' else f"recording_{record_id}_{variant}",
+                source,
+                metadata={'record_id': record_id, 'content_type': content_type, 'variant': variant}
+            )
+            length = source.tell()
+        finally:
+            if source is not audio:
+                source.close()
+        return file_id, length
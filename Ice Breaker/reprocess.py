@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import time
+from datetime import datetime
+import pymongo
+
+REPROCESS_WORKERS = int(os.getenv('REPROCESS_WORKERS', str(os.cpu_count() or 1)))
+REPROCESS_BATCH_SIZE = 50
+ID_PAGE_SIZE = 500
+
+
+# Function to build the query for recordings that have audio but were scored by
+# an older pipeline (or never scored)
+def stale_query(pipeline_version, user_id=None, include_current=False):
+    query = {'$or': [{'audio_file_id': {'$exists': True}}, {'audio_data': {'$exists': True}}]}
+    if not include_current:
+        query = {'$and': [query, {'$or': [
+            {'pipeline_version': {'$exists': False}},
+            {'pipeline_version': {'$lt': pipeline_version}}
+        ]}]}
+    if user_id:
+        query['user_id'] = user_id
+    return query
+
+
+# Runs in a pool process: analyze(record_id) -> (results, error)
+def _run_one(task):
+    analyze, record_id = task
+    try:
+        return record_id, analyze(record_id), None
+    except Exception as e:
+        return record_id, None, str(e)
+
+
+# Re-runs the scoring pipeline over stored recordings. Record IDs are streamed
+# from Mongo in _id order, analyzed in a process pool (results come back in
+# order) and written back with one bulk_write per batch. After every batch the
+# last written _id is checkpointed, so an interrupted run resumes after it.
+class Reprocessor:
+    def __init__(self, recordings, checkpoints, analyze, to_update, pipeline_version,
+                 workers=REPROCESS_WORKERS, batch_size=REPROCESS_BATCH_SIZE, log=print):
+        self.recordings = recordings
+        self.checkpoints = checkpoints
+        self.analyze = analyze  # record_id -> results, or None if it has no audio
+        self.to_update = to_update  # results -> update document
+        self.pipeline_version = pipeline_version
+        self.workers = workers
+        self.batch_size = batch_size
+        self.log = log
+
+    def run(self, run_id=None, user_id=None, include_current=False, restart=False, limit=None):
+        run_id = run_id or f"pipeline-v{self.pipeline_version}" + (f"-{user_id}" if user_id else '')
+        query = stale_query(self.pipeline_version, user_id, include_current)
+        state = None if restart else self.checkpoints.find_one({'_id': run_id})
+        if state and state.get('finished_at'):
+            state = None  # A finished run starts over and picks up anything stale
+        last_id = state['last_id'] if state else None
+        totals = {'processed': state['processed'], 'failed': state['failed']} if state else {'processed': 0, 'failed': 0}
+        if state:
+            self.log(f"Resuming {run_id} after {last_id} ({totals['processed']} already processed)")
+        else:
+            self.checkpoints.replace_one(
+                {'_id': run_id},
+                {'last_id': None, 'processed': 0, 'failed': 0, 'started_at': datetime.now(), 'updated_at': datetime.now()},
+                upsert=True
+            )
+
+        started = time.monotonic()
+        done = 0
+        tasks = ((self.analyze, record_id) for record_id in self._pending_ids(query, last_id, limit))
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(self.workers) as pool:
+            batch = []
+            for record_id, results, error in pool.imap(_run_one, tasks):
+                if error or results is None:
+                    self.log(f"Failed {record_id}: {error or 'no audio'}")
+                    totals['failed'] += 1
+                else:
+                    batch.append(pymongo.UpdateOne({'_id': record_id}, self.to_update(results)))
+                last_id = record_id
+                done += 1
+                if done % self.batch_size == 0:
+                    totals['processed'] += self._flush(run_id, batch, last_id, totals)
+                    batch = []
+                    self._report(done, totals, started)
+            totals['processed'] += self._flush(run_id, batch, last_id, totals)
+
+        self.checkpoints.update_one({'_id': run_id}, {'$set': {'finished_at': datetime.now()}})
+        self._report(done, totals, started)
+        return totals
+
+    # Write one batch of results, then move the checkpoint past it
+    def _flush(self, run_id, batch, last_id, totals):
+        written = 0
+        if batch:
+            self.recordings.bulk_write(batch, ordered=False)
+            written = len(batch)
+        self.checkpoints.update_one(
+            {'_id': run_id},
+            {'$set': {'last_id': last_id, 'processed': totals['processed'] + written,
+                      'failed': totals['failed'], 'updated_at': datetime.now()}}
+        )
+        return written
+
+    # Page through matching IDs by _id so no cursor stays open for the whole run
+    def _pending_ids(self, query, after, limit):
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_query = dict(query, _id={'$gt': after}) if after is not None else query
+            page_size = ID_PAGE_SIZE if remaining is None else min(ID_PAGE_SIZE, remaining)
+            page = [doc['_id'] for doc in
+                    self.recordings.find(page_query, {'_id': 1}).sort('_id', pymongo.ASCENDING).limit(page_size)]
+            if not page:
+                return
+            yield from page
+            after = page[-1]
+            if remaining is not None:
+                remaining -= len(page)
+
+    def _report(self, done, totals, started):
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.log(f"{done} record(s) this run, {totals['processed']} written, {totals['failed']} failed; "
+                 f"{rate:.2f} records/s")
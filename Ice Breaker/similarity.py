@@ -0,0 +1,149 @@
+import hashlib
+import os
+from functools import lru_cache
+from difflib import SequenceMatcher
+import numpy as np
+
+# 'token' scores normalized word/n-gram vectors; 'sequence' is the original
+# character-level SequenceMatcher ratio, kept for comparing against old scores
+SIMILARITY_MODE = os.getenv('SIMILARITY_MODE', 'token')
+SIMILARITY_METHOD = os.getenv('SIMILARITY_METHOD', 'cosine')  # 'cosine' or 'jaccard'
+NGRAM_SIZES = (1, 2)
+
+# Everything but ASCII letters, digits and apostrophes separates words
+WORD_BREAKS = str.maketrans({chr(i): ' ' for i in range(128)
+                             if not (chr(i).isalnum() or chr(i) == "'")})
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just let
+me more most my myself no nor not now of off on once only or other our ours ourselves out over
+own really same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up us very was we were what when where which
+while who whom why will with would you your yours yourself yourselves um uh like yeah okay
+""".split())
+VERB_SUFFIXES = ('edly', 'ing', 'ed')
+
+
+# Function to reduce a word to a crude stem so "place"/"places"/"placed" and
+# "traveling"/"travelled"/"travels" match. The plural ending goes first ("es"
+# only after s/x/z/ch/sh, "ies" -> "y"), then a verb ending, and a final
+# doubled letter or "e" is dropped so "placing" and "place" meet at "plac".
+@lru_cache(maxsize=65536)
+def stem(word):
+    if word.endswith(('ies', 'ied')) and len(word) > 4:
+        return word[:-3] + 'y'  # stories/studied -> story/study
+    if word.endswith('es') and word[:-2].endswith(('s', 'x', 'z', 'ch', 'sh')) and len(word) > 4:
+        word = word[:-2]  # boxes -> box
+    elif word.endswith('s') and not word.endswith(('ss', 'us', 'is')) and len(word) > 3:
+        word = word[:-1]  # places -> place, feelings -> feeling
+    for suffix in VERB_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 3 and word[-1] == word[-2]:
+        word = word[:-1]  # travell -> travel
+    if len(word) > 3 and word[-1] == 'e':
+        word = word[:-1]  # place -> plac
+    return word
+
+
+# A stem's ID is a 56-bit hash of it, so IDs need no shared table: they are the
+# same in every thread and process. Raw words are cached straight to their ID
+# (-1 = stopword); the cache is dropped when full and simply refills.
+_WORD_IDS = {}
+WORD_ID_CACHE_SIZE = 65536
+NGRAM_MASK = (1 << 56) - 1
+
+
+def _word_id(raw):
+    word = raw.strip("'").split("'")[0]
+    if not word or word in STOPWORDS:
+        token_id = -1
+    else:
+        token_id = int.from_bytes(hashlib.blake2b(stem(word).encode(), digest_size=7).digest(), 'little')
+    if len(_WORD_IDS) >= WORD_ID_CACHE_SIZE:
+        _WORD_IDS.clear()
+    _WORD_IDS[raw] = token_id
+    return token_id
+
+
+# Function to encode text as an array of word/n-gram feature IDs. Unigrams keep
+# their stem ID; an n-gram is a rolling hash of its stem IDs tagged with n in the
+# top bits, so features can be counted and matched as plain integers.
+def feature_ids(text, ngram_sizes=NGRAM_SIZES):
+    words = text.lower().translate(WORD_BREAKS).split()
+    ids = list(map(_WORD_IDS.get, words))
+    if None in ids:
+        ids = [_word_id(w) if i is None else i for i, w in zip(ids, words)]
+    tokens = np.fromiter(ids, dtype=np.int64, count=len(ids))
+    tokens = tokens[tokens >= 0]
+    parts = []
+    for n in ngram_sizes:
+        if n == 1:
+            parts.append(tokens)
+        elif len(tokens) >= n:
+            count = len(tokens) - n + 1
+            code = tokens[:count].copy()
+            for k in range(1, n):
+                code = code * 1000003 + tokens[k:k + count]
+            parts.append((code & NGRAM_MASK) | (n << 56))
+    return np.concatenate(parts) if parts else tokens
+
+
+# Prompts repeat constantly, so their sorted features and counts are memoized
+@lru_cache(maxsize=1024)
+def prompt_vector(prompt, ngram_sizes=NGRAM_SIZES):
+    return np.unique(feature_ids(prompt, ngram_sizes), return_counts=True)
+
+
+# Function to score many transcripts against one prompt in a single vectorized pass.
+# Features are counted per (document, feature) pair with np.unique, so no dense
+# document-by-vocabulary matrix is ever built.
+def batch_similarity(prompt, texts, method=SIMILARITY_METHOD, ngram_sizes=NGRAM_SIZES):
+    texts = list(texts)
+    scores = np.zeros(len(texts))
+    prompt_feats, prompt_counts = prompt_vector(prompt, tuple(ngram_sizes))
+    if not len(prompt_feats) or not texts:
+        return scores
+
+    doc_feats = [feature_ids(text, ngram_sizes) for text in texts]
+    lengths = np.array([len(f) for f in doc_feats])
+    if not lengths.sum():
+        return scores
+    feats = np.concatenate(doc_feats)
+    docs = np.repeat(np.arange(len(texts)), lengths)
+
+    # Compact feature IDs, then unique (doc, feature) pairs with their counts
+    vocab, compact = np.unique(feats, return_inverse=True)
+    pair_keys, counts = np.unique(docs * len(vocab) + compact, return_counts=True)
+    pair_docs = pair_keys // len(vocab)
+    pair_vocab = vocab[pair_keys % len(vocab)]
+
+    # Position of each pair's feature in the prompt, if it occurs there
+    pos = np.minimum(np.searchsorted(prompt_feats, pair_vocab), len(prompt_feats) - 1)
+    in_prompt = prompt_feats[pos] == pair_vocab
+
+    if method == 'jaccard':
+        inter = np.bincount(pair_docs[in_prompt], minlength=len(texts))
+        sizes = np.bincount(pair_docs, minlength=len(texts))
+        union = len(prompt_feats) + sizes - inter
+        np.divide(inter, union, out=scores, where=union > 0)
+        return scores
+
+    # Cosine similarity of term-count vectors
+    counts = counts.astype(float)
+    dots = np.bincount(pair_docs[in_prompt], weights=counts[in_prompt] * prompt_counts[pos[in_prompt]],
+                       minlength=len(texts))
+    norms = np.sqrt(np.bincount(pair_docs, weights=counts * counts, minlength=len(texts)))
+    denom = norms * np.sqrt(np.dot(prompt_counts, prompt_counts))
+    np.divide(dots, denom, out=scores, where=denom > 0)
+    return scores
+
+
+# Function to calculate similarity between two texts (0.0 - 1.0)
+def text_similarity(text1, text2, mode=None, method=SIMILARITY_METHOD):
+    mode = mode or SIMILARITY_MODE
+    if mode == 'sequence':
+        return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
+    return float(batch_similarity(text1, [text2], method)[0])
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import pymongo
+
+TRANSCRIPT_CACHE_SIZE = int(os.getenv('TRANSCRIPT_CACHE_SIZE', '256'))
+TRANSCRIPT_CACHE_TTL_DAYS = int(os.getenv('TRANSCRIPT_CACHE_TTL_DAYS', '90'))
+
+
+# Function to build a cache key from the decoded PCM and the recognizer settings
+def transcript_key(pcm, settings):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    digest.update(f"{pcm.sample_rate}:{pcm.sample_width}:".encode('ascii'))
+    digest.update(pcm.frames)
+    return digest.hexdigest()
+
+
+# Two-tier transcript cache: an in-process LRU in front of a MongoDB collection.
+# Entries are the per-chunk texts, so a hit reproduces the transcription exactly.
+class TranscriptCache:
+    def __init__(self, collection=None, max_entries=TRANSCRIPT_CACHE_SIZE, ttl_days=TRANSCRIPT_CACHE_TTL_DAYS):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl_days = ttl_days
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._indexed = False
+        self.counters = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0}
+
+    def get(self, key):
+        with self._lock:
+            texts = self._entries.get(key)
+            if texts is not None:
+                self._entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return list(texts)
+
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one_and_update(
+                    {'_id': key},
+                    {'$set': {'last_used': datetime.now()}},
+                    projection={'texts': 1}
+                )
+            except pymongo.errors.PyMongoError as e:
+                print(f"Transcript cache lookup failed: {e}")
+                doc = None
+            if doc:
+                self._remember(key, doc['texts'])
+                with self._lock:
+                    self.counters['db_hits'] += 1
+                return list(doc['texts'])
+
+        with self._lock:
+            self.counters['misses'] += 1
+        return None
+
+    def put(self, key, texts):
+        texts = list(texts)
+        self._remember(key, texts)
+        with self._lock:
+            self.counters['stores'] += 1
+        if self.collection is None:
+            return
+        try:
+            self._ensure_index()
+            now = datetime.now()
+            self.collection.update_one(
+                {'_id': key},
+                {'$set': {'texts': texts, 'last_used': now}, '$setOnInsert': {'created_at': now}},
+                upsert=True
+            )
+        except pymongo.errors.PyMongoError as e:
+            print(f"Transcript cache store failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['db_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, texts):
+        with self._lock:
+            self._entries[key] = texts
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Entries unused for ttl_days expire from the MongoDB tier
+    def _ensure_index(self):
+        if self._indexed:
+            return
+        self.collection.create_index('last_used', expireAfterSeconds=self.ttl_days * 86400)
+        self._indexed = True
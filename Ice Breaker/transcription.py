@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import speech_recognition as sr
+from metrics import CHUNK_SECONDS, CHUNK_AUDIO_SECONDS
+
+# Maximum number of chunks sent to the STT service at once (1 = sequential)
+STT_MAX_IN_FLIGHT = int(os.getenv('STT_MAX_IN_FLIGHT', '4'))
+
+
+# Recognizer settings that affect the transcript (part of the transcript cache key)
+STT_SETTINGS = {'engine': 'google', 'language': 'en-US'}
+
+
+# Default recognizer: Google Web Speech API through SpeechRecognition
+def google_recognizer(audio_data):
+    return sr.Recognizer().recognize_google(audio_data, language=STT_SETTINGS['language'])
+
+
+# Function to describe a recognizer for cache keys; custom recognizers can set `settings`
+def recognizer_settings(recognizer=None):
+    if recognizer is None:
+        return dict(STT_SETTINGS)
+    settings = getattr(recognizer, 'settings', None)
+    if settings is None:
+        settings = {'engine': getattr(recognizer, '__qualname__', type(recognizer).__qualname__)}
+    return dict(settings)
+
+
+# Local stand-in for the STT service with injectable latency
+class FakeRecognizer:
+    def __init__(self, latency=0.5, transcribe=None):
+        self.latency = latency
+        self.transcribe = transcribe or (lambda audio_data: f"chunk of {len(audio_data.frame_data)} bytes")
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, audio_data):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            return self.transcribe(audio_data)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+# Function to recognize one chunk; service errors are raised to the caller
+def recognize_chunk(audio, recognizer=None):
+    recognizer = recognizer or google_recognizer
+    if isinstance(audio, sr.AudioData):
+        audio_data = audio
+    else:
+        with sr.AudioFile(audio) as source:
+            audio_data = sr.Recognizer().record(source)
+    CHUNK_AUDIO_SECONDS.inc(len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width))
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        text = recognizer(audio_data)
+        outcome = 'ok'
+        return text
+    except sr.UnknownValueError:
+        outcome = 'unrecognized'
+        print(f"Could not understand audio chunk ({len(audio_data.frame_data)} bytes)")
+        return ""
+    finally:
+        CHUNK_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+
+
+# Function to convert audio to text
+def audio_to_text(audio, recognizer=None):
+    try:
+        return recognize_chunk(audio, recognizer)
+    except sr.RequestError as e:
+        print(f"Google STT API request failed: {e}")
+        return ""
+
+
+# Function to transcribe chunks concurrently, returning the texts in chunk order
+def transcribe_chunks(chunks, recognizer=None, max_in_flight=None):
+    return transcribe_chunks_checked(chunks, recognizer, max_in_flight)[0]
+
+
+# Same as transcribe_chunks, but also returns how many chunks hit a service error
+def transcribe_chunks_checked(chunks, recognizer=None, max_in_flight=None):
+    if max_in_flight is None:
+        max_in_flight = STT_MAX_IN_FLIGHT
+    max_in_flight = max(1, min(max_in_flight, len(chunks)))
+
+    def transcribe(chunk):
+        try:
+            return recognize_chunk(chunk, recognizer), False
+        except sr.RequestError as e:
+            print(f"Google STT API request failed: {e}")
+            return "", True
+
+    if max_in_flight == 1:
+        results = [transcribe(chunk) for chunk in chunks]
+    else:
+        # The pool size bounds the requests in flight; map() keeps input order
+        with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='stt') as pool:
+            results = list(pool.map(transcribe, chunks))
+
+    texts = [text for text, _ in results]
+    failed = sum(1 for _, error in results if error)
+    return texts, failed
@@ -0,0 +1,131 @@
+import math
+import os
+from datetime import datetime
+import pymongo
+
+# Number of most recent scores kept per user for the trend
+USER_STATS_WINDOW = int(os.getenv('USER_STATS_WINDOW', '10'))
+
+
+# Per-user running aggregates, kept next to `recordings` so a progress summary is
+# one document read. Sums (not means) are stored so a rescored recording can be
+# applied as a delta: count, score sum and sum of squares, word count total, the
+# best score and a window of the latest scores. Only the aggregates (and a new
+# score's window entry) are written in one atomic update; a rescore's window
+# entry and the best score are separate follow-up updates, so a failure between
+# them can leave those stale until rebuild() (`flask rebuild-user-stats`).
+class UserStats:
+    def __init__(self, collection, recordings, window=USER_STATS_WINDOW):
+        self.stats = collection
+        self.recordings = recordings
+        self.window = window
+
+    # Apply one recording's (re)score; previous_* are its values before this save.
+    # Call it after the recording itself has been updated. Up to three updates:
+    # the aggregates, a rescore's window entry, then the best score.
+    def record_score(self, user_id, record_id, score, word_count, previous_score=None, previous_word_count=None):
+        rescored = previous_score is not None
+        old_score = previous_score or 0
+        old_words = previous_word_count or 0
+        update = {
+            '$inc': {
+                'count': 0 if rescored else 1,
+                'score_sum': score - old_score,
+                'score_sumsq': score * score - old_score * old_score,
+                'word_count_sum': word_count - old_words
+            },
+            '$set': {'updated_at': datetime.now()}
+        }
+        if not rescored:
+            update['$push'] = {'recent': {'$each': [{'record_id': record_id, 'score': score}], '$slice': -self.window}}
+        result = self.stats.update_one({'_id': user_id}, update, upsert=not rescored)
+        if result.upserted_id is not None or not result.matched_count:
+            # First score seen for this user: older history may predate the
+            # aggregates, so compute them from the recordings once
+            self.rebuild(user_id, log=lambda message: None)
+            return
+
+        if rescored:
+            # Replace the score in the window if the recording is still in it
+            self.stats.update_one({'_id': user_id, 'recent.record_id': record_id},
+                                  {'$set': {'recent.$.score': score}})
+
+        # Conditional, so concurrent saves cannot lower the best score. A rescore
+        # that lowers the best recording leaves it in place until rebuild().
+        self.stats.update_one(
+            {'_id': user_id, '$or': [{'best_score': {'$lt': score}}, {'best_score': {'$exists': False}}]},
+            {'$set': {'best_score': score, 'best_record_id': record_id}}
+        )
+
+    # Summary derived from the stored aggregates; None if the user has no scores
+    def summary(self, user_id):
+        doc = self.stats.find_one({'_id': user_id})
+        if not doc or not doc.get('count'):
+            return None
+        count = doc['count']
+        mean = doc['score_sum'] / count
+        variance = max(doc['score_sumsq'] / count - mean * mean, 0.0)
+        recent = [entry['score'] for entry in doc.get('recent', [])]
+        return {
+            'user_id': user_id,
+            'count': count,
+            'mean_score': round(mean, 2),
+            'score_variance': round(variance, 2),
+            'score_stddev': round(math.sqrt(variance), 2),
+            'best_score': doc.get('best_score'),
+            'best_record_id': str(doc['best_record_id']) if doc.get('best_record_id') else None,
+            'total_words': doc.get('word_count_sum', 0),
+            'mean_word_count': round(doc.get('word_count_sum', 0) / count, 2),
+            'recent_scores': recent,
+            'trend': round(trend(recent), 3)
+        }
+
+    # Recompute every user's aggregates (or one user's) from the recordings history
+    def rebuild(self, user_id=None, log=print):
+        match = {'score': {'$exists': True}}
+        if user_id is not None:
+            match['user_id'] = user_id
+        totals = self.recordings.aggregate([
+            {'$match': match},
+            {'$group': {
+                '_id': '$user_id',
+                'count': {'$sum': 1},
+                'score_sum': {'$sum': '$score'},
+                'score_sumsq': {'$sum': {'$multiply': ['$score', '$score']}},
+                'word_count_sum': {'$sum': {'$ifNull': ['$word_count', 0]}}
+            }}
+        ])
+        rebuilt = []
+        for doc in totals:
+            user_match = dict(match, user_id=doc['_id'])
+            latest = self.recordings.find(user_match, {'score': 1}) \
+                .sort([('timestamp', pymongo.DESCENDING), ('_id', pymongo.DESCENDING)]).limit(self.window)
+            best = self.recordings.find_one(user_match, {'score': 1}, sort=[('score', pymongo.DESCENDING)])
+            doc.update({
+                'recent': [{'record_id': r['_id'], 'score': r['score']} for r in reversed(list(latest))],
+                'best_score': best['score'],
+                'best_record_id': best['_id'],
+                'updated_at': datetime.now()
+            })
+            self.stats.replace_one({'_id': doc['_id']}, doc, upsert=True)
+            rebuilt.append(doc['_id'])
+            log(f"Rebuilt stats for {doc['_id']} ({doc['count']} recording(s))")
+
+        # Users left without any scored recording have no stats
+        stale = {'_id': {'$nin': rebuilt}}
+        if user_id is not None:
+            stale['_id']['$eq'] = user_id
+        self.stats.delete_many(stale)
+        return len(rebuilt)
+
+
+# Function to compute the least-squares slope of scores over recordings (points per recording)
+def trend(scores):
+    n = len(scores)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(scores) / n
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(scores))
+    variance = sum((x - mean_x) ** 2 for x in range(n))
+    return covariance / variance
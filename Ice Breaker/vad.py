@@ -0,0 +1,100 @@
+import os
+import numpy as np
+from audio_chunks import PCMBuffer
+
+# Voice activity trimming before STT; set VAD_ENABLED=0 to send the audio untouched
+VAD_ENABLED = os.getenv('VAD_ENABLED', '1') != '0'
+VAD_FRAME_MS = 30
+# A frame is speech if it is this much louder than the noise floor (the quietest
+# 10% of frames), and never if it is below VAD_FLOOR_DBFS
+VAD_MARGIN_DB = float(os.getenv('VAD_MARGIN_DB', '10'))
+VAD_FLOOR_DBFS = float(os.getenv('VAD_FLOOR_DBFS', '-50'))
+# Silence kept on each side of speech, and the shortest pause that gets cut
+VAD_PAD_SECONDS = float(os.getenv('VAD_PAD_SECONDS', '0.25'))
+VAD_MIN_SILENCE_SECONDS = float(os.getenv('VAD_MIN_SILENCE_SECONDS', '1.0'))
+
+
+# Speech found in a recording, plus the trimmed audio to send to STT
+class VoiceActivity:
+    def __init__(self, pcm, speech_seconds, total_seconds):
+        self.pcm = pcm
+        self.speech_seconds = speech_seconds
+        self.total_seconds = total_seconds
+
+    @property
+    def silence_seconds(self):
+        return self.total_seconds - self.speech_seconds
+
+    @property
+    def speech_ratio(self):
+        return self.speech_seconds / self.total_seconds if self.total_seconds else 0.0
+
+    # Summary reported alongside the transcription results
+    def report(self):
+        return {
+            'speech_seconds': round(self.speech_seconds, 2),
+            'silence_seconds': round(self.silence_seconds, 2),
+            'speech_ratio': round(self.speech_ratio, 4)
+        }
+
+
+# Function to compute the mean power of each frame, in dB relative to full scale
+def frame_energy_db(samples, frame_length, full_scale):
+    n_frames = len(samples) // frame_length
+    frames = samples[:n_frames * frame_length].reshape(n_frames, frame_length).astype(np.float32)
+    if samples.dtype == np.uint8:
+        frames -= 128  # 8-bit WAV is unsigned
+    power = np.einsum('ij,ij->i', frames, frames) / (frame_length * float(full_scale) ** 2)
+    return 10 * np.log10(power + 1e-12)
+
+
+# Function to mark which frames to keep: speech frames, padded on both sides,
+# with pauses shorter than min_silence_frames between them filled back in
+def speech_mask(energy_db, pad_frames, min_silence_frames, margin_db=VAD_MARGIN_DB, floor_dbfs=VAD_FLOOR_DBFS):
+    n = len(energy_db)
+    if not n:
+        return np.zeros(0, dtype=bool)
+    noise_floor = np.percentile(energy_db, 10)
+    speech = energy_db > max(floor_dbfs, noise_floor + margin_db)
+
+    # Dilate by pad_frames: a frame is kept if any speech lies within the pad
+    counts = np.concatenate(([0], np.cumsum(speech)))
+    index = np.arange(n)
+    keep = counts[np.minimum(index + pad_frames + 1, n)] - counts[np.maximum(index - pad_frames, 0)] > 0
+
+    # Runs of dropped frames; short ones between speech are kept as pauses
+    edges = np.diff(np.concatenate(([1], keep.view(np.int8), [1])))
+    starts = np.flatnonzero(edges == -1)
+    ends = np.flatnonzero(edges == 1)
+    inner = (starts > 0) & (ends < n) & (ends - starts < min_silence_frames)
+    fill = np.zeros(n + 1, dtype=np.int32)
+    np.add.at(fill, starts[inner], 1)
+    np.add.at(fill, ends[inner], -1)
+    return keep | (np.cumsum(fill[:n]) > 0)
+
+
+# Function to drop leading, trailing and long internal silences from decoded audio.
+# The kept audio is one contiguous copy; audio with nothing to trim is returned as is.
+def trim_silence(pcm, frame_ms=VAD_FRAME_MS, pad_seconds=VAD_PAD_SECONDS,
+                 min_silence_seconds=VAD_MIN_SILENCE_SECONDS, enabled=None):
+    enabled = VAD_ENABLED if enabled is None else enabled
+    samples = pcm.samples
+    frame_length = max(1, int(pcm.sample_rate * frame_ms / 1000))
+    if not enabled or samples is None or len(samples) < frame_length:
+        return VoiceActivity(pcm, pcm.duration, pcm.duration)
+
+    energy = frame_energy_db(samples, frame_length, 2 ** (8 * pcm.sample_width - 1))
+    frame_seconds = frame_length / pcm.sample_rate
+    keep = speech_mask(energy, round(pad_seconds / frame_seconds), round(min_silence_seconds / frame_seconds))
+    if keep.all():
+        return VoiceActivity(pcm, pcm.duration, pcm.duration)
+
+    # Samples past the last whole frame follow that frame's decision
+    sample_mask = np.repeat(keep, frame_length)
+    tail = len(samples) - len(sample_mask)
+    if tail:
+        sample_mask = np.concatenate((sample_mask, np.full(tail, keep[-1])))
+    trimmed = samples[sample_mask]
+    speech_seconds = len(trimmed) / pcm.sample_rate
+    return VoiceActivity(PCMBuffer(trimmed, pcm.sample_rate, pcm.sample_width),
+                         speech_seconds, pcm.duration)
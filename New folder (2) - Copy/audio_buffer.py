@@ -0,0 +1,73 @@
+import io
+import wave
+import numpy as np
+import speech_recognition as sr
+from silence import duration_ms, ms_to_frame, pcm_samples
+
+
+# Decoded mono audio held in one signed sample array for analysis, plus the PCM
+# handed to the recognizer (the same array, except for 8-bit audio, which
+# AudioData expects unsigned). Chunks handed to the recognizer are views, so
+# nothing is written to disk or decoded twice.
+class AudioBuffer:
+    def __init__(self, samples, sample_rate, pcm=None):
+        self.samples = samples
+        self.pcm = samples if pcm is None else pcm
+        self.sample_rate = sample_rate
+        self.sample_width = samples.itemsize
+
+    # Length in milliseconds (rounded like len(AudioSegment))
+    def __len__(self):
+        return duration_ms(self.samples, self.sample_rate)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    # Function to get [start_ms, end_ms) as samples, without copying
+    def slice_ms(self, start_ms, end_ms):
+        start, end = ms_to_frame([start_ms, end_ms], self.sample_rate)
+        return self.samples[start:end]
+
+    # Function to wrap [start_ms, end_ms) as in-memory AudioData for the recognizer
+    def audio_data(self, start_ms=0, end_ms=None):
+        start, end = ms_to_frame([start_ms, len(self) if end_ms is None else end_ms], self.sample_rate)
+        return sr.AudioData(memoryview(self.pcm[start:end]).cast('B'), self.sample_rate, self.sample_width)
+
+
+# Function to decode a WAV file into an AudioBuffer. 16- and 32-bit mono audio
+# is viewed in place; other formats are converted once (24-bit widened to
+# 32-bit, channels averaged). 8-bit audio keeps its unsigned PCM for the
+# recognizer and gets a signed copy for analysis.
+def load_audio(audio_file):
+    with open(audio_file, 'rb') as f:
+        data = f.read()
+    stream = io.BytesIO(data)
+    with wave.open(stream, 'rb') as wf:
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        sample_rate = wf.getframerate()
+        frame_bytes = wf.getnframes() * channels * sample_width
+        # The stream now sits at the start of the data chunk
+        offset = stream.tell()
+        frames = memoryview(data)[offset:offset + frame_bytes]
+        if len(frames) != frame_bytes:
+            frames = wf.readframes(wf.getnframes())
+
+    if sample_width == 1:
+        # 8-bit WAV is unsigned; flipping the top bit makes it signed
+        samples = (np.frombuffer(frames, dtype=np.uint8) ^ 0x80).view(np.int8)
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((len(raw), 4), dtype=np.uint8)
+        padded[:, 1:] = raw
+        samples = padded.view('<i4').ravel()
+    else:
+        samples = pcm_samples(frames, sample_width)
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(samples.dtype)
+    if sample_width == 1:
+        pcm = np.frombuffer(frames, dtype=np.uint8) if channels == 1 else samples.view(np.uint8) ^ 0x80
+        return AudioBuffer(samples, sample_rate, pcm)
+    return AudioBuffer(samples, sample_rate)
@@ -0,0 +1,263 @@
+import math
+import os
+import threading
+import time
+import wave
+import numpy as np
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # No PortAudio (e.g. CI); only the fake source works
+    sd = None
+
+# 'microphone', 'fake' (synthetic speech) or the path of a WAV file to replay
+AUDIO_SOURCE = os.getenv("AUDIO_SOURCE", "microphone")
+RING_BUFFER_SECONDS = 10
+DEVICE_CACHE_SECONDS = 30
+
+
+class OverrunError(Exception):
+    pass
+
+
+# Fixed-size ring of the most recent frames. There is a single writer (the audio
+# callback) and no lock: the writer first claims the frames it is about to
+# overwrite, copies the block in, then publishes it by advancing `written`.
+# Readers copy by absolute frame position and check afterwards that no claim
+# reached the frames they copied.
+class RingBuffer:
+    def __init__(self, frames, channels=1, dtype=np.int16):
+        self.capacity = frames
+        self._data = np.zeros((frames, channels), dtype=dtype)
+        self.written = 0  # Total frames ever written
+        self._claimed = 0  # `written` once the block being copied is published
+
+    def write(self, block):
+        skipped = max(len(block) - self.capacity, 0)
+        block = block[skipped:]
+        n = len(block)
+        start = (self.written + skipped) % self.capacity
+        first = min(n, self.capacity - start)
+        self._claimed = self.written + skipped + n
+        self._data[start:start + first] = block[:first]
+        self._data[:n - first] = block[first:]
+        self.written = self._claimed
+
+    # Function to copy frames [start, end) by absolute position
+    def read(self, start, end=None):
+        end = self.written if end is None else end
+        if self._claimed - start > self.capacity:
+            raise OverrunError(f"frames from {start} were overwritten")
+        first = start % self.capacity
+        n = end - start
+        if first + n <= self.capacity:
+            frames = self._data[first:first + n].copy()
+        else:
+            frames = np.concatenate((self._data[first:], self._data[:n - (self.capacity - first)]))
+        if self._claimed - start > self.capacity:
+            raise OverrunError(f"frames from {start} were overwritten while reading")
+        return frames
+
+    # Function to copy the most recent `frames` frames (fewer if not yet written)
+    def latest(self, frames):
+        for _ in range(3):
+            end = self.written
+            try:
+                return self.read(max(end - min(frames, self.capacity), 0), end)
+            except OverrunError:
+                continue
+        raise OverrunError("the writer keeps lapping the reader")
+
+
+# Function to express an int16 level in dBFS (silence reads as the 16-bit floor, -90.3)
+def to_dbfs(level):
+    return round(20 * math.log10(max(level, 1) / 32768), 1)
+
+
+# One long-lived input stream shared by the level meter and the recorder. The
+# callback only writes into the ring buffer and replaces the latest levels
+# tuple; consumers read from the ring at their own pace, so starting a
+# recording or a level check never opens a new capture.
+class SharedInputStream:
+    def __init__(self, sample_rate, channels, dtype, block_size, buffer_seconds=RING_BUFFER_SECONDS,
+                 source=None, on_device_change=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = dtype
+        self.block_size = block_size
+        self.source = source  # Stream factory; None for open_input_source()
+        self.on_device_change = on_device_change
+        self.ring = RingBuffer(int(sample_rate * buffer_seconds), channels, dtype)
+        self._levels = (0, 0.0, 0, 0.0)  # (sequence, rms, peak, time)
+        self._stream = None
+        self._stopping = set()  # Streams closed by stop(), whose finish is expected
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._stream is not None
+
+    # Function to open the stream if it is not running yet
+    def start(self):
+        with self._lock:
+            if self._stream is None:
+                factory = self.source or open_input_source
+                stream = factory(samplerate=self.sample_rate, channels=self.channels, dtype=self.dtype,
+                                 blocksize=self.block_size, callback=self._callback,
+                                 finished_callback=lambda: self._finished(stream))
+                stream.start()
+                self._stream = stream
+        return self
+
+    def stop(self):
+        with self._lock:
+            stream, self._stream = self._stream, None
+            if stream is not None:
+                self._stopping.add(stream)
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    # Runs on the audio thread for every block
+    def _callback(self, indata, frames, time_info, status):
+        self.ring.write(indata)
+        samples = indata.reshape(-1).astype(np.float32)
+        rms = math.sqrt(float(np.dot(samples, samples)) / len(samples)) if len(samples) else 0.0
+        peak = max(int(indata.max()), -int(indata.min())) if len(samples) else 0
+        self._levels = (self._levels[0] + 1, rms, peak, time.time())
+
+    # Called whenever `stream` finishes: after stop(), or on its own, e.g. when the
+    # device goes away. A newer stream opened by start() meanwhile is left alone.
+    def _finished(self, stream):
+        with self._lock:
+            if self._stream is stream:
+                self._stream = None
+            requested = stream in self._stopping
+            self._stopping.discard(stream)
+        if not requested and self.on_device_change:
+            self.on_device_change()
+
+    # Latest block's levels; `sequence` increases with every block
+    def levels(self):
+        sequence, rms, peak, timestamp = self._levels
+        return {'sequence': sequence, 'rms': round(rms, 2), 'rms_dbfs': to_dbfs(rms),
+                'peak': peak, 'peak_dbfs': to_dbfs(peak), 'time': timestamp}
+
+    # Function to copy up to the last `seconds` of audio
+    def latest(self, seconds):
+        return self.ring.latest(int(self.sample_rate * seconds))
+
+    # Function to wait for frames after `cursor` (an absolute frame position);
+    # returns (frames, new cursor). Raises TimeoutError if none arrive in time.
+    def read_from(self, cursor, timeout):
+        deadline = time.monotonic() + timeout
+        poll = self.block_size / self.sample_rate / 2
+        while self.ring.written <= cursor:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No audio for {timeout} seconds")
+            time.sleep(poll)
+        end = self.ring.written
+        return self.ring.read(cursor, end), end
+
+
+# Function to make `frames` of speech-like int16 audio (tone bursts at about a
+# quarter of full scale); a function of the sample index only, so any block
+# split produces the same signal
+def synthetic_speech(start, frames, sample_rate, channels=1):
+    t = (start + np.arange(frames)) / sample_rate
+    envelope = np.sin(2 * np.pi * 0.5 * t) > 0
+    signal = 6000 * np.sin(2 * np.pi * 220 * t) * envelope + 300 * np.sin(2 * np.pi * 3170 * t + np.sin(7 * t))
+    return np.repeat(signal.astype(np.int16).reshape(-1, 1), channels, axis=1)
+
+
+# Input source with sd.InputStream's interface for headless runs and tests: it
+# calls the callback from its own thread with synthetic speech, or with a WAV
+# file on a loop, `speed` times faster than real time
+class FakeInputSource:
+    def __init__(self, samplerate, channels, dtype, blocksize, callback, finished_callback=None, path=None,
+                 speed=1.0):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.speed = speed
+        self.samples = None
+        if path:
+            with wave.open(path, 'rb') as wf:
+                frames = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+                self.samples = frames.reshape(-1, wf.getnchannels())[:, :1].repeat(channels, axis=1)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _blocks(self):
+        position = 0
+        while True:
+            if self.samples is None:
+                yield synthetic_speech(position, self.blocksize, self.samplerate, self.channels)
+            else:
+                indices = (position + np.arange(self.blocksize)) % len(self.samples)
+                yield self.samples[indices]
+            position += self.blocksize
+
+    def _run(self):
+        interval = self.blocksize / self.samplerate / self.speed
+        next_time = time.monotonic()
+        for block in self._blocks():
+            if self._stop.is_set():
+                break
+            self.callback(block, self.blocksize, None, None)
+            next_time += interval
+            self._stop.wait(max(next_time - time.monotonic(), 0))
+        if self.finished_callback:
+            self.finished_callback()  # Like PortAudio, after every stop
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        self.close()
+
+
+# Function to open the configured input (AUDIO_SOURCE) with sd.InputStream's arguments
+def open_input_source(**kwargs):
+    if AUDIO_SOURCE == 'microphone':
+        return sd.InputStream(**kwargs)
+    return FakeInputSource(**kwargs, path=None if AUDIO_SOURCE == 'fake' else AUDIO_SOURCE)
+
+
+# PortAudio device list, queried once and kept until it is invalidated (when the
+# input stream stops on its own, or on request) or older than `ttl` seconds
+class DeviceCache:
+    def __init__(self, query=None, ttl=DEVICE_CACHE_SECONDS):
+        self.query = query or (lambda: sd.query_devices() if sd is not None else [])
+        self.ttl = ttl
+        self._devices = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._devices is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._devices = self.query()
+                self._loaded_at = time.monotonic()
+            return self._devices
+
+    def invalidate(self):
+        with self._lock:
+            self._devices = None
@@ -0,0 +1,719 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+import wave
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Benchmarks are registered by name and run with: python benchmark.py <name> [...]
+BENCHMARKS = {}
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RECORDED_AUDIO = os.path.join(HERE, 'recorded_audio.wav')
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+# Function to time func() and return (best milliseconds, last result)
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(c)), *(len(str(r[i])) for r in rows)) for i, c in enumerate(columns)]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+# --- Silence splitting: pydub's per-millisecond scan vs the NumPy segmenter ---
+
+@benchmark('silence')
+def bench_silence(args):
+    from pydub import AudioSegment
+    from pydub import silence as pydub_silence
+    import silence
+
+    sound = AudioSegment.from_wav(args.audio)
+    samples = silence.pcm_samples(sound.raw_data, sound.sample_width)
+    params = dict(min_silence_len=args.min_silence_len, silence_thresh=sound.dBFS + args.thresh_offset,
+                  keep_silence=args.keep_silence)
+
+    pydub_ms, expected = best_of(args.repeat, lambda: pydub_silence.split_on_silence(sound, **params))
+    numpy_ms, ranges = best_of(args.repeat, lambda: silence.split_ranges(
+        samples, sound.frame_rate, sound.sample_width, channels=sound.channels, **params))
+    chunks = [sound[start:end] for start, end in ranges]
+    same = len(chunks) == len(expected) and all(a.raw_data == b.raw_data for a, b in zip(chunks, expected))
+
+    print(f"{args.audio}: {len(sound) / 1000:.1f} s @ {sound.frame_rate} Hz; "
+          f"min_silence_len={args.min_silence_len} ms, silence_thresh=dBFS{args.thresh_offset:+g}, "
+          f"keep_silence={args.keep_silence} ms; best of {args.repeat}")
+    print_table([
+        ('pydub split_on_silence', f"{pydub_ms:.1f}", len(expected)),
+        ('silence.split_ranges', f"{numpy_ms:.1f}", len(chunks)),
+    ], ('segmenter', 'ms', 'chunks'))
+    print(f"Speedup {pydub_ms / numpy_ms:.0f}x; chunks identical: {same}")
+
+
+
+# --- Decode once: both transcription strategies from one in-memory buffer ---
+
+# The previous flow: fixed windows exported to chunk_{i}.wav and re-read through
+# sr.AudioFile, then a second decode for the silence split into audio_chunks/
+def _strategies_with_files(audio_file, workdir):
+    import speech_recognition as sr
+    from pydub import AudioSegment
+    from silence import pcm_samples, split_ranges
+
+    recognizer = sr.Recognizer()
+    chunks = []
+    audio = AudioSegment.from_wav(audio_file)
+    for i, start in enumerate(range(0, len(audio), 60000)):
+        chunk_file = os.path.join(workdir, f"chunk_{i}.wav")
+        audio[start:min(start + 60000, len(audio))].export(chunk_file, format="wav")
+        with sr.AudioFile(chunk_file) as source:
+            chunks.append(recognizer.record(source))
+        os.remove(chunk_file)
+
+    sound = AudioSegment.from_wav(audio_file)
+    ranges = split_ranges(pcm_samples(sound.raw_data, sound.sample_width), sound.frame_rate, sound.sample_width,
+                          min_silence_len=700, silence_thresh=sound.dBFS - 14, keep_silence=500,
+                          channels=sound.channels)
+    chunk_dir = os.path.join(workdir, "audio_chunks")
+    os.makedirs(chunk_dir, exist_ok=True)
+    for i, (start, end) in enumerate(ranges):
+        chunk_file = os.path.join(chunk_dir, f"chunk{i}.wav")
+        sound[start:end].export(chunk_file, format="wav")
+        with sr.AudioFile(chunk_file) as source:
+            chunks.append(recognizer.record(source))
+    shutil.rmtree(chunk_dir)
+    return chunks
+
+
+def _strategies_in_memory(audio_file):
+    from audio_buffer import load_audio
+    from silence import dbfs, split_ranges
+    from voice_process import split_audio
+
+    audio = load_audio(audio_file)
+    chunks = split_audio(audio)
+    ranges = split_ranges(audio.samples, audio.sample_rate, audio.sample_width, min_silence_len=700,
+                          silence_thresh=dbfs(audio.samples, audio.sample_width) - 14, keep_silence=500)
+    chunks.extend(audio.audio_data(start, end) for start, end in ranges)
+    return chunks
+
+
+# Function to run func() and return (ms, peak traced KB, result); the time is
+# taken from a separate untraced run because tracemalloc slows allocation down
+def measure(repeat, func):
+    elapsed, result = best_of(repeat, func)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak // 1024, result
+
+
+@benchmark('decode')
+def bench_decode(args):
+    with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as workdir:
+        files_ms, files_kb, expected = measure(args.repeat, lambda: _strategies_with_files(args.audio, workdir))
+        memory_ms, memory_kb, chunks = measure(args.repeat, lambda: _strategies_in_memory(args.audio))
+    same = [c.get_raw_data() for c in chunks] == [c.get_raw_data() for c in expected]
+
+    print(f"{args.audio}; fixed 60 s windows plus the silence split; best of {args.repeat}")
+    print_table([
+        ('decode twice + chunk files', f"{files_ms:.1f}", files_kb, len(expected)),
+        ('decode once, in memory', f"{memory_ms:.1f}", memory_kb, len(chunks)),
+    ], ('strategy', 'ms', 'peak KB', 'chunks'))
+    print(f"Audio handed to the recognizer identical: {same}")
+
+
+
+# --- Summaries: bare requests.post vs the pooled, retrying client ---
+
+# Local stand-in for the summary API: answers POST {"text"} with {"summary"}
+# after `latency` seconds, failing the first `fail_first` requests with a 503
+class FakeSummaryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, fail_first=0):
+        super().__init__(('127.0.0.1', 0), _FakeSummaryHandler)
+        self.latency = latency
+        self.fail_first = fail_first
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/summarize"
+
+    def process_request_thread(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        super().process_request_thread(request, client_address)
+
+
+class _FakeSummaryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_POST(self):
+        text = json.loads(self.rfile.read(int(self.headers['Content-Length']))).get('text', '')
+        with self.server._lock:
+            self.server.requests += 1
+            failing = self.server.requests <= self.server.fail_first
+        time.sleep(self.server.latency)
+        status, body = (503, {'error': 'unavailable'}) if failing else (200, {'summary': text[:40]})
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@benchmark('summary')
+def bench_summary(args):
+    import requests
+    from summarizer import CircuitBreaker, SummaryClient, SummaryError
+
+    texts = [f"transcript {i} " + "word " * 200 for i in range(args.texts)]
+    rows = []
+
+    def run(label, server, func):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        rows.append((label, f"{elapsed * 1000:.0f}", f"{elapsed * 1000 / len(texts):.1f}", server.connections))
+
+    server = FakeSummaryServer(args.latency)
+    run('requests.post per call (old)', server,
+        lambda: [requests.post(server.url, json={'text': text}).json() for text in texts])
+    server = FakeSummaryServer(args.latency)
+    client = SummaryClient(server.url)
+    run('pooled client, sequential', server, lambda: [client.summarize(text) for text in texts])
+    server = FakeSummaryServer(args.latency)
+    client = SummaryClient(server.url, pool_size=args.concurrency)
+    run(f'pooled client, summarize_all x{args.concurrency}', server,
+        lambda: client.summarize_all(texts, args.concurrency))
+    print(f"{len(texts)} summaries, {args.latency * 1000:.0f} ms stand-in latency")
+    print_table(rows, ('client', 'total ms', 'ms each', 'connections'))
+
+    # Failure handling: two 503s are retried, then a dead upstream opens the breaker
+    server = FakeSummaryServer(0, fail_first=2)
+    client = SummaryClient(server.url, backoff=0.01)
+    print(f"\nRetried through 2 x 503: {client.summarize('hello')!r} after {server.requests} requests")
+    dead = SummaryClient('http://127.0.0.1:9/v1/summarize', max_retries=1, backoff=0.01,
+                         breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    outcomes = [type(result).__name__ for result in dead.summarize_all(['a'] * 4, concurrency=1)]
+    print(f"Unreachable upstream, 4 calls: {outcomes}; breaker {dead.breaker.state}")
+
+
+
+# --- Pipeline: subprocess + JSON handoff vs in-process stages ---
+
+@benchmark('pipeline')
+def bench_pipeline(args):
+    from pipeline import Pipeline, score
+    from voice_process import save_transcribed_text
+
+    text = " ".join(f"word{i % 97}" for i in range(250))
+
+    # Stand-ins for the STT and Gemini calls, which cost the same in both flows
+    def fake_transcribe(audio_file):
+        time.sleep(args.latency)
+        return text
+
+    def fake_summarize(text):
+        time.sleep(args.latency)
+        return text[:40]
+
+    def fake_compare_topic(text, expected_topic):
+        time.sleep(args.latency)
+        return {'generated_topic': "Farming", 'similarity_score': 0.5, 'result': "Failed", 'feedback': ""}
+
+    stages = dict(transcribe=fake_transcribe, summarize=fake_summarize, compare_topic=fake_compare_topic, score=score,
+                  single_call=False)
+    instant = dict(transcribe=lambda audio_file: text, summarize=lambda text: text[:40],
+                   compare_topic=lambda text, expected_topic: {}, score=score, single_call=False)
+
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        recordings = []
+        for i in range(args.recordings):
+            recordings.append(os.path.join(workdir, f"recording_{i}.wav"))
+            with open(recordings[-1], 'wb') as f:
+                f.write(b'\0' * (i + 1))
+
+        # Old flow: write transcribed_text.json, start a second interpreter that
+        # imports summary (and google.generativeai) and reads the file back
+        handoff_file = os.path.join(workdir, "transcribed_text.json")
+        command = [sys.executable, '-c', f"import summary; summary.load_transcribed_text({handoff_file!r})"]
+
+        def subprocess_handoff():
+            save_transcribed_text(text, handoff_file)
+            subprocess.run(command, cwd=HERE, check=True)
+
+        subprocess_ms, _ = best_of(args.repeat, subprocess_handoff)
+        inline_ms, _ = best_of(args.repeat, lambda: Pipeline(**instant, memoize=()).run(recordings[0]))
+
+        pipeline = Pipeline(**stages)
+        cold_ms, _ = best_of(1, lambda: pipeline.run(recordings[0]))
+        warm_ms, _ = best_of(args.repeat, lambda: pipeline.run(recordings[0]))
+        many_ms, _ = best_of(1, lambda: Pipeline(**stages).run_many(recordings, workers=args.concurrency))
+
+    external_ms = 3 * args.latency * 1000
+    print(f"{args.latency * 1000:.0f} ms per STT/summary/topic call; best of {args.repeat}")
+    print_table([
+        ('handoff to the topic stage', f"{subprocess_ms:.1f}", f"{inline_ms:.3f}"),
+        ('one recording', f"{subprocess_ms + external_ms:.1f}", f"{cold_ms:.1f}"),
+        ('same recording again (memoized)', f"{subprocess_ms + external_ms:.1f}", f"{warm_ms:.3f}"),
+        (f'{args.recordings} recordings, run_many x{args.concurrency}',
+         f"{args.recordings * (subprocess_ms + external_ms):.0f}", f"{many_ms:.0f}"),
+    ], ('ms', 'subprocess + JSON (old)', 'in-process pipeline'))
+    print(f"Stage caches after the repeated run: {pipeline.cache_info()}")
+
+
+
+# --- Topic generation: API call per evaluation vs the SQLite response cache ---
+
+class FakeTopicModel:
+    model_name = "models/fake-topic-model"
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        return types.SimpleNamespace(text=" Topic of " + prompt.split()[-1] + " ")
+
+
+@benchmark('topic-cache')
+def bench_topic_cache(args):
+    from response_cache import ResponseCache
+    from summary import judge_topic
+
+    transcripts = [f"practice talk number {i} about farming and the weather, take {i}" for i in range(args.texts)]
+    topics = ["Farming Struggles due to Drought", "Climate Change", "Daily Life"]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        rows = []
+        for label, cached in (('API call every time (old)', False), ('SQLite response cache', True)):
+            model = FakeTopicModel(args.latency)
+            cache = ResponseCache(os.path.join(workdir, f"{cached}.sqlite3"), max_entries=args.texts)
+            if not cached:
+                cache.get = lambda key: None
+            start = time.perf_counter()
+            # Every transcript is evaluated against each expected topic, as when re-running
+            for expected_topic in topics:
+                for text in transcripts:
+                    judge_topic(None, text, expected_topic, model=model, cache=cache, fast_path=False)
+            elapsed = time.perf_counter() - start
+            stats = cache.stats()
+            rows.append((label, len(topics) * len(transcripts), model.calls, f"{stats['hit_rate']:.0%}",
+                         f"{elapsed * 1000:.0f}"))
+
+        # A fresh process opening the same database starts warm
+        reopened = ResponseCache(os.path.join(workdir, "True.sqlite3"), max_entries=args.texts)
+        model = FakeTopicModel(args.latency)
+        start = time.perf_counter()
+        for text in transcripts:
+            judge_topic(None, text, topics[0], model=model, cache=reopened, fast_path=False)
+        rows.append(('reopened cache', len(transcripts), model.calls, f"{reopened.stats()['hit_rate']:.0%}",
+                     f"{(time.perf_counter() - start) * 1000:.0f}"))
+
+    # The keyphrase fast path would decide most of these offline; this measures the cache alone
+    print(f"{len(transcripts)} transcripts x {len(topics)} expected topics, {args.latency * 1000:.0f} ms per API call, "
+          f"keyphrase fast path off")
+    print_table(rows, ('topic generation', 'evaluations', 'API calls', 'hit rate', 'ms'))
+
+
+
+# --- Topic matching: Levenshtein.ratio per pair vs one RapidFuzz cdist call ---
+
+TOPIC_WORDS = ("farming drought climate change family travel school friendship music sport health "
+               "technology environment water city village future history food dream work").split()
+
+
+# Function to make `count` distinct topic titles of 2-6 words
+def make_topics(count, seed):
+    rng = np.random.default_rng(seed)
+    topics = set()
+    while len(topics) < count:
+        words = rng.choice(TOPIC_WORDS, size=rng.integers(2, 7))
+        topics.add(" ".join(words).title() + f" {len(topics)}")
+    return sorted(topics)
+
+
+@benchmark('topic-match')
+def bench_topic_match(args):
+    import Levenshtein
+    from topic_matcher import TopicCatalog
+
+    generated = make_topics(args.texts, seed=1)
+    rows = []
+    for size in args.catalog_sizes:
+        topics = make_topics(size, seed=size)
+
+        def pairwise():
+            return [max(range(size), key=lambda j: Levenshtein.ratio(query.lower(), topics[j].lower()))
+                    for query in generated]
+
+        loop_ms, expected = best_of(args.repeat, pairwise)
+        single_ms, _ = best_of(args.repeat, lambda: TopicCatalog(topics, workers=1).top_k(generated, args.top_k))
+        catalog = TopicCatalog(topics)
+        multi_ms, matches = best_of(args.repeat, lambda: catalog.top_k(generated, args.top_k))
+        # Ties may pick a different topic, but never a worse one
+        same = all(abs(Levenshtein.ratio(query.lower(), topics[j].lower()) - row[0][1]) < 1e-4
+                   for query, j, row in zip(generated, expected, matches))
+        rows.append((size, f"{loop_ms:.1f}", f"{single_ms:.1f}", f"{multi_ms:.1f}",
+                     f"{loop_ms / multi_ms:.0f}x", same))
+
+    print(f"{len(generated)} generated topics; top-{args.top_k} matches; best of {args.repeat}; {os.cpu_count()} CPUs")
+    print_table(rows, ('catalog', 'Levenshtein loop ms', 'cdist 1 thread ms', 'cdist all threads ms',
+                       'speedup', 'same best score'))
+
+
+
+# --- Topic fast path: offline keyphrase decisions vs an LLM call per evaluation ---
+
+PRACTICE_TOPICS = {
+    "Farming Struggles due to Drought": [
+        "Farming is hard when the drought lasts all season.",
+        "The farmers struggle because the drought dried the fields.",
+        "Our farm struggles every year the drought comes back.",
+        "Without rain the farming families struggle to feed their animals.",
+    ],
+    "Climate Change and Rising Seas": [
+        "Climate change is making the seas rise along our coast.",
+        "Rising seas flood the villages when storms come in.",
+        "Scientists say climate change will keep the seas rising.",
+        "The change in climate means the sea level is rising faster.",
+    ],
+    "Learning to Play Music": [
+        "Learning music takes patience and daily practice.",
+        "I started to play the guitar and learning songs was slow.",
+        "Playing music with friends made learning easier.",
+        "Music lessons taught me how to play by ear.",
+    ],
+    "Benefits of Team Sports": [
+        "Team sports teach you to trust the people around you.",
+        "The benefits of playing sports in a team go beyond fitness.",
+        "In team sports everyone benefits when we pass the ball.",
+        "Sports teams build friendships and discipline.",
+    ],
+    "Technology in the Classroom": [
+        "Technology changed how the classroom works.",
+        "Tablets in the classroom help students research quickly.",
+        "Teachers use technology to make classroom lessons interactive.",
+        "Classroom technology can also distract students.",
+    ],
+}
+# Titles an LLM might give a speech on each topic: some close to the catalog
+# title, most reworded
+TOPIC_PARAPHRASES = {
+    "Farming Struggles due to Drought": ["Farming Struggles During Drought", "Drought and the Struggles of Farmers",
+                                         "How Drought Hurts Family Farms", "Farming Through a Drought"],
+    "Climate Change and Rising Seas": ["Climate Change and Rising Sea Levels", "Rising Seas from Climate Change",
+                                       "Coastal Flooding and a Changing Climate", "The Threat of Rising Seas"],
+    "Learning to Play Music": ["Learning to Play an Instrument", "Learning Music Through Practice",
+                               "The Journey of Learning Guitar", "Learning to Play Music"],
+    "Benefits of Team Sports": ["The Benefits of Team Sports", "What Team Sports Teach Us",
+                                "Teamwork and Friendship in Sports", "Benefits of Playing on a Team"],
+    "Technology in the Classroom": ["Technology in Classrooms", "Using Technology in the Classroom",
+                                    "Tablets and Learning at School", "Pros and Cons of Classroom Technology"],
+}
+FILLER_SENTENCES = [
+    "I think this is something many people care about.",
+    "When I was younger I did not understand it at all.",
+    "My friends and I talked about it for a long time.",
+    "It is important to think about what happens next.",
+    "Everyone has a different story about it.",
+]
+
+
+@benchmark('topic-fast-path')
+def bench_topic_fast_path(args):
+    import random
+    from keyphrases import KeyphraseExtractor, build_idf
+    from summary import grade_topic
+
+    rng = random.Random(0)
+    titles = list(PRACTICE_TOPICS)
+    evaluations = []
+    for _ in range(args.texts * 5):
+        true_topic = rng.choice(titles)
+        sentences = rng.sample(PRACTICE_TOPICS[true_topic], 3) + rng.sample(FILLER_SENTENCES, 2)
+        rng.shuffle(sentences)
+        expected_topic = true_topic if rng.random() < 0.5 else rng.choice([t for t in titles if t != true_topic])
+        evaluations.append((" ".join(sentences), true_topic, expected_topic))
+    extractor = KeyphraseExtractor(build_idf(text for text, _, _ in evaluations))
+
+    # The LLM path as in summary.py, with an oracle standing in for Gemini: after
+    # the API latency it titles the speech with a paraphrase of its true topic,
+    # which grade_topic then compares with the expected title
+    def llm_result(true_topic, expected_topic, oracle_rng):
+        time.sleep(args.latency)
+        return grade_topic(expected_topic, oracle_rng.choice(TOPIC_PARAPHRASES[true_topic]))[1]
+
+    start = time.perf_counter()
+    local = [extractor.judge(text, expected_topic) for text, _, expected_topic in evaluations]
+    local_ms = (time.perf_counter() - start) * 1000
+    decided = [(result, true_topic, expected_topic) for (_, _, result), (_, true_topic, expected_topic)
+               in zip(local, evaluations) if result is not None]
+    # What the LLM path would have said (no latency: this only checks agreement)
+    oracle_rng = random.Random(1)
+    llm_decisions = [grade_topic(expected_topic, oracle_rng.choice(TOPIC_PARAPHRASES[true_topic]))[1]
+                     for _, true_topic, expected_topic in decided]
+    agreed = sum(result == llm for (result, _, _), llm in zip(decided, llm_decisions))
+    on_topic = sum(result == ("Passed" if true_topic == expected_topic else "Failed")
+                   for result, true_topic, expected_topic in decided)
+    escalated = [evaluation for (_, _, result), evaluation in zip(local, evaluations) if result is None]
+
+    start = time.perf_counter()
+    for _, true_topic, expected_topic in escalated:
+        llm_result(true_topic, expected_topic, oracle_rng)
+    fast_ms = local_ms + (time.perf_counter() - start) * 1000
+    llm_only_ms = len(evaluations) * args.latency * 1000
+
+    print(f"{len(evaluations)} evaluations over {len(titles)} practice topics, "
+          f"{args.latency * 1000:.0f} ms per LLM call")
+    print_table([
+        ('LLM every time (old)', len(evaluations), f"{llm_only_ms:.0f}", f"{llm_only_ms / len(evaluations):.2f}"),
+        ('keyphrases, LLM if ambiguous', len(escalated), f"{fast_ms:.0f}", f"{fast_ms / len(evaluations):.2f}"),
+    ], ('topic evaluation', 'LLM calls', 'total ms', 'ms each'))
+    print(f"Decided offline: {len(decided)}/{len(evaluations)} ({len(decided) / len(evaluations):.0%}), "
+          f"{local_ms / len(evaluations):.2f} ms each")
+    print(f"Offline pass/fail agreement with the LLM path (paraphrased titles, Levenshtein >= 0.8): "
+          f"{agreed}/{len(decided)} ({agreed / max(len(decided), 1):.1%}); "
+          f"offline decisions matching the speech's true topic: {on_topic}/{len(decided)}")
+
+
+
+# --- Evaluation: separate summary and topic calls vs one structured call ---
+
+# Fake Gemini model answering topic prompts with a title and evaluation prompts
+# with JSON; every `malformed_every`-th evaluation reply is broken
+class FakeEvaluationModel:
+    model_name = "models/fake-evaluation-model"
+
+    def __init__(self, latency, malformed_every=0):
+        self.latency = latency
+        self.malformed_every = malformed_every
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        if generation_config is None:
+            return types.SimpleNamespace(text="Farming Struggles due to Drought")
+        if self.malformed_every and self.calls % self.malformed_every == 0:
+            return types.SimpleNamespace(text='{"summary": "cut off')
+        return types.SimpleNamespace(text=json.dumps({
+            'summary': "A farmer describes a failed season.",
+            'topic': "Farming Struggles due to Drought",
+            'feedback': "Open with the main point and give one concrete example."
+        }))
+
+
+@benchmark('evaluation')
+def bench_evaluation(args):
+    import summary
+    from pipeline import Pipeline, score
+    from response_cache import ResponseCache
+
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        transcripts = {}
+        for i in range(args.recordings):
+            recording = os.path.join(workdir, f"recording_{i}.wav")
+            open(recording, 'wb').close()
+            transcripts[recording] = f"recording {i}: the drought dried our farm and the family struggles"
+        rows = []
+        for label, single_call, malformed_every in (('summary + topic calls (old)', False, 0),
+                                                    ('one structured call', True, 0),
+                                                    ('one structured call, 1 in 5 malformed', True, 5)):
+            model = FakeEvaluationModel(args.latency, malformed_every)
+            cache = ResponseCache(os.path.join(workdir, f"{label}.sqlite3"))
+
+            def fake_summarize(text):
+                model.generate_content(text)
+                return "A farmer describes a failed season."
+
+            def compare_topic(text, expected_topic):
+                return summary.judge_topic(None, text, expected_topic, model=model, cache=cache, fast_path=False)
+
+            pipeline = Pipeline(transcribe=transcripts.get,
+                                summarize=fake_summarize, compare_topic=compare_topic, score=score,
+                                evaluate=lambda text: summary.evaluate_transcript(None, text, model=model, cache=cache),
+                                decide_topic=None, single_call=single_call, memoize=())
+            start = time.perf_counter()
+            results = [pipeline.run(recording, "Farming Struggles due to Drought") for recording in transcripts]
+            elapsed = (time.perf_counter() - start) * 1000
+            passed = sum(result['result'] == "Passed" for result in results)
+            rows.append((label, model.calls, f"{model.calls / len(results):.1f}", f"{elapsed / len(results):.1f}",
+                         f"{passed}/{len(results)}"))
+
+    print(f"{args.recordings} recordings, {args.latency * 1000:.0f} ms per LLM round trip")
+    print_table(rows, ('evaluation', 'LLM calls', 'calls each', 'ms each', 'passed'))
+
+
+
+# --- Recording: full in-memory buffer vs streaming WAV writes ---
+
+# The previous record_audio: sd.rec into one buffer, normalize, write in one shot
+def _record_in_memory(audio_file, audio_data, sample_rate):
+    if np.max(np.abs(audio_data)) > 0:
+        audio_data = audio_data * (32767 / np.max(np.abs(audio_data)))
+        audio_data = audio_data.astype(np.int16)
+    with wave.open(audio_file, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(audio_data.tobytes())
+
+
+# Function to make a shared input stream fed by synthetic speech `speed` times
+# faster than real time
+def _fake_input_stream(speed):
+    import voice_recorder
+    from audio_input import FakeInputSource, SharedInputStream
+
+    def source(**kwargs):
+        return FakeInputSource(**kwargs, speed=speed)
+
+    return SharedInputStream(voice_recorder.SAMPLE_RATE, voice_recorder.CHANNELS, voice_recorder.DTYPE,
+                             voice_recorder.BLOCK_SIZE, source=source)
+
+
+# Function to read a WAV's frame count and peak
+def _wav_frames_and_peak(audio_file):
+    with wave.open(audio_file, 'rb') as wf:
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    return len(samples), int(np.abs(samples.astype(np.int32)).max())
+
+
+@benchmark('recording')
+def bench_recording(args):
+    import voice_recorder
+    from audio_input import synthetic_speech
+
+    rows = []
+    source = _fake_input_stream(args.speed).start()
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        for duration in args.durations:
+            old_file = os.path.join(workdir, f"old_{duration}.wav")
+            new_file = os.path.join(workdir, f"new_{duration}.wav")
+            # What sd.rec would have filled, counted separately from its generation
+            recorded = synthetic_speech(0, int(voice_recorder.SAMPLE_RATE * duration), voice_recorder.SAMPLE_RATE)
+            tracemalloc.start()
+            _record_in_memory(old_file, recorded, voice_recorder.SAMPLE_RATE)
+            old_kb = (tracemalloc.get_traced_memory()[1] + recorded.nbytes) // 1024
+            tracemalloc.stop()
+            del recorded
+            # The shared stream's ring buffer is a fixed cost, allocated once per process
+            tracemalloc.start()
+            voice_recorder.record_audio(duration, new_file, source)
+            new_kb = (tracemalloc.get_traced_memory()[1] + source.ring._data.nbytes) // 1024
+            tracemalloc.stop()
+            frames, peak = _wav_frames_and_peak(new_file)
+            # Normalizing truncates, so the peak can land one below full scale
+            complete = frames == int(voice_recorder.SAMPLE_RATE * duration) and peak >= 32766
+            rows.append((duration, os.path.getsize(new_file) // 1024, old_kb, new_kb, complete))
+    source.stop()
+
+    print(f"Synthetic input at {voice_recorder.SAMPLE_RATE} Hz replayed {args.speed:g}x faster than real time")
+    print_table(rows, ('seconds', 'WAV KB', 'in-memory peak KB', 'streaming peak KB', 'full length+gain'))
+
+
+# --- Microphone check: separate 3 s capture vs the shared stream's buffer ---
+
+@benchmark('mic-check')
+def bench_mic_check(args):
+    import voice_recorder
+    from audio_input import FakeInputSource
+
+    # The previous check: open a capture and block until `duration` seconds are in
+    def capture_check(duration=3):
+        frames = int(voice_recorder.SAMPLE_RATE * duration)
+        blocks = []
+        done = threading.Event()
+
+        def callback(indata, count, time_info, status):
+            blocks.append(indata.copy())
+            if sum(len(block) for block in blocks) >= frames:
+                done.set()
+
+        with FakeInputSource(voice_recorder.SAMPLE_RATE, voice_recorder.CHANNELS, voice_recorder.DTYPE,
+                             voice_recorder.BLOCK_SIZE, callback):
+            done.wait()
+        audio_sample = np.concatenate(blocks)[:frames]
+        return np.linalg.norm(audio_sample) / np.sqrt(len(audio_sample))
+
+    source = _fake_input_stream(1.0).start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        voice_recorder.check_mic_levels(source=source)  # Fills the buffer once at startup
+        old_ms = best_of(1, capture_check)[0]
+        new_ms = best_of(args.repeat, lambda: voice_recorder.check_mic_levels(source=source))[0]
+
+    # Cost of the meter on the audio thread, per block
+    block = np.zeros((voice_recorder.BLOCK_SIZE, voice_recorder.CHANNELS), dtype=voice_recorder.DTYPE)
+    callback_us = best_of(args.repeat, lambda: [source._callback(block, len(block), None, None)
+                                                for _ in range(1000)])[0]
+    source.stop()
+
+    print(f"{voice_recorder.BLOCK_SIZE}-frame blocks at {voice_recorder.SAMPLE_RATE} Hz, real-time fake input")
+    print_table([('separate capture', round(old_ms, 1)), ('shared stream', round(new_ms, 3))],
+                ('mic check', 'ms before recording'))
+    print(f"Ring buffer write + RMS/peak per block: {callback_us:.1f} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Voice processing benchmarks")
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--audio', default=RECORDED_AUDIO)
+    parser.add_argument('--min-silence-len', type=int, default=700)
+    parser.add_argument('--thresh-offset', type=float, default=-14, help='silence threshold relative to dBFS')
+    parser.add_argument('--keep-silence', type=int, default=500)
+    parser.add_argument('--texts', type=int, default=40, help='transcripts to summarize')
+    parser.add_argument('--latency', type=float, default=0.05, help='stand-in summary API latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--recordings', type=int, default=20, help='recordings for run_many')
+    parser.add_argument('--catalog-sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--durations', type=float, nargs='+', default=[30, 120, 600], help='recording lengths in seconds')
+    parser.add_argument('--speed', type=float, default=100, help='fake input stream replay speed')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, HERE)
+    main()
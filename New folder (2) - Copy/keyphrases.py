@@ -0,0 +1,161 @@
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+
+IDF_PATH = os.getenv("TOPIC_IDF_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "topic_idf.json"))
+# Topic match confidence at or above which a transcript passes without asking
+# the LLM, and at or below which it fails; anything between is escalated
+TOPIC_FAST_PASS = float(os.getenv("TOPIC_FAST_PASS", "0.75"))
+TOPIC_FAST_FAIL = float(os.getenv("TOPIC_FAST_FAIL", "0.25"))
+KEYPHRASE_COUNT = 8
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each even ever every few for from further get got had has
+have having he her here hers herself him himself his how i if in into is it its itself just know like me more
+most my myself no nor not now of off on once only or other our ours ourselves out over own really same say said
+she should so some such than that the their theirs them themselves then there these they this those through to
+too under until up us very was we well were what when where which while who whom why will with would yes yet
+you your yours yourself yourselves um uh okay oh so going gonna thing things lot one also today
+""".split())
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+# Phrase boundaries: sentence and clause punctuation
+PHRASE_SPLIT_RE = re.compile(r"[.,;:!?()\[\]\"\n\r\t-]+")
+
+
+# Function to reduce a word to a crude stem so "farming"/"farm" and
+# "struggles"/"struggle" match (good enough for short topic titles)
+def stem(word):
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    for suffix in ('ing', 'ed', 'ly'):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 4 and word.endswith('e'):
+        word = word[:-1]
+    return word
+
+
+# Function to get the content-word stems of a text
+def content_stems(text):
+    return [stem(word) for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+# Function to build an IDF table ({stem: idf}) from a corpus of transcripts
+def build_idf(documents):
+    document_frequency = Counter()
+    count = 0
+    for document in documents:
+        document_frequency.update(set(content_stems(document)))
+        count += 1
+    idf = {word: math.log((1 + count) / (1 + df)) + 1 for word, df in document_frequency.items()}
+    # Words never seen in the corpus are treated as rare
+    idf['__default__'] = math.log(1 + count) + 1
+    return idf
+
+
+def save_idf(idf, path=IDF_PATH):
+    with open(path, 'w') as f:
+        json.dump(idf, f)
+
+
+# Function to load a precomputed IDF table; without one every word weighs the same
+def load_idf(path=IDF_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# RAKE-style keyphrase extraction weighted by IDF. Candidate phrases are runs of
+# content words between stopwords and punctuation; a word scores its degree
+# (co-occurrence within phrases) over its frequency, times its IDF, and a
+# phrase the sum of its words.
+class KeyphraseExtractor:
+    def __init__(self, idf=None):
+        self.idf = load_idf() if idf is None else idf
+        self.default_idf = self.idf.get('__default__', 1.0)
+
+    def weight(self, word_stem):
+        return self.idf.get(word_stem, self.default_idf)
+
+    # Function to get the top_n keyphrases of a text as (phrase, score), best first
+    def phrases(self, text, top_n=KEYPHRASE_COUNT):
+        candidates = []
+        for fragment in PHRASE_SPLIT_RE.split(text.lower()):
+            phrase = []
+            for word in WORD_RE.findall(fragment):
+                if word in STOPWORDS:
+                    if phrase:
+                        candidates.append(phrase)
+                    phrase = []
+                else:
+                    phrase.append(word)
+            if phrase:
+                candidates.append(phrase)
+
+        frequency = Counter()
+        degree = Counter()
+        for phrase in candidates:
+            for word in phrase:
+                frequency[stem(word)] += 1
+                degree[stem(word)] += len(phrase)
+        word_scores = {word: degree[word] / frequency[word] * self.weight(word) for word in frequency}
+
+        scored = {}
+        for phrase in candidates:
+            key = " ".join(phrase)
+            if key not in scored:
+                scored[key] = sum(word_scores[stem(word)] for word in phrase)
+        return sorted(scored.items(), key=lambda item: -item[1])[:top_n]
+
+    # Function to make a short topic title from the best keyphrases
+    def topic(self, text, top_n=3):
+        return " / ".join(phrase.title() for phrase, _ in self.phrases(text, top_n))
+
+    # Function to score how well the text covers the expected topic (0-1): the
+    # IDF-weighted average over the topic's content words, each counting fully
+    # if it is in one of the text's keyphrases and half if it is only mentioned
+    def match(self, text, expected_topic, top_n=KEYPHRASE_COUNT):
+        expected = set(content_stems(expected_topic))
+        if not expected:
+            return 0.0
+        key_stems = {stem(word) for phrase, _ in self.phrases(text, top_n) for word in phrase.split()}
+        mentioned = set(content_stems(text))
+        total = sum(self.weight(word) for word in expected)
+        covered = sum(self.weight(word) * (1.0 if word in key_stems else 0.5 if word in mentioned else 0.0)
+                      for word in expected)
+        return covered / total
+
+    # Function to judge a transcript locally: (topic, confidence, result) where
+    # result is "Passed"/"Failed" when decisive, or None for the ambiguous band
+    def judge(self, text, expected_topic, pass_at=TOPIC_FAST_PASS, fail_at=TOPIC_FAST_FAIL):
+        confidence = self.match(text, expected_topic)
+        result = "Passed" if confidence >= pass_at else "Failed" if confidence <= fail_at else None
+        return self.topic(text), confidence, result
+
+
+# Function to read transcripts from .txt files or JSON files with "transcribed_text"
+def read_transcripts(paths):
+    for path in paths:
+        with open(path) as f:
+            if path.endswith('.json'):
+                yield json.load(f).get('transcribed_text', '')
+            else:
+                yield f.read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the IDF table used for offline topic matching")
+    parser.add_argument('transcripts', nargs='+', help='.txt or transcribed_text .json files')
+    parser.add_argument('--output', default=IDF_PATH)
+    args = parser.parse_args()
+    idf = build_idf(read_transcripts(args.transcripts))
+    save_idf(idf, args.output)
+    print(f"Saved IDF for {len(idf) - 1} words to {args.output}")
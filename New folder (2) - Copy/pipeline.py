@@ -0,0 +1,198 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import summary
+import voice_process
+from topic_matcher import TOPIC_MATCH_TOP_K, load_catalog
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+EXPECTED_TOPIC = os.getenv("EXPECTED_TOPIC", "Farming Struggles due to Drought and Climate Change")
+PIPELINE_CACHE_SIZE = int(os.getenv("PIPELINE_CACHE_SIZE", "128"))
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+# Get the summary, topic and feedback from one structured LLM call instead of
+# separate summary and topic requests
+PIPELINE_SINGLE_CALL = os.getenv("PIPELINE_SINGLE_CALL", "1") != "0"
+
+STAGES = ('transcribe', 'evaluate', 'summarize', 'topic', 'score')
+# Scoring is a word count; caching it would cost more than it saves
+MEMOIZED_STAGES = ('transcribe', 'evaluate', 'summarize', 'topic')
+
+# get_summary's fallbacks; these are not worth remembering
+SUMMARY_FAILURES = {"No text to summarize", "API request failed", "Error getting summary"}
+
+
+# Default stages. Each one takes what the previous stage produced and returns
+# plain values, so any of them can be replaced (e.g. with a fake in a benchmark).
+def transcribe(audio_file):
+    return voice_process.transcribe_audio(audio_file)
+
+
+def summarize(text):
+    return voice_process.get_summary(text)
+
+
+# Topic result; 'decided_by' tells keyphrase decisions from LLM ones (see summary.judge_topic)
+def compare_topic(text, expected_topic):
+    try:
+        return summary.judge_topic(GEMINI_API_KEY, text, expected_topic)
+    except Exception as e:
+        print(f"Error comparing topic: {str(e)}")
+        return {'generated_topic': None, 'similarity_score': 0, 'result': "Error", 'feedback': None,
+                'error': str(e)}
+
+
+# Offline keyphrase topic decision: (decision or None, offline pass/fail to audit)
+def decide_topic(text, expected_topic):
+    return summary.offline_topic_decision(text, expected_topic)
+
+
+# Summary, topic and feedback in one call; {'error': ...} if it failed
+def evaluate(text):
+    try:
+        return summary.evaluate_transcript(GEMINI_API_KEY, text)
+    except Exception as e:
+        print(f"Error evaluating transcript: {str(e)}")
+        return {'error': str(e)}
+
+
+def score(text):
+    full_word_count = len(text.split())
+    return {'full_word_count': full_word_count, 'score': voice_process.calculate_score(full_word_count)}
+
+
+# Size-bounded LRU memo for one stage. Results that `keep` rejects (failures)
+# are returned but not stored, so they are retried on the next run.
+class StageCache:
+    def __init__(self, func, maxsize=PIPELINE_CACHE_SIZE, keep=bool):
+        self.func = func
+        self.maxsize = maxsize
+        self.keep = keep
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, *key):
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+        result = self.func(*key)
+        if self.keep(result):
+            with self._lock:
+                self._results[key] = result
+                while len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)
+        return result
+
+    def info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._results)}
+
+
+# In-process pipeline: transcribe -> summarize -> topic-compare -> score. Text is
+# passed straight from stage to stage (no transcribed_text.json, no second
+# interpreter). With single_call, the keyphrase fast path (`decide_topic`; None
+# turns it off) is tried first and a clear-cut transcript only needs its
+# summary; otherwise one `evaluate` stage replaces summarize and topic-compare,
+# which are only used if it fails. Stages named in `memoize`
+# remember their results; a recording is keyed by path, modification time and
+# size, the later stages by their input text. With a topic `catalog` (loaded
+# from topic_catalog.txt by default), each LLM-generated topic is also ranked
+# against every practice topic, in one batch for run_many.
+class Pipeline:
+    def __init__(self, transcribe=transcribe, summarize=summarize, compare_topic=compare_topic, score=score,
+                 evaluate=evaluate, decide_topic=decide_topic, single_call=PIPELINE_SINGLE_CALL,
+                 memoize=MEMOIZED_STAGES, cache_size=PIPELINE_CACHE_SIZE, catalog=load_catalog):
+        self.single_call = single_call
+        self.catalog = catalog() if callable(catalog) else catalog
+        self._decide_topic = decide_topic
+        self.caches = {}
+
+        def stage(name, func, keep=bool):
+            if name not in memoize:
+                return func
+            self.caches[name] = StageCache(func, cache_size, keep)
+            return self.caches[name]
+
+        self._transcribe = stage('transcribe', lambda path, mtime, size: transcribe(path))
+        self._evaluate = stage('evaluate', evaluate, keep=lambda result: 'error' not in result) if single_call else None
+        self._summarize = stage('summarize', summarize, keep=lambda result: result not in SUMMARY_FAILURES)
+        self._compare_topic = stage('topic', compare_topic, keep=lambda result: 'error' not in result)
+        self._score = stage('score', score)
+
+    # Function to run every stage for one recording
+    def run(self, audio_file, expected_topic=EXPECTED_TOPIC):
+        return self._match_catalog([self._run(audio_file, expected_topic)])[0]
+
+    def _run(self, audio_file, expected_topic):
+        try:
+            stat = os.stat(audio_file)
+        except OSError:
+            print(f"Error: Audio file '{audio_file}' not found!")
+            return self._failed(audio_file, expected_topic, "No audio file found")
+
+        text = self._transcribe(os.path.abspath(audio_file), stat.st_mtime_ns, stat.st_size)
+        if not text:
+            return self._failed(audio_file, expected_topic, "Transcription failed")
+        if self.single_call:
+            decision, local_result = self._decide_topic(text, expected_topic) if self._decide_topic else (None, None)
+            if decision is not None:
+                return {
+                    'audio_file': audio_file,
+                    'expected_topic': expected_topic,
+                    'transcribed_text': text,
+                    'summary': self._summarize(text),
+                    **self._score(text),
+                    **decision
+                }
+            evaluation = self._evaluate(text)
+            if 'error' not in evaluation:
+                similarity_score, result = summary.grade_topic(expected_topic, evaluation['topic'])
+                summary.audit_topic_decision(local_result, result)
+                return {
+                    'audio_file': audio_file,
+                    'expected_topic': expected_topic,
+                    'transcribed_text': text,
+                    'summary': evaluation['summary'],
+                    **self._score(text),
+                    'decided_by': 'llm',
+                    'generated_topic': evaluation['topic'],
+                    'similarity_score': similarity_score,
+                    'result': result,
+                    'feedback': evaluation['feedback']
+                }
+        return {
+            'audio_file': audio_file,
+            'expected_topic': expected_topic,
+            'transcribed_text': text,
+            'summary': self._summarize(text),
+            **self._score(text),
+            **self._compare_topic(text, expected_topic)
+        }
+
+    # Function to run many recordings at once; results are in input order
+    def run_many(self, audio_files, expected_topic=EXPECTED_TOPIC, workers=PIPELINE_WORKERS):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda audio_file: self._run(audio_file, expected_topic), audio_files))
+        return self._match_catalog(results)
+
+    # Function to add the best catalog matches of every generated topic, scored in one cdist call
+    def _match_catalog(self, results, k=TOPIC_MATCH_TOP_K):
+        ranked = [result for result in results if result.get('generated_topic')]
+        if self.catalog is not None and ranked:
+            matches = self.catalog.top_k([result['generated_topic'] for result in ranked], k)
+            for result, best in zip(ranked, matches):
+                result['catalog_matches'] = best
+        return results
+
+    # Hits, misses and size of every memoized stage
+    def cache_info(self):
+        return {name: cache.info() for name, cache in self.caches.items()}
+
+    def _failed(self, audio_file, expected_topic, reason):
+        return {'audio_file': audio_file, 'expected_topic': expected_topic, 'transcribed_text': "",
+                'summary': reason, 'full_word_count': 0, 'score': 0}
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+RESPONSE_CACHE_PATH = os.getenv("GEMINI_CACHE_PATH",
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), "gemini_cache.sqlite3"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "5000"))
+
+
+# On-disk cache of model responses in SQLite, so an evaluation that was already
+# made (by this or an earlier process) costs no API call. Entries are keyed by
+# model name, prompt template and text; the least recently used ones are evicted
+# once there are more than max_entries. Hits and misses are counted in the
+# database too, so the hit rate covers every run, not just this process.
+class ResponseCache:
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        # A lost cache write only costs an API call, so commits need not fsync
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                             "key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at REAL, used_at REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+            self._db.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0)")
+
+    # Function to build the cache key for one prompt
+    @staticmethod
+    def key(model_name, template, text):
+        digest = hashlib.sha256()
+        for part in (model_name, template, text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    # Function to look up a response; None on a miss
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            with self._db:
+                if row is not None:
+                    self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+                self._db.execute("UPDATE stats SET value = value + 1 WHERE name = ?",
+                                 ('hits' if row is not None else 'misses',))
+        return row[0] if row is not None else None
+
+    # Function to store a response, evicting the least recently used entries
+    def put(self, key, response, model_name=None):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                             (key, model_name, response, now, now))
+            self._db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                             "ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    # Function to get (or compute and store) the response for one prompt
+    def get_or_call(self, model_name, template, text, call):
+        key = self.key(model_name, template, text)
+        response = self.get(key)
+        if response is None:
+            response = call()
+            self.put(key, response, model_name)
+        return response
+
+    # Entries, hits, misses and hit rate over every run using this database
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT name, value FROM stats"))
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = counts['hits'] + counts['misses']
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': counts['hits'],
+            'misses': counts['misses'],
+            'hit_rate': round(counts['hits'] / lookups, 4) if lookups else 0.0
+        }
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("UPDATE stats SET value = 0")
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,148 @@
+import math
+import numpy as np
+
+# Vectorized versions of pydub.silence.detect_silence / detect_nonsilent /
+# split_on_silence. They work on a signed sample array (interleaved if
+# channels > 1) and return the same millisecond ranges as pydub, but compute
+# every window's RMS at once from a cumulative sum of squares instead of
+# slicing and measuring the audio once per millisecond.
+
+
+# Function to view signed little-endian PCM bytes (as in AudioSegment.raw_data) as samples
+def pcm_samples(data, sample_width):
+    return np.frombuffer(data, dtype=np.int8 if sample_width == 1 else f'<i{sample_width}')
+
+
+# Function to convert dBFS to a ratio of full scale (same as pydub.utils.db_to_float)
+def db_to_float(db):
+    return 10 ** (db / 20)
+
+
+def max_possible_amplitude(sample_width):
+    return float(2 ** (8 * sample_width - 1))
+
+
+# Length in milliseconds, rounded like len(AudioSegment)
+def duration_ms(samples, sample_rate, channels=1):
+    return round(1000 * (len(samples) // channels / sample_rate))
+
+
+# Function to convert milliseconds to a frame index the way pydub slices audio
+def ms_to_frame(ms, sample_rate):
+    return (np.asarray(ms) * (sample_rate / 1000.0)).astype(np.int64)
+
+
+# Function to get the loudness of the whole buffer (same as AudioSegment.dBFS)
+def dbfs(samples, sample_width):
+    if not len(samples):
+        return -float('inf')
+    rms = int(np.sqrt(_energy_at(samples, np.array([len(samples)]))[0] / len(samples)))
+    if not rms:
+        return -float('inf')
+    return 20 * math.log(rms / max_possible_amplitude(sample_width), 10)
+
+
+# Function to get the running sum of squared samples at each (sorted) position,
+# a block at a time so the int64 squares never take more than a few MB
+def _energy_at(samples, positions, block=1 << 18):
+    energy = np.zeros(len(positions), dtype=np.int64)
+    total = 0
+    for start in range(0, len(samples), block):
+        running = np.cumsum(np.square(samples[start:start + block], dtype=np.int64))
+        lo, hi = np.searchsorted(positions, [start, start + len(running)], side='right')
+        energy[lo:hi] = total + running[positions[lo:hi] - start - 1]
+        total += int(running[-1])
+    return energy
+
+
+# Function to find silent ranges [start_ms, end_ms]: every min_silence_len window,
+# stepped by seek_step ms, whose RMS is at or below silence_thresh dBFS, merged
+# into ranges with pydub's rules
+def detect_silence(samples, sample_rate, sample_width, min_silence_len=1000, silence_thresh=-16,
+                   seek_step=1, channels=1):
+    n_frames = len(samples) // channels
+    seg_len = duration_ms(samples, sample_rate, channels)
+    if seg_len < min_silence_len:
+        return []
+    thresh = db_to_float(silence_thresh) * max_possible_amplitude(sample_width)
+
+    last_slice_start = seg_len - min_silence_len
+    starts = np.arange(0, last_slice_start + 1, seek_step)
+    if last_slice_start % seek_step:
+        starts = np.append(starts, last_slice_start)
+    ends = np.minimum(starts + min_silence_len, seg_len)
+
+    # Windows start and end on millisecond boundaries, so their energy is the
+    # difference of the running sum of squares at two boundaries. Like pydub,
+    # frames past the end of the data count as zeros but still count towards
+    # the window length.
+    boundaries = ms_to_frame(np.arange(seg_len + 1), sample_rate)
+    energy = _energy_at(samples, np.minimum(boundaries, n_frames) * channels)
+    sums = energy[ends] - energy[starts]
+    counts = (boundaries[ends] - boundaries[starts]) * channels
+    rms = np.floor(np.sqrt(sums / np.maximum(counts, 1)))  # audioop.rms truncates
+
+    silence_starts = starts[rms <= thresh]
+    if not len(silence_starts):
+        return []
+
+    # A new range begins where the windows are neither consecutive nor overlapping
+    gaps = np.diff(silence_starts)
+    breaks = np.flatnonzero((gaps != seek_step) & (gaps > min_silence_len))
+    range_starts = silence_starts[np.concatenate(([0], breaks + 1))]
+    range_ends = silence_starts[np.concatenate((breaks, [len(silence_starts) - 1]))] + min_silence_len
+    return [[int(start), int(end)] for start, end in zip(range_starts, range_ends)]
+
+
+# Function to find the non-silent ranges [start_ms, end_ms] between the silences
+def detect_nonsilent(samples, sample_rate, sample_width, min_silence_len=1000, silence_thresh=-16,
+                     seek_step=1, channels=1):
+    silent_ranges = detect_silence(samples, sample_rate, sample_width, min_silence_len, silence_thresh,
+                                   seek_step, channels)
+    len_seg = duration_ms(samples, sample_rate, channels)
+
+    if not silent_ranges:
+        return [[0, len_seg]]
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == len_seg:
+        return []
+
+    prev_end_i = 0
+    nonsilent_ranges = []
+    for start_i, end_i in silent_ranges:
+        nonsilent_ranges.append([prev_end_i, start_i])
+        prev_end_i = end_i
+    if end_i != len_seg:
+        nonsilent_ranges.append([prev_end_i, len_seg])
+    if nonsilent_ranges[0] == [0, 0]:
+        nonsilent_ranges.pop(0)
+    return nonsilent_ranges
+
+
+# Function to get the [start_ms, end_ms] of each chunk split_on_silence would
+# return: non-silent ranges padded by keep_silence, with overlapping padding
+# split at the midpoint
+def split_ranges(samples, sample_rate, sample_width, min_silence_len=1000, silence_thresh=-16,
+                 keep_silence=100, seek_step=1, channels=1):
+    len_seg = duration_ms(samples, sample_rate, channels)
+    if isinstance(keep_silence, bool):
+        keep_silence = len_seg if keep_silence else 0
+
+    output_ranges = [
+        [start - keep_silence, end + keep_silence]
+        for start, end in detect_nonsilent(samples, sample_rate, sample_width, min_silence_len,
+                                           silence_thresh, seek_step, channels)
+    ]
+    for range_i, range_ii in zip(output_ranges, output_ranges[1:]):
+        if range_ii[0] < range_i[1]:
+            range_i[1] = (range_i[1] + range_ii[0]) // 2
+            range_ii[0] = range_i[1]
+    return [[max(start, 0), min(end, len_seg)] for start, end in output_ranges]
+
+
+# Function to split samples on silence; each chunk is a view into `samples`
+def split_on_silence(samples, sample_rate, sample_width, min_silence_len=1000, silence_thresh=-16,
+                     keep_silence=100, seek_step=1, channels=1):
+    ranges = split_ranges(samples, sample_rate, sample_width, min_silence_len, silence_thresh,
+                          keep_silence, seek_step, channels)
+    bounds = ms_to_frame(np.array(ranges, dtype=np.int64).reshape(-1, 2), sample_rate) * channels
+    return [samples[start:end] for start, end in bounds]
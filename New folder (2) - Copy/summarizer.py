@@ -0,0 +1,166 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts in seconds for one summary request
+SUMMARY_CONNECT_TIMEOUT = float(os.getenv("SUMMARY_CONNECT_TIMEOUT", "3.05"))
+SUMMARY_READ_TIMEOUT = float(os.getenv("SUMMARY_READ_TIMEOUT", "30"))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "3"))
+SUMMARY_POOL_SIZE = int(os.getenv("SUMMARY_POOL_SIZE", "10"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+
+# Responses worth retrying: throttling and server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SummaryError(Exception):
+    pass
+
+
+# Raised without calling the API while the circuit breaker is open
+class CircuitOpenError(SummaryError):
+    pass
+
+
+# Stops calling an upstream that keeps failing. After failure_threshold
+# consecutive failures the circuit opens and calls fail fast; once reset_timeout
+# has passed a single trial call is let through, and its outcome closes the
+# circuit again or re-opens it.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if self.clock() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    # Function to check whether a call may go ahead (raises CircuitOpenError if
+    # not); returns True if the call is the half-open trial
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if self.clock() - self.opened_at >= self.reset_timeout and not self.trial_running:
+                self.trial_running = True
+                return True
+            raise CircuitOpenError("Summary API circuit is open; not calling it")
+
+    # Function to let the next call be a trial if this trial ended without an outcome
+    def end_trial(self):
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+
+# Client for the summary API. One requests.Session keeps a pool of connections
+# open, so calls after the first skip the TCP and TLS handshakes. Every request
+# has a timeout; connection errors, timeouts, 429 and 5xx responses are retried
+# with jittered exponential backoff, behind a circuit breaker.
+class SummaryClient:
+    def __init__(self, api_url, api_key=None, timeout=(SUMMARY_CONNECT_TIMEOUT, SUMMARY_READ_TIMEOUT),
+                 max_retries=SUMMARY_MAX_RETRIES, backoff=0.5, max_backoff=8.0, pool_size=SUMMARY_POOL_SIZE,
+                 breaker=None, sleep=time.sleep):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f'Bearer {api_key}'
+
+    # Function to summarize one text; raises SummaryError once retries are exhausted
+    def summarize(self, text):
+        trial = self.breaker.before_call()
+        try:
+            return self._summarize(text)
+        finally:
+            if trial:
+                # Any other exception must not leave the half-open trial running forever
+                self.breaker.end_trial()
+
+    def _summarize(self, text):
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.post(self.api_url, json={'text': text}, timeout=self.timeout)
+                if response.status_code == 200:
+                    summary = response.json().get('summary', 'No summary available')
+                    self.breaker.record_success()
+                    return summary
+                error = SummaryError(f"API request failed with status code {response.status_code}: {response.text}")
+                if response.status_code not in RETRY_STATUSES:
+                    # The request itself is wrong; retrying would not help
+                    self.breaker.record_success()
+                    raise error
+                retry_after = _retry_after(response)
+            except requests.RequestException as e:
+                # Connection errors, timeouts and unreadable responses
+                error = SummaryError(f"Summary API request failed: {e}")
+
+            if attempt < self.max_retries:
+                self.sleep(retry_after if retry_after is not None else self._delay(attempt))
+        self.breaker.record_failure()
+        raise error
+
+    # Full jitter: anywhere between 0 and the capped exponential delay
+    def _delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    # Function to summarize many texts concurrently, at most `concurrency` in
+    # flight. Results keep the order of `texts`; a failed text gets its exception.
+    async def summarize_many(self, texts, concurrency=SUMMARY_CONCURRENCY):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def summarize_one(text):
+            async with semaphore:
+                return await asyncio.to_thread(self.summarize, text)
+
+        return await asyncio.gather(*(summarize_one(text) for text in texts), return_exceptions=True)
+
+    # Blocking wrapper around summarize_many for code without an event loop
+    def summarize_all(self, texts, concurrency=SUMMARY_CONCURRENCY):
+        return asyncio.run(self.summarize_many(texts, concurrency))
+
+    def close(self):
+        self.session.close()
+
+
+# Function to read a Retry-After header given in seconds (capped), if any
+def _retry_after(response, limit=60.0):
+    try:
+        return min(float(response.headers['Retry-After']), limit)
+    except (KeyError, ValueError):
+        return None
@@ -2,31 +2,202 @@ import google.generativeai as genai
 import Levenshtein
 import json
 import os
+import random
+import threading
+from functools import lru_cache
+from keyphrases import IDF_PATH, KeyphraseExtractor, load_idf
+from response_cache import ResponseCache
 
-# Function to generate topic, compare to expected topic, and generate feedback
-def compare_generated_topic_to_expected_with_feedback(api_key, text, expected_topic):
+# Use the correct model based on your available models
+GEMINI_MODEL = "gemini-1.5-pro-latest"  # You can select the appropriate model
+TOPIC_PROMPT = "Generate a topic for the following text:\n{text}"
+# One call returning the summary, topic and feedback together as JSON
+EVALUATION_PROMPT = """You are evaluating a short practice speech from its transcript.
+Reply with only a JSON object with exactly these keys:
+  "summary": a summary of the speech in 2-3 sentences,
+  "topic": the topic of the speech as a short title (at most 10 words),
+  "feedback": 2-4 sentences of specific advice to improve the speech (clarity, structure, staying on topic).
+Transcript:
+{text}"""
+EVALUATION_FIELDS = {'summary': 2000, 'topic': 200, 'feedback': 2000}  # key: max length
+EVALUATION_RETRIES = int(os.getenv("EVALUATION_RETRIES", "2"))
+
+# Decide clear-cut evaluations from the transcript's keyphrases, without the LLM
+# (needs the IDF table built by keyphrases.py). Off by default: `benchmark.py
+# topic-fast-path` measures only 69% pass/fail agreement with grade_topic, so
+# enable it only once TOPIC_FAST_PASS/TOPIC_FAST_FAIL are tuned to agree on at
+# least 95% of the offline decisions.
+TOPIC_FAST_PATH = os.getenv("TOPIC_FAST_PATH", "0") != "0"
+# Share of offline decisions also sent to the LLM to measure how often they agree
+TOPIC_AUDIT_RATE = float(os.getenv("TOPIC_AUDIT_RATE", "0.05"))
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+# Offline decisions, LLM escalations and audited agreement since start-up
+fast_path_stats = {'local': 0, 'escalated': 0, 'audited': 0, 'agreed': 0}
+_fast_path_lock = threading.Lock()
+
+# Function to get the model handle, configured once per API key
+@lru_cache(maxsize=8)
+def get_model(api_key, model_name=GEMINI_MODEL):
     genai.configure(api_key=api_key)
-    
-    # Use the correct model based on your available models
-    model = genai.GenerativeModel("gemini-1.5-pro-latest")  # You can select the appropriate model
-    
-    # Generate a topic for the given text
-    prompt = f"Generate a topic for the following text:\n{text}"
-    response = model.generate_content(prompt)
-    generated_topic = response.text.strip()  # Extract topic from the response
-    
-    # Compare the generated topic to the expected topic
+    return genai.GenerativeModel(model_name)
+
+# Function to get the shared on-disk response cache (opened on first use)
+def get_response_cache():
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+# Function to get the keyphrase extractor (the IDF table is loaded once), or
+# None when there is no IDF table: with every word weighted the same, filler
+# words count as much as topic words and the offline decisions are unreliable
+@lru_cache(maxsize=1)
+def get_extractor():
+    idf = load_idf()
+    if not idf:
+        print(f"No IDF table at {IDF_PATH}; topic fast path disabled (build one with keyphrases.py)")
+        return None
+    return KeyphraseExtractor(idf)
+
+def _count(*names):
+    with _fast_path_lock:
+        for name in names:
+            fast_path_stats[name] += 1
+
+# Function to report how many evaluations skipped the LLM and, of the audited
+# ones, how often the offline pass/fail agreed with the LLM's
+def fast_path_report():
+    with _fast_path_lock:
+        stats = dict(fast_path_stats)
+    total = stats['local'] + stats['escalated'] + stats['audited']
+    stats['local_rate'] = round(stats['local'] / total, 4) if total else 0.0
+    stats['agreement_rate'] = round(stats['agreed'] / stats['audited'], 4) if stats['audited'] else None
+    return stats
+
+# Function to generate a topic for the text; a transcript that was already
+# evaluated is answered from the response cache without calling the API
+def generate_topic(api_key, text, model=None, cache=None):
+    cache = cache or get_response_cache()
+    model = model or get_model(api_key)
+    return cache.get_or_call(
+        model.model_name, TOPIC_PROMPT, text,
+        lambda: model.generate_content(TOPIC_PROMPT.format(text=text)).text.strip()  # Extract topic from the response
+    )
+
+class EvaluationError(ValueError):
+    pass
+
+# Function to parse and validate a structured evaluation reply
+def parse_evaluation(reply):
+    reply = reply.strip()
+    if reply.startswith("```"):
+        # Strip a ```json ... ``` fence
+        reply = reply.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        evaluation = json.loads(reply)
+    except json.JSONDecodeError as e:
+        raise EvaluationError(f"reply is not JSON: {e}")
+    if not isinstance(evaluation, dict):
+        raise EvaluationError("reply is not a JSON object")
+    for field, max_length in EVALUATION_FIELDS.items():
+        value = evaluation.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise EvaluationError(f'"{field}" must be a non-empty string')
+        if len(value) > max_length:
+            raise EvaluationError(f'"{field}" is longer than {max_length} characters')
+    return {field: evaluation[field].strip() for field in EVALUATION_FIELDS}
+
+# Function to get the summary, topic and feedback of a transcript in a single
+# LLM call. Malformed replies are retried with the validation error appended to
+# the prompt; valid evaluations are kept in the response cache.
+def evaluate_transcript(api_key, text, model=None, cache=None, retries=EVALUATION_RETRIES):
+    cache = cache or get_response_cache()
+    model = model or get_model(api_key)
+
+    def call():
+        prompt = EVALUATION_PROMPT.format(text=text)
+        for attempt in range(retries + 1):
+            reply = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"}).text
+            try:
+                return json.dumps(parse_evaluation(reply))
+            except EvaluationError as e:
+                if attempt == retries:
+                    raise
+                print(f"Invalid evaluation ({e}); retrying")
+                prompt = (f"{EVALUATION_PROMPT.format(text=text)}\n\nYour previous reply was invalid: {e}. "
+                          f"Reply with the JSON object only.")
+
+    return json.loads(cache.get_or_call(model.model_name, EVALUATION_PROMPT, text, call))
+
+# Function to compare a generated topic with the expected one
+def grade_topic(expected_topic, generated_topic):
     similarity_score = Levenshtein.ratio(expected_topic.lower(), generated_topic.lower())
     
     # Set a threshold for similarity, for example, 0.8 (80% similarity)
     threshold = 0.8
     result = "Passed" if similarity_score >= threshold else "Failed"
+    return similarity_score, result
+
+# Function to generate topic, compare to expected topic, and generate feedback
+def compare_generated_topic_to_expected_with_feedback(api_key, text, expected_topic, model=None, cache=None):
+    # Generate a topic for the given text
+    generated_topic = generate_topic(api_key, text, model, cache)
+    
+    # Compare the generated topic to the expected topic
+    similarity_score, result = grade_topic(expected_topic, generated_topic)
     
     # Generate feedback for improving speech abilities
     feedback = generate_speech_feedback(result, similarity_score)
     
     return generated_topic, similarity_score, result, feedback
 
+# Function to judge a transcript's topic, trying the offline keyphrase match
+# first; only an ambiguous match needs the LLM. 'decided_by' says which path
+# ran. "llm" results carry the generated topic and its similarity score;
+# "keyphrases" results carry the transcript's keyphrases and how much of the
+# expected topic they cover instead (a different scale with its own pass mark),
+# and leave generated_topic and similarity_score empty.
+def judge_topic(api_key, text, expected_topic, model=None, cache=None, fast_path=TOPIC_FAST_PATH):
+    decision, local_result = offline_topic_decision(text, expected_topic, fast_path)
+    if decision is not None:
+        return decision
+    
+    generated_topic, similarity_score, result, feedback = compare_generated_topic_to_expected_with_feedback(
+        api_key, text, expected_topic, model, cache)
+    audit_topic_decision(local_result, result)
+    return {'decided_by': 'llm', 'generated_topic': generated_topic, 'similarity_score': similarity_score,
+            'result': result, 'feedback': feedback}
+
+# Function to try the offline keyphrase decision on its own. Returns (decision,
+# local_result): decision is judge_topic's "keyphrases" result, or None when the
+# LLM is needed (no IDF table, an ambiguous match, or a decision picked for
+# auditing); local_result is the offline pass/fail to audit against the LLM's.
+def offline_topic_decision(text, expected_topic, fast_path=TOPIC_FAST_PATH):
+    extractor = get_extractor() if fast_path else None
+    if extractor is None:
+        return None, None
+    keyphrases, coverage, local_result = extractor.judge(text, expected_topic)
+    if local_result is None:
+        _count('escalated')
+        return None, None
+    if random.random() < TOPIC_AUDIT_RATE:
+        return None, local_result
+    _count('local')
+    return {'decided_by': 'keyphrases', 'generated_topic': None, 'similarity_score': None,
+            'keyphrases': keyphrases, 'keyphrase_coverage': round(coverage, 4), 'result': local_result,
+            'feedback': generate_speech_feedback(local_result, coverage)}, local_result
+
+# Function to record whether the LLM agreed with an audited offline decision
+def audit_topic_decision(local_result, result):
+    if local_result is not None:
+        _count('audited')
+        if local_result == result:
+            _count('agreed')
+
 # Function to generate feedback based on similarity score
 def generate_speech_feedback(result, similarity_score):
     if result == "Failed":
@@ -67,4 +238,9 @@ if __name__ == "__main__":
     print(f"Generated Topic: {generated_topic}")
     print(f"Similarity Score: {similarity_score}")
     print(f"Result: {result}")
-    print(f"Feedback: {feedback}")
\ No newline at end of file
+    print(f"Feedback: {feedback}")
+    
+    stats = get_response_cache().stats()
+    print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries")
+    print(f"Topic fast path: {fast_path_report()}")
\ No newline at end of file
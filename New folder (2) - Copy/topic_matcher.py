@@ -0,0 +1,73 @@
+import os
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Practice topics, one per line; without this file there is no catalog to rank against
+TOPIC_CATALOG_PATH = os.getenv("TOPIC_CATALOG_PATH",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "topic_catalog.txt"))
+TOPIC_MATCH_TOP_K = int(os.getenv("TOPIC_MATCH_TOP_K", "3"))
+# -1 uses every CPU core
+TOPIC_MATCH_WORKERS = int(os.getenv("TOPIC_MATCH_WORKERS", "-1"))
+# Same pass mark as summary.compare_generated_topic_to_expected_with_feedback
+TOPIC_MATCH_THRESHOLD = 0.8
+
+
+# Catalog of expected practice topics. Generated topics are scored against every
+# catalog topic in one rapidfuzz.process.cdist call (run on `workers` threads);
+# fuzz.ratio / 100 on lower-cased text is the same score as the
+# Levenshtein.ratio comparison in summary.py.
+class TopicCatalog:
+    def __init__(self, topics, workers=TOPIC_MATCH_WORKERS, threshold=TOPIC_MATCH_THRESHOLD):
+        self.topics = list(topics)
+        self._choices = [topic.lower() for topic in self.topics]
+        self.workers = workers
+        self.threshold = threshold
+
+    def __len__(self):
+        return len(self.topics)
+
+    # Function to score N generated topics against the M catalog topics: an
+    # N x M float32 array of similarities in [0, 1]
+    def scores(self, generated_topics):
+        queries = [topic.lower() for topic in generated_topics]
+        matrix = process.cdist(queries, self._choices, scorer=fuzz.ratio, dtype=np.float32, workers=self.workers)
+        matrix /= 100
+        return matrix
+
+    # Function to get the k best catalog matches of each generated topic as
+    # (catalog topic, score, passed) tuples, best first; equal scores keep catalog order
+    def top_k(self, generated_topics, k=3):
+        if not self.topics or k <= 0:
+            return [[] for _ in generated_topics]
+        scores = self.scores(generated_topics)
+        k = min(k, len(self.topics))
+        # Select in linear time: everything above the k-th best score, then as many
+        # topics tied with it as are still needed, earliest in the catalog first
+        kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1, None]
+        above = scores > kth
+        ties = scores == kth
+        ties &= np.cumsum(ties, axis=1) <= k - above.sum(axis=1, keepdims=True)
+        candidates = np.nonzero(above | ties)[1].reshape(len(scores), k)  # In catalog order
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        best = np.take_along_axis(candidates, order, axis=1)
+        best_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        return [
+            [(self.topics[index], round(score, 4), bool(score >= self.threshold)) for index, score in zip(row, row_scores)]
+            for row, row_scores in zip(best.tolist(), best_scores.tolist())
+        ]
+
+    # Function to get the single best catalog match of one generated topic
+    def best_match(self, generated_topic):
+        matches = self.top_k([generated_topic], k=1)[0]
+        return matches[0] if matches else None
+
+
+# Function to load the topic catalog file; None if there is none (or it is empty)
+def load_catalog(path=TOPIC_CATALOG_PATH):
+    try:
+        with open(path, encoding='utf-8') as f:
+            topics = [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return None
+    return TopicCatalog(topics) if topics else None
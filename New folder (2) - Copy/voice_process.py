@@ -1,61 +1,53 @@
 import os
-import requests
 import speech_recognition as sr
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
 import math
 import json
 from dotenv import load_dotenv
+from audio_buffer import load_audio
+from silence import dbfs, split_ranges
+from summarizer import SummaryClient, SummaryError
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Get the API key from environment variables
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = 'https://api.gemini.com/v1/summarize'  # Update if needed
+GEMINI_API_URL = os.getenv("GEMINI_API_URL", 'https://api.gemini.com/v1/summarize')  # Update if needed
 
-# Function to split long audio into smaller chunks (max 60 sec each)
-def split_audio(audio_file, chunk_length=60):  # 60 seconds per chunk
+# Shared client: keeps connections open between summaries and retries failures
+summary_client = SummaryClient(GEMINI_API_URL, GEMINI_API_KEY)
+
+# Function to split long audio into smaller chunks (max 60 sec each); each
+# chunk is in-memory AudioData over the shared buffer
+def split_audio(audio, chunk_length=60):  # 60 seconds per chunk
     try:
-        print(f"Loading audio file: {audio_file}")
-        audio = AudioSegment.from_wav(audio_file)
-        total_length = len(audio) / 1000  # Convert ms to seconds
-        print(f"Audio file length: {total_length} seconds")
+        total_length = audio.duration
+        print(f"Audio length: {total_length} seconds")
         
-        num_chunks = math.ceil(total_length / chunk_length)
+        num_chunks = math.ceil(len(audio) / (chunk_length * 1000))
         print(f"Splitting into {num_chunks} chunks...")
         
-        chunk_files = []
+        chunks = []
         for i in range(num_chunks):
             start_time = i * chunk_length * 1000  # Convert to ms
             end_time = min((i + 1) * chunk_length * 1000, len(audio))
-            chunk = audio[start_time:end_time]
-            
-            chunk_filename = f"chunk_{i}.wav"
-            chunk.export(chunk_filename, format="wav")
-            chunk_files.append(chunk_filename)
-            print(f"Created chunk: {chunk_filename}")
+            chunks.append(audio.audio_data(start_time, end_time))
         
-        return chunk_files
+        return chunks
     except Exception as e:
         print(f"Error splitting audio: {str(e)}")
         return []
 
 # Function to convert audio to text with improved error handling
-def audio_to_text(audio_file):
-    recognizer = sr.Recognizer()
+def audio_to_text(audio_data, label="audio", recognizer=None):
+    recognizer = recognizer or sr.Recognizer()
     try:
-        print(f"Processing audio file: {audio_file}")
-        with sr.AudioFile(audio_file) as source:
-            print(f"Recording audio from {audio_file}")
-            audio_data = recognizer.record(source)
-        
-        print("Sending to Google Speech Recognition API...")
+        print(f"Sending {label} to Google Speech Recognition API...")
         text = recognizer.recognize_google(audio_data)
         print(f"Successfully transcribed {len(text)} characters")
         return text
     except sr.UnknownValueError:
-        print(f"Google Speech Recognition could not understand audio in {audio_file}")
+        print(f"Google Speech Recognition could not understand {label}")
         return ""
     except sr.RequestError as e:
         print(f"Could not request results from Google Speech Recognition service; {e}")
@@ -65,51 +57,37 @@ def audio_to_text(audio_file):
         return ""
 
 # Alternative function for handling problematic audio files
-def transcribe_with_silence_splitting(audio_file):
+def transcribe_with_silence_splitting(audio, recognizer=None):
     try:
         print("Trying alternative transcription method with silence splitting...")
-        # Load audio file
-        sound = AudioSegment.from_wav(audio_file)
         
-        # Split audio where silence is 700ms or more and get chunks
-        chunks = split_on_silence(
-            sound,
+        # Split audio where silence is 700ms or more and get chunks (same
+        # boundaries as pydub's split_on_silence)
+        ranges = split_ranges(
+            audio.samples,
+            audio.sample_rate,
+            audio.sample_width,
             min_silence_len=700,
-            silence_thresh=sound.dBFS-14,
+            silence_thresh=dbfs(audio.samples, audio.sample_width)-14,
             keep_silence=500
         )
         
-        print(f"Audio split into {len(chunks)} chunks based on silence")
+        print(f"Audio split into {len(ranges)} chunks based on silence")
         
-        # Create a directory to store the audio chunks
-        if not os.path.isdir("audio_chunks"):
-            os.mkdir("audio_chunks")
-            
         # Process each chunk
         whole_text = ""
-        recognizer = sr.Recognizer()
+        recognizer = recognizer or sr.Recognizer()
         
-        for i, audio_chunk in enumerate(chunks):
-            # Export chunk and save it in the audio_chunks directory
-            chunk_filename = os.path.join("audio_chunks", f"chunk{i}.wav")
-            audio_chunk.export(chunk_filename, format="wav")
-            
-            # Recognize the chunk
-            with sr.AudioFile(chunk_filename) as source:
-                audio_listened = recognizer.record(source)
-                try:
-                    text = recognizer.recognize_google(audio_listened)
-                    whole_text += text + " "
-                    print(f"Chunk {i}: {text}")
-                except sr.UnknownValueError:
-                    print(f"Could not understand chunk {i}")
-                except Exception as e:
-                    print(f"Error processing chunk {i}: {str(e)}")
-        
-        # Clean up chunk files
-        import shutil
-        if os.path.exists("audio_chunks"):
-            shutil.rmtree("audio_chunks")
+        for i, (start, end) in enumerate(ranges):
+            # Recognize the chunk straight from the buffer
+            try:
+                text = recognizer.recognize_google(audio.audio_data(start, end))
+                whole_text += text + " "
+                print(f"Chunk {i}: {text}")
+            except sr.UnknownValueError:
+                print(f"Could not understand chunk {i}")
+            except Exception as e:
+                print(f"Error processing chunk {i}: {str(e)}")
             
         return whole_text
     except Exception as e:
@@ -124,20 +102,36 @@ def get_summary(text):
         
     try:
         print("Requesting summary from Gemini API...")
-        headers = {'Authorization': f'Bearer {GEMINI_API_KEY}'}
-        response = requests.post(GEMINI_API_URL, json={'text': text}, headers=headers)
-        
-        if response.status_code != 200:
-            print(f"API request failed with status code {response.status_code}: {response.text}")
-            return "API request failed"
-            
-        summary = response.json().get('summary', 'No summary available')
+        summary = summary_client.summarize(text)
         print("Summary received")
         return summary
+    except SummaryError as e:
+        print(str(e))
+        return "API request failed"
     except Exception as e:
         print(f"Error getting summary: {str(e)}")
         return "Error getting summary"
 
+# Function to summarize many transcripts concurrently over the shared client;
+# results are in the same order, with the same fallbacks as get_summary
+def get_summaries(texts):
+    results = iter(summary_client.summarize_all([text for text in texts if text.strip()]))
+    summaries = []
+    for text in texts:
+        if not text.strip():
+            summaries.append("No text to summarize")
+            continue
+        result = next(results)
+        if isinstance(result, SummaryError):
+            print(str(result))
+            summaries.append("API request failed")
+        elif isinstance(result, Exception):
+            print(f"Error getting summary: {str(result)}")
+            summaries.append("Error getting summary")
+        else:
+            summaries.append(result)
+    return summaries
+
 # Function to calculate score based on word count
 def calculate_score(word_count, max_word_count=300):
     score = (word_count / max_word_count) * 100  # Calculate percentage score
@@ -155,9 +149,31 @@ def save_transcribed_text(text, filename="transcribed_text.json"):
         print(f"Error saving transcribed text: {str(e)}")
         return False
 
+# Function to transcribe an audio file, falling back to silence splitting if
+# fixed-length chunks produce no text; returns "" if both fail
+def transcribe_audio(audio_file, recognizer=None):
+    # Decode once; both methods below read chunks from this buffer
+    try:
+        audio = load_audio(audio_file)
+    except Exception as e:
+        print(f"Error loading audio file: {str(e)}")
+        return ""
+    full_text = ""
+    recognizer = recognizer or sr.Recognizer()
+    
+    # Try standard chunk-based method first
+    for i, chunk in enumerate(split_audio(audio)):
+        text = audio_to_text(chunk, f"chunk {i}", recognizer)
+        full_text += text + " "
+    
+    # If standard method didn't work well, try alternative method
+    if not full_text.strip():
+        print("Standard transcription failed. Trying alternative method...")
+        full_text = transcribe_with_silence_splitting(audio, recognizer)
+    return full_text.strip()
+
 # Process the audio file with multiple methods if needed
-def process_audio_file():
-    audio_file = 'recorded_audio.wav'  # Directly use the WAV file
+def process_audio_file(audio_file='recorded_audio.wav'):  # Directly use the WAV file
     
     # Check if file exists
     if not os.path.exists(audio_file):
@@ -170,25 +186,7 @@ def process_audio_file():
         }
     
     print(f"Found audio file: {audio_file}")
-    
-    # Try standard chunk-based method first
-    chunk_files = split_audio(audio_file)
-    full_text = ""
-    
-    # Process each chunk
-    if chunk_files:
-        for chunk_file in chunk_files:
-            text = audio_to_text(chunk_file)
-            full_text += text + " "
-            try:
-                os.remove(chunk_file)  # Remove temporary chunk file
-            except:
-                pass
-    
-    # If standard method didn't work well, try alternative method
-    if not full_text.strip():
-        print("Standard transcription failed. Trying alternative method...")
-        full_text = transcribe_with_silence_splitting(audio_file)
+    full_text = transcribe_audio(audio_file)
     
     # If still no text, provide error message
     if not full_text.strip():
@@ -222,8 +220,10 @@ def process_audio_file():
 if __name__ == "__main__":
     print("Starting audio processing...")
     
-    # Execute the process
-    result = process_audio_file()
+    # Execute the process; the topic analysis runs in the same process on the
+    # transcribed text
+    from pipeline import Pipeline
+    result = Pipeline().run('recorded_audio.wav')
     
     # Print the results
     print("\n--- Voice Processing Results ---")
@@ -234,18 +234,19 @@ if __name__ == "__main__":
         print("Full Word Count:", result['full_word_count'])
         print("Score:", result['score'], "%")
         
-        # Import and run the summary analysis with the transcribed text
-        try:
-            print("\nRunning topic analysis on transcribed text...")
-            import subprocess
-            subprocess.run(["python", "summary.py"])
-        except Exception as e:
-            print(f"Error running summary.py: {str(e)}")
+        print("\n--- Topic Analysis ---")
+        if result.get('decided_by') == 'keyphrases':
+            print(f"Keyphrases: {result['keyphrases']}")
+            print(f"Keyphrase Coverage: {result['keyphrase_coverage']}")
+        else:
+            print(f"Generated Topic: {result['generated_topic']}")
+            print(f"Similarity Score: {result['similarity_score']}")
+        print(f"Result: {result['result']}")
+        print(f"Feedback: {result['feedback']}")
     else:
         print("Transcription failed. No text was produced from the audio file.")
         print("Please check that your audio file is valid and properly formatted.")
         print("Make sure you have all required dependencies installed:")
         print("  - SpeechRecognition")
-        print("  - pydub")
-        print("  - pyaudio")
-        print("For WAV file support, you may also need ffmpeg installed on your system.")
\ No newline at end of file
+        print("  - numpy")
+        print("  - pyaudio")
\ No newline at end of file
@@ -1,10 +1,11 @@
-from flask import Flask, jsonify, send_file
-import sounddevice as sd
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 import numpy as np
+import json
 import wave
 import os
 import sys
 import time
+from audio_input import DeviceCache, SharedInputStream
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = os.path.dirname(os.path.abspath(__file__))  # Save in the same folder as the script
@@ -14,47 +15,57 @@ SAMPLE_RATE = 16000  # 16kHz is better for speech recognition
 DURATION = 120  # 120 seconds recording time
 CHANNELS = 1  # Mono audio
 DTYPE = np.int16  # Audio data type
+BLOCK_SIZE = 1600  # Frames per input stream callback (0.1 s)
+STREAM_TIMEOUT = 5  # Seconds without audio before the recording is abandoned
+NORMALIZE_CHUNK_FRAMES = 65536  # Frames rescaled at a time when normalizing
+LEVELS_INTERVAL = 0.1  # Seconds between /levels events
+LEVELS_HEARTBEAT = 5  # Seconds between keep-alives when no new levels arrive
 
-# Function to record audio with improved quality
-def record_audio():
-    print("Preparing to record...")
-    print(f"Sample rate: {SAMPLE_RATE} Hz, Duration: {DURATION} seconds, Channels: {CHANNELS}")
-    
-    # Give a short delay before starting
-    print("Recording will start in 3 seconds...")
-    for i in range(3, 0, -1):
-        print(f"{i}...")
-        time.sleep(1)
-    
+# Cached PortAudio device list; dropped when the input stream stops on its own
+device_cache = DeviceCache()
+# One input stream for the whole process: it runs continuously, meters the
+# levels and keeps the last few seconds, and recordings read from it
+input_stream = SharedInputStream(SAMPLE_RATE, CHANNELS, DTYPE, BLOCK_SIZE, on_device_change=device_cache.invalidate)
+
+# Function to record audio with improved quality. Frames are read from the
+# shared input stream and appended to the WAV file as they arrive, so memory use
+# does not grow with the duration; the peak is tracked on the way and the gain
+# applied afterwards. The stream is already running, so recording starts at once.
+def record_audio(duration=DURATION, audio_file=None, source=None):
+    print(f"Sample rate: {SAMPLE_RATE} Hz, Duration: {duration} seconds, Channels: {CHANNELS}")
     print("Recording started... Speak clearly into the microphone.")
     
-    # Record audio for the specified duration
+    # Save as WAV file
+    audio_file = audio_file or os.path.join(app.config['UPLOAD_FOLDER'], 'recorded_audio.wav')
+    total_frames = int(SAMPLE_RATE * duration)
+    
     try:
-        audio_data = sd.rec(int(SAMPLE_RATE * DURATION), samplerate=SAMPLE_RATE, 
-                           channels=CHANNELS, dtype=DTYPE)
-        
-        # Show a progress indicator
-        for i in range(DURATION):
-            if i % 10 == 0:  # Update every 10 seconds
-                print(f"Recording: {i}/{DURATION} seconds completed")
-            time.sleep(1)
-        
-        sd.wait()  # Wait for recording to complete
-        print("Recording finished successfully.")
-        
-        # Normalize audio (scale to use full dynamic range)
-        if np.max(np.abs(audio_data)) > 0:  # Avoid division by zero
-            audio_data = audio_data * (32767 / np.max(np.abs(audio_data)))
-            audio_data = audio_data.astype(np.int16)
-            
-        # Save as WAV file
-        audio_file = os.path.join(app.config['UPLOAD_FOLDER'], 'recorded_audio.wav')
-        
+        source = (source or input_stream).start()
+        cursor = source.ring.written  # Record from now on
+        peak = 0
+        written = 0
+        next_report = 0
         with wave.open(audio_file, 'wb') as wf:
             wf.setnchannels(CHANNELS)
             wf.setsampwidth(2)  # 2 bytes for int16
             wf.setframerate(SAMPLE_RATE)
-            wf.writeframes(audio_data.tobytes())
+            
+            while written < total_frames:
+                # Show a progress indicator
+                if written >= next_report * SAMPLE_RATE:  # Update every 10 seconds
+                    print(f"Recording: {next_report}/{duration} seconds completed")
+                    next_report += 10
+                block, cursor = source.read_from(cursor, timeout=STREAM_TIMEOUT)
+                block = block[:total_frames - written]
+                wf.writeframes(block.tobytes())
+                peak = max(peak, int(block.max()), -int(block.min()))
+                written += len(block)
+        
+        print("Recording finished successfully.")
+        
+        # Normalize audio (scale to use full dynamic range)
+        if peak > 0:  # Avoid division by zero
+            normalize_wav_in_place(audio_file, peak)
             
         print(f"Audio saved to {audio_file}")
         
@@ -73,14 +84,52 @@ def record_audio():
         print(f"Error during recording: {e}")
         return None
 
-# Function to check microphone levels before recording
-def check_mic_levels(duration=3):
+# Function to find the byte offset and size of the samples in a WAV file
+def wav_data_chunk(audio_file):
+    with open(audio_file, 'rb') as f:
+        header = f.read(12)
+        if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            raise ValueError(f"{audio_file} is not a WAV file")
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"{audio_file} has no data chunk")
+            size = int.from_bytes(chunk[4:], 'little')
+            if chunk[:4] == b'data':
+                return f.tell(), size
+            f.seek(size + (size & 1), os.SEEK_CUR)  # Chunks are word-aligned
+
+# Function to scale a 16-bit WAV so its peak reaches full scale. The samples are
+# memory-mapped and rescaled a chunk at a time, so only one chunk is ever
+# copied (same truncation as the old `audio_data * gain` then `astype(int16)`).
+def normalize_wav_in_place(audio_file, peak, chunk_frames=NORMALIZE_CHUNK_FRAMES):
+    gain = 32767 / peak
+    if gain == 1:
+        return
+    offset, size = wav_data_chunk(audio_file)
+    samples = np.memmap(audio_file, dtype='<i2', mode='r+', offset=offset, shape=(size // 2,))
+    chunk_size = chunk_frames * CHANNELS
+    for start in range(0, len(samples), chunk_size):
+        chunk = samples[start:start + chunk_size]
+        chunk[:] = chunk * gain
+    samples.flush()
+    del samples
+
+# Function to check microphone levels before recording. The last `duration`
+# seconds come from the shared input stream, so this only waits for audio right
+# after the stream has been opened.
+def check_mic_levels(duration=3, source=None):
     print("Checking microphone levels... Please speak normally.")
     try:
-        # Record a short sample to check levels
-        audio_sample = sd.rec(int(SAMPLE_RATE * duration), samplerate=SAMPLE_RATE, 
-                             channels=CHANNELS, dtype=DTYPE)
-        sd.wait()
+        source = (source or input_stream).start()
+        frames = int(SAMPLE_RATE * duration)
+        deadline = time.monotonic() + duration + STREAM_TIMEOUT
+        while source.ring.written < frames and time.monotonic() < deadline:
+            time.sleep(LEVELS_INTERVAL)
+        audio_sample = source.latest(duration)
+        if len(audio_sample) == 0:
+            print("Error checking microphone: no audio received")
+            return 0
         
         # Calculate volume level
         volume_norm = np.linalg.norm(audio_sample) / np.sqrt(len(audio_sample))
@@ -108,6 +157,32 @@ def start_recording():
     else:
         return jsonify({'message': 'Recording failed'}), 500
 
+# API to stream the microphone's RMS and peak levels as server-sent events.
+# The stream ends when the input stream closes; a client that disconnects is
+# noticed at the next write (an event, or a keep-alive when levels stall),
+# which closes the generator.
+@app.route('/levels', methods=['GET'])
+def levels():
+    input_stream.start()
+    
+    def events():
+        last_sequence = 0  # Nothing metered yet
+        last_write = time.monotonic()
+        while input_stream.running:
+            current = input_stream.levels()
+            if current['sequence'] != last_sequence:
+                last_sequence = current['sequence']
+                last_write = time.monotonic()
+                yield f"data: {json.dumps(current)}\n\n"
+            elif time.monotonic() - last_write >= LEVELS_HEARTBEAT:
+                last_write = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(LEVELS_INTERVAL)
+        yield "event: end\ndata: {}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
 # API to get the recorded audio file
 @app.route('/get_audio', methods=['GET'])
 def get_audio():
@@ -116,10 +191,12 @@ def get_audio():
         return send_file(audio_file, as_attachment=True)
     return jsonify({'message': 'No recorded file found'}), 404
 
-# API to list available audio devices
+# API to list available audio devices (?refresh=1 queries PortAudio again)
 @app.route('/list_devices', methods=['GET'])
 def list_devices():
-    devices = sd.query_devices()
+    if request.args.get('refresh'):
+        device_cache.invalidate()
+    devices = device_cache.get()
     return jsonify({'devices': str(devices)})
 
 if __name__ == '__main__':
@@ -128,7 +205,7 @@ if __name__ == '__main__':
     
     # List available audio devices
     print("\nAvailable audio devices:")
-    devices = sd.query_devices()
+    devices = device_cache.get()
     for i, device in enumerate(devices):
         print(f"{i}: {device['name']} (inputs: {device['max_input_channels']}, outputs: {device['max_output_channels']})")
     
@@ -137,6 +214,7 @@ if __name__ == '__main__':
     
     # Record the audio
     record_audio()
+    input_stream.stop()
     
     print("\nRecording complete. The audio file has been saved.")
     print("You can now run api_test.py to transcribe and analyze the recording.")